@@ -1,78 +1,281 @@
-from fastapi import FastAPI, Depends, HTTPException, Response
+from fastapi import FastAPI, Depends, HTTPException, Response, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
 from sqlalchemy.orm import Session
-from . import models, schemas, database
-from .services import sync_service
+from sqlalchemy import text
+from . import models, schemas, database, migrate_db
+from .services import sync_service, artifact_service, catalog_service, reconcile_service, work_scheduler, scheduler_service, change_queue_service, lease_service, partition_service, profile_service, run_service, dead_letter_service, skip_cache_service, json_codec, circuit_breaker, arena_service, mapping_service, quota_service, cancellation
 from fastapi.middleware.cors import CORSMiddleware
-from apscheduler.schedulers.background import BackgroundScheduler
+from starlette.concurrency import run_in_threadpool
 import logging
-from datetime import datetime
+import os
+import threading
 
 # Configure Logging
-# Create handlers
-c_handler = logging.StreamHandler()
-f_handler = logging.FileHandler('app.log')
-c_handler.setLevel(logging.INFO)
-f_handler.setLevel(logging.INFO)
+# Log file served by /admin/logs; opened by the startup hook, so importing the app
+# (tests, scripts) doesn't create or append to it
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
 
-# Create formatters and add it to handlers
+# Create formatters and the console handler
 log_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+c_handler = logging.StreamHandler()
+c_handler.setLevel(logging.INFO)
 c_handler.setFormatter(log_format)
-f_handler.setFormatter(log_format)
 
 # Add handlers to the root logger
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 logger.addHandler(c_handler)
-logger.addHandler(f_handler)
 
-models.Base.metadata.create_all(bind=database.engine)
-app = FastAPI()
+def attach_log_file():
+    """Adds the LOG_FILE handler to the root logger, once."""
+    path = os.path.abspath(LOG_FILE)
+    if any(getattr(handler, "baseFilename", None) == path for handler in logger.handlers):
+        return
+    f_handler = logging.FileHandler(path)
+    f_handler.setLevel(logging.INFO)
+    f_handler.setFormatter(log_format)
+    logger.addHandler(f_handler)
+
+# Startup progress reported by /readyz. Importing this module touches no database;
+# the schema is checked on startup and the scheduler started in the background.
+startup_state = {"schema": False, "scheduler": False, "error": None}
+_startup_thread = None
+
+def initialize_schema():
+    """Creates missing tables, columns and indexes and backfills profile ownership. Idempotent."""
+    models.Base.metadata.create_all(bind=database.engine)
+    migrate_db.rebuild_rekeyed_tables(database.engine)
+    migrate_db.add_missing_columns(database.engine)
+    catalog_service.ensure_search_index(database.engine)
+    with database.SessionLocal() as db:
+        profile_service.assign_unowned_rows(db)
+    startup_state["schema"] = True
+
+
+class FastJSONResponse(JSONResponse):
+    """Renders API responses with the shared JSON codec (orjson when available)."""
+    def render(self, content) -> bytes:
+        return json_codec.dumps(content)
+
+
+app = FastAPI(default_response_class=FastJSONResponse)
 
 @app.get("/admin/logs")
 def get_system_logs(lines: int = 100):
     """Retrieve the last N lines of the system log."""
     try:
-        with open("app.log", "r") as f:
+        with open(LOG_FILE, "r") as f:
             all_lines = f.readlines()
             return {"logs": all_lines[-lines:]}
     except FileNotFoundError:
         return {"logs": ["Log file not found."]}
 
 # Scheduler Setup
-scheduler = BackgroundScheduler()
+# Every worker process and replica runs a scheduler, but only the lease holder of a
+# profile polls that profile's Arena workspace, so profiles can lead on different nodes
+leaders = {}
+leaders_lock = threading.Lock()
+
+def profile_leader(profile_id: int):
+    with leaders_lock:
+        election = leaders.get(profile_id)
+        if election is None:
+            election = leaders[profile_id] = lease_service.LeaderElection(f"scheduler-leader:{profile_id}")
+            election.start()
+        return election
 
-def run_auto_sync():
-    """Background job for auto-syncing Arena changes."""
-    print(">>> SCHEDULER: EXECUTING RUN_AUTO_SYNC <<<")
-    logger.info("Scheduler: Running Auto-Sync Job...")
+def run_auto_sync(profile_id: int):
+    """Background job for auto-syncing one profile's Arena changes. Returns the change activity seen."""
+    if not profile_leader(profile_id).is_leader:
+        return None
+    logger.info(f"Scheduler: Running Auto-Sync Job for profile {profile_id}...")
     db = database.SessionLocal()
     try:
-        sync_service.process_completed_changes(db)
+        result = work_scheduler.run(
+            sync_service.process_completed_changes, db, profile_id=profile_id,
+            priority=work_scheduler.POLLER, key=profile_service.work_key(profile_id, "poller")
+        )
+        return (result or {}).get("enqueued", 0)
     except Exception as e:
         logger.error(f"Scheduler Error: {e}")
+        return 0
+    finally:
+        db.close()
+
+def _drain_profile(profile_id: int):
+    db = database.SessionLocal()
+    try:
+        return sync_service.drain_change_queue(db, profile_id=profile_id)
+    finally:
+        db.close()
+
+def run_change_queue():
+    """Background job consuming changes queued by notifications and the poller, all profiles side by side."""
+    db = database.SessionLocal()
+    try:
+        profile_ids = profile_service.profile_ids(db)
+    finally:
+        db.close()
+    futures = [
+        work_scheduler.submit(
+            _drain_profile, profile_id,
+            priority=work_scheduler.POLLER, key=profile_service.work_key(profile_id, "change-queue")
+        )
+        for profile_id in profile_ids
+    ]
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Change Queue Error: {e}")
+
+def run_push_partitions():
+    """Background job: every node claims and pushes open partitions of partitioned bulk pushes."""
+    try:
+        partition_service.run_next_partition()
+    except Exception as e:
+        logger.error(f"Partition Job Error: {e}")
+
+def _retry_profile(profile_id: int):
+    db = database.SessionLocal()
+    try:
+        return sync_service.retry_dead_letters(db, profile_id)
     finally:
         db.close()
 
+def run_dead_letters():
+    """Background job: retries due dead-lettered SKUs of every profile, behind interactive work."""
+    db = database.SessionLocal()
+    try:
+        profile_ids = profile_service.profile_ids(db)
+    finally:
+        db.close()
+    futures = [
+        work_scheduler.submit(
+            _retry_profile, profile_id,
+            priority=work_scheduler.POLLER, key=profile_service.work_key(profile_id, "dead-letters")
+        )
+        for profile_id in profile_ids
+    ]
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Dead-Letter Retry Error: {e}")
+
+def run_abandoned_syncs():
+    """Background job: resumes full syncs whose process crashed or was redeployed mid-run."""
+    try:
+        sync_service.resume_abandoned_runs()
+    except Exception as e:
+        logger.error(f"Sync Resume Job Error: {e}")
+
+scheduler = scheduler_service.SyncScheduler(run_auto_sync, run_change_queue)
+scheduler.add_periodic("push_partition_job", run_push_partitions, 15)
+scheduler.add_periodic("sync_resume_job", run_abandoned_syncs, 60)
+scheduler.add_periodic("dead_letter_job", run_dead_letters, 60)
+
+def _start_background():
+    try:
+        db = database.SessionLocal()
+        try:
+            for profile_id in profile_service.profile_ids(db):
+                profile_leader(profile_id)
+        finally:
+            db.close()
+        scheduler.start()
+        startup_state["scheduler"] = True
+    except Exception as e:
+        startup_state["error"] = str(e)
+        logger.error(f"Background startup failed: {e}")
+
 @app.on_event("startup")
 def start_scheduler():
-    print(">>> SCHEDULER STARTUP EVENT FIRED - INITIALIZING JOB <<<")
-    config_db = database.SessionLocal()
+    """
+    Opens the log file and checks the schema (fast, and needed before any request
+    touches the DB), then starts leader elections and the scheduler off the startup
+    path so the app takes traffic at once. The first poll of each profile is deferred
+    (see scheduler_service).
+    """
+    global _startup_thread
+    attach_log_file()
     try:
-        config = config_db.query(models.Configuration).first()
-        # Default to every 5 minutes (300 seconds)
-        # In production, we might read this interval from config
-        # next_run_time=datetime.now() makes it run immediately upon adding
-        scheduler.add_job(run_auto_sync, 'interval', minutes=5, id='arena_sync_job', next_run_time=datetime.now())
-        scheduler.start()
-        logger.info("Scheduler started. Running 'arena_sync_job' every 5 minutes.")
-    finally:
-        config_db.close()
+        initialize_schema()
+    except Exception as e:
+        startup_state["error"] = str(e)
+        logger.error(f"Schema initialization failed: {e}")
+        return
+    _startup_thread = threading.Thread(target=_start_background, name="startup", daemon=True)
+    _startup_thread.start()
 
 @app.on_event("shutdown")
 def shutdown_scheduler():
-    scheduler.shutdown()
+    """
+    Cancels every running sync instead of waiting it out: each stops at its next check,
+    in-flight HTTP calls get up to SHUTDOWN_GRACE_SECONDS to finish, and full syncs are
+    left for another node to resume from their checkpoint.
+    """
+    if _startup_thread is not None:
+        _startup_thread.join()
+    still_running = cancellation.shutdown()
+    if still_running:
+        logger.warning(f"Shutting down with syncs still winding down: {', '.join(still_running)}")
+    scheduler.shutdown(wait=not still_running)
+    quota_service.flush()
+    with leaders_lock:
+        elections = list(leaders.values())
+    for election in elections:
+        election.stop()
     logger.info("Scheduler shut down.")
 
+@app.get("/admin/scheduler")
+def get_scheduler_status():
+    """Per profile: current poll interval, next run, the activity seen by the last run and whether this node leads."""
+    status = scheduler.status()
+    with leaders_lock:
+        leading = {profile_id: election.is_leader for profile_id, election in leaders.items()}
+    for profile_id, profile in status["profiles"].items():
+        profile["is_leader"] = leading.get(profile_id, False)
+    return {**status, "node_id": lease_service.NODE_ID}
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving. Touches neither the DB nor the upstreams."""
+    return {"status": "ok", "node_id": lease_service.NODE_ID}
+
+@app.get("/readyz")
+def readyz(response: Response):
+    """
+    Readiness, reported separately for the DB and each profile's upstreams. Only the DB
+    (reachable, schema checked) gates readiness; upstream state is the last known
+    connection status and never pulls the node out of rotation.
+    """
+    db_state = {"reachable": False, "schema": startup_state["schema"]}
+    upstreams = {}
+    try:
+        with database.SessionLocal() as db:
+            db.execute(text("SELECT 1"))
+            db_state["reachable"] = True
+            if startup_state["schema"]:
+                for config in profile_service.list_profiles(db):
+                    upstreams[config.id] = {
+                        "arena": bool(config.is_arena_connected),
+                        "cin7": bool(config.is_cin7_connected),
+                    }
+    except Exception as e:
+        db_state["error"] = str(e)
+
+    ready = db_state["reachable"] and db_state["schema"]
+    if not ready:
+        response.status_code = 503
+    return {
+        "ready": ready,
+        "db": db_state,
+        "scheduler": startup_state["scheduler"],
+        "upstreams": upstreams,
+        "error": startup_state["error"],
+    }
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -88,14 +291,21 @@ def get_db():
     try: yield db
     finally: db.close()
 
+def require_profile(db: Session, profile_id: int = None):
+    """Resolves ?profile_id= (default profile when omitted); 404 if a named profile doesn't exist."""
+    config = profile_service.get_profile(db, profile_id)
+    if profile_id is not None and not config:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return config
+
 
 @app.get("/settings", response_model=schemas.Configuration)
 def get_settings(response: Response, db: Session = Depends(get_db)):
     # Prevent browser caching of settings
     response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
     
-    # Deterministic fetch: Order by ID to ensure we always get the first created row (Singleton pattern)
-    config = db.query(models.Configuration).order_by(models.Configuration.id).first()
+    # Deterministic fetch: the first created row is the default profile
+    config = profile_service.get_profile(db)
     if not config:
         # Create default config if not exists
         config = models.Configuration()
@@ -106,18 +316,13 @@ def get_settings(response: Response, db: Session = Depends(get_db)):
 
 @app.post("/settings", response_model=schemas.Configuration)
 def save_settings(settings: schemas.ConfigurationCreate, db: Session = Depends(get_db)):
-    config = db.query(models.Configuration).order_by(models.Configuration.id).first()
+    config = profile_service.get_profile(db)
     if not config:
         config = models.Configuration()
         db.add(config)
     
-    config.arena_workspace_id = settings.arena_workspace_id
-    config.arena_email = settings.arena_email
-    config.arena_password = settings.arena_password
-    config.cin7_api_user = settings.cin7_api_user
-    config.cin7_api_key = settings.cin7_api_key
-    config.auto_sync_enabled = settings.auto_sync_enabled
-    config.item_prefix_filter = settings.item_prefix_filter
+    for key, value in settings.dict(exclude_unset=True).items():
+        setattr(config, key, value)
     
     # Reset connection flags on update (they will be re-verified)
     # config.is_arena_connected = False
@@ -125,44 +330,349 @@ def save_settings(settings: schemas.ConfigurationCreate, db: Session = Depends(g
     
     db.commit()
     db.refresh(config)
+    # Interval and call budget changes take effect without a restart
+    scheduler.refresh(config.id)
+    quota_service.forget_limits(config.id)
+    return config
+
+@app.get("/profiles", response_model=list[schemas.Configuration])
+def read_profiles(response: Response, db: Session = Depends(get_db)):
+    """Connection profiles (Arena workspace + Cin7 account pairs). The first one is the default."""
+    response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
+    return profile_service.list_profiles(db)
+
+@app.post("/profiles", response_model=schemas.Configuration)
+def create_profile(settings: schemas.ConfigurationCreate, db: Session = Depends(get_db)):
+    config = models.Configuration(**settings.dict())
+    db.add(config)
+    db.commit()
+    db.refresh(config)
+    # The new profile gets its own poll job right away
+    scheduler.refresh()
     return config
 
+@app.put("/profiles/{profile_id}", response_model=schemas.Configuration)
+def update_profile(profile_id: int, settings: schemas.ConfigurationCreate, db: Session = Depends(get_db)):
+    config = require_profile(db, profile_id)
+    for key, value in settings.dict(exclude_unset=True).items():
+        setattr(config, key, value)
+    db.commit()
+    db.refresh(config)
+    scheduler.refresh(config.id)
+    quota_service.forget_limits(config.id)
+    return config
+
+@app.get("/profiles/{profile_id}/rules")
+def read_profile_rules(profile_id: int, db: Session = Depends(get_db)):
+    """Effective sync rules of a profile: global rules overlaid with its overrides."""
+    require_profile(db, profile_id)
+    return profile_service.load_rules(db, profile_id)
+
+@app.put("/profiles/{profile_id}/rules/{rule_key}")
+def set_profile_rule(profile_id: int, rule_key: str, rule: schemas.ProfileRuleUpdate, db: Session = Depends(get_db)):
+    """Overrides one global sync rule for a profile. is_enabled=false switches the rule off for it."""
+    require_profile(db, profile_id)
+    profile_service.set_profile_rule(db, profile_id, rule_key, rule.rule_value, rule.is_enabled)
+    return profile_service.load_rules(db, profile_id)
+
 
 @app.get("/test/arena/item/{guid}")
 
 @app.post("/sync/arena")
-def trigger_arena_harvest(db: Session = Depends(get_db)):
-    return sync_service.perform_sync(db)
+def trigger_arena_harvest(profile_id: int = None, db: Session = Depends(get_db)):
+    require_profile(db, profile_id)
+    # Registered so a shutdown can stop it
+    with cancellation.running(f"harvest:{artifact_service.new_run_id()}") as cancel:
+        return sync_service.perform_sync(db, profile_id, cancel=cancel)
 
 @app.post("/sync/cin7")
-def trigger_cin7_push(dry_run: bool = True, db: Session = Depends(get_db)):
-    """Triggers Full Sync (Harvest + Push). Use ?dry_run=false for live sync."""
-    return sync_service.perform_full_sync(db, dry_run=dry_run)
+def trigger_cin7_push(background_tasks: BackgroundTasks, dry_run: bool = True, output: str = "json", profile_id: int = None, force_full: bool = False, db: Session = Depends(get_db)):
+    """
+    Triggers Full Sync (Harvest + Push) of one profile (?profile_id=, default profile if omitted).
+    Use ?dry_run=false for live sync.
+    The push only covers items changed since the last completed live sync; ?force_full=true pushes all.
+    ?output=ndjson streams one JSON record per item as it is produced.
+    ?output=artifact runs in the background and writes a gzip NDJSON artifact fetchable by run ID.
+    The default JSON response lists at most RESULT_DETAILS_LIMIT payloads and failures.
+    """
+    require_profile(db, profile_id)
+    return full_sync_response(background_tasks, db, artifact_service.new_run_id(), output, dry_run, profile_id, force_full)
+
+def full_sync_response(background_tasks: BackgroundTasks, db: Session, run_id: str, output: str, dry_run: bool = True, profile_id: int = None, force_full: bool = False):
+    """Starts or resumes the full sync `run_id`, returning its results in the requested output form."""
+    if output == "ndjson":
+        records = sync_service.stream_full_sync(dry_run=dry_run, run_id=run_id, profile_id=profile_id, force_full=force_full)
+        return StreamingResponse(
+            artifact_service.encode_ndjson(records),
+            media_type="application/x-ndjson",
+            headers={"X-Run-Id": run_id}
+        )
+    if output == "artifact":
+        records = sync_service.stream_full_sync(dry_run=dry_run, run_id=run_id, profile_id=profile_id, force_full=force_full)
+        artifact_service.reserve_artifact(run_id)
+        background_tasks.add_task(artifact_service.write_artifact, run_id, records)
+        return {"status": "accepted", "run_id": run_id, "artifact_url": f"/sync/runs/{run_id}/artifact"}
+    return sync_service.perform_full_sync(db, dry_run=dry_run, profile_id=profile_id, run_id=run_id, force_full=force_full)
+
+@app.get("/sync/runs")
+def list_sync_runs(status: str = None, limit: int = 50, db: Session = Depends(get_db)):
+    """Recent full sync runs with their checkpointed progress, newest first."""
+    query = db.query(models.SyncRun)
+    if status:
+        query = query.filter(models.SyncRun.status == status)
+    runs = query.order_by(models.SyncRun.started_at.desc()).limit(min(limit, 500)).all()
+    return [run_service.run_status(run) for run in runs]
+
+@app.get("/sync/runs/{run_id}")
+def get_sync_run(run_id: str, db: Session = Depends(get_db)):
+    run = run_service.get_run(db, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run_service.run_status(run)
+
+@app.post("/sync/runs/{run_id}/resume")
+def resume_sync_run(run_id: str, background_tasks: BackgroundTasks, output: str = "json", db: Session = Depends(get_db)):
+    """
+    Resumes an interrupted or failed full sync from its last checkpoint, with the run's
+    own profile and dry_run setting. Only the resumed part is returned (or streamed);
+    GET /sync/runs/{run_id} has the cumulative summary.
+    """
+    run = run_service.get_run(db, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if run.status == "complete":
+        raise HTTPException(status_code=409, detail="Run already complete")
+    if run_service.is_live(db, run_id):
+        raise HTTPException(status_code=409, detail="Run is in progress")
+    return full_sync_response(background_tasks, db, run_id, output)
+
+@app.post("/sync/runs/{run_id}/cancel")
+def cancel_sync_run(run_id: str, db: Session = Depends(get_db)):
+    """
+    Cancels a running full sync, on whichever node executes it. It stops at its next
+    check (within a few seconds), keeps its checkpoint and can be resumed later.
+    """
+    run = run_service.get_run(db, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if run.status != "running":
+        raise HTTPException(status_code=409, detail=f"Run is {run.status}")
+    cancellation.cancel(run_id, run_service.CANCEL_MESSAGE)
+    run_service.request_cancel(db, run)
+    return run_service.run_status(run)
+
+@app.post("/sync/cin7/partitioned")
+def trigger_partitioned_push(partitions: int = 4, dry_run: bool = True, profile_id: int = None, db: Session = Depends(get_db)):
+    """
+    Splits the bulk push into SKU hash ranges that every node picks up through leases.
+    Push only: run a harvest first. Poll GET /sync/cin7/partitioned/{run_id} for progress.
+    """
+    if partitions < 1 or partitions > 256:
+        raise HTTPException(status_code=400, detail="partitions must be between 1 and 256")
+    config = require_profile(db, profile_id)
+    if not config:
+        raise HTTPException(status_code=400, detail="Configuration missing")
+    run_id = partition_service.create_partitioned_push(db, partitions, dry_run=dry_run, profile_id=config.id)
+    return {"status": "accepted", "run_id": run_id, "profile_id": config.id, "partitions": partitions}
+
+@app.get("/sync/cin7/partitioned/{run_id}")
+def get_partitioned_push(run_id: str, db: Session = Depends(get_db)):
+    status = partition_service.partitioned_push_status(db, run_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return status
+
+@app.get("/sync/runs/{run_id}/artifact")
+def get_run_artifact(run_id: str):
+    """Downloads the gzip NDJSON artifact of a run started with ?output=artifact."""
+    try:
+        status = artifact_service.artifact_status(run_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid run id")
+    if status == "running":
+        return Response(status_code=202, content='{"status": "running"}', media_type="application/json")
+    if status == "missing":
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return FileResponse(
+        artifact_service.artifact_path(run_id),
+        media_type="application/gzip",
+        filename=f"{run_id}.ndjson.gz"
+    )
+
+@app.post("/sync/reconcile")
+def trigger_reconcile(push: bool = False, profile_id: int = None, db: Session = Depends(get_db)):
+    """Compares the Cin7 catalog with harvested items and writes a drift report. Use ?push=true to fix drifted products."""
+    require_profile(db, profile_id)
+    return reconcile_service.reconcile_catalog(db, push=push, profile_id=profile_id)
 
 @app.post("/sync/auto-process")
-def trigger_auto_process(dry_run: bool = False, db: Session = Depends(get_db)):
+def trigger_auto_process(dry_run: bool = False, profile_id: int = None, db: Session = Depends(get_db)):
     """Manually triggers the 'Completed Changes' poller logic."""
-    return sync_service.process_completed_changes(db, dry_run=dry_run)
+    config = require_profile(db, profile_id)
+    return work_scheduler.run(
+        sync_service.process_completed_changes, db, dry_run=dry_run, profile_id=profile_id,
+        priority=work_scheduler.POLLER, key=profile_service.work_key(config.id if config else None, "poller")
+    )
+
+@app.post("/webhooks/arena/changes", status_code=202)
+async def receive_arena_change(request: Request, profile_id: int = None, db: Session = Depends(get_db)):
+    """
+    Inbound change-completed notification for one profile (?profile_id=, default profile
+    if omitted). The body must be signed with that profile's webhook secret
+    (X-Arena-Timestamp and X-Arena-Signature headers). The change is only queued here;
+    the queue consumer debounces it and confirms its status with Arena.
+    """
+    body = await request.body()
+    timestamp = request.headers.get("X-Arena-Timestamp")
+    signature = request.headers.get("X-Arena-Signature")
+
+    def enqueue():
+        config = require_profile(db, profile_id)
+        if not config or not config.webhook_secret:
+            raise HTTPException(status_code=403, detail="Webhook secret not configured")
+        if not change_queue_service.verify_signature(config.webhook_secret, body, timestamp, signature):
+            raise HTTPException(status_code=401, detail="Invalid signature")
+        try:
+            event = json_codec.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON")
+        change_guid = event.get("changeGuid") or event.get("guid")
+        if not change_guid:
+            raise HTTPException(status_code=400, detail="changeGuid missing")
+        queued = change_queue_service.enqueue(
+            db, change_guid, event.get("changeNumber") or event.get("number"),
+            source="webhook", debounce_seconds=config.change_debounce_seconds or 0,
+            profile_id=config.id
+        )
+        return {"status": "accepted", "queued": queued, "change_guid": change_guid}
+
+    return await run_in_threadpool(enqueue)
+
+@app.get("/changes/queue", response_model=list[schemas.ChangeQueueEntry])
+def read_change_queue(status: str = None, profile_id: int = None, limit: int = 100, db: Session = Depends(get_db)):
+    query = db.query(models.ChangeQueueEntry)
+    if profile_id is not None:
+        query = query.filter(models.ChangeQueueEntry.profile_id == profile_id)
+    if status:
+        query = query.filter(models.ChangeQueueEntry.status == status)
+    return query.order_by(models.ChangeQueueEntry.received_at.desc()).limit(min(limit, 1000)).all()
+
+@app.get("/dead-letters", response_model=list[schemas.DeadLetterItem])
+def read_dead_letters(status: str = None, profile_id: int = None, limit: int = 100, db: Session = Depends(get_db)):
+    """Failed SKUs with their error class, attempt count and next retry time."""
+    query = db.query(models.DeadLetterItem)
+    if profile_id is not None:
+        query = query.filter(models.DeadLetterItem.profile_id == profile_id)
+    if status:
+        query = query.filter(models.DeadLetterItem.status == status)
+    return query.order_by(models.DeadLetterItem.last_failed_at.desc()).limit(min(limit, 1000)).all()
+
+@app.post("/dead-letters/{entry_id}/retry", response_model=schemas.DeadLetterItem)
+def retry_dead_letter(entry_id: int, db: Session = Depends(get_db)):
+    """Retries one failed SKU now (parked ones included) and returns its updated entry."""
+    entry = db.query(models.DeadLetterItem).filter(models.DeadLetterItem.id == entry_id).first()
+    if not entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    if entry.status not in ("pending", "parked"):
+        raise HTTPException(status_code=409, detail=f"Entry is {entry.status}")
+    entry = work_scheduler.run(
+        sync_service.retry_dead_letter, db, entry_id,
+        priority=work_scheduler.INTERACTIVE, key=profile_service.work_key(entry.profile_id, "on-demand")
+    )
+    if entry is None:
+        raise HTTPException(status_code=409, detail="Entry is already being retried")
+    return entry
+
+@app.post("/dead-letters/requeue")
+def requeue_dead_letters(profile_id: int = None, db: Session = Depends(get_db)):
+    """Gives parked SKUs a fresh attempt budget and makes them due for the retry worker."""
+    return {"requeued": dead_letter_service.requeue(db, profile_id)}
+
+@app.delete("/sync/skip-cache")
+def clear_skip_cache(profile_id: int = None, db: Session = Depends(get_db)):
+    """Forgets cached skip verdicts so the next harvest re-checks every filtered-out item."""
+    return {"cleared": skip_cache_service.clear(db, profile_id)}
 
 @app.post("/test/cin7/connection")
-def test_cin7_connection(db: Session = Depends(get_db)):
-    config = db.query(models.Configuration).first()
+def test_cin7_connection(profile_id: int = None, db: Session = Depends(get_db)):
+    config = require_profile(db, profile_id)
     if not config or not config.cin7_api_user:
         return {"status": "error", "message": "Credentials missing"}
     
-    from .services.cin7_service import Cin7Client
-    cin7 = Cin7Client(config.cin7_api_user, config.cin7_api_key)
+    cin7 = profile_service.cin7_client(config)
     product = cin7.get_product_by_sku("06-03416")
     return {"status": "success", "found": product is not None}
 
 
 @app.post("/sync/on-demand")
-def sync_on_demand_item(item_number: str, dry_run: bool = True, db: Session = Depends(get_db)):
+def sync_on_demand_item(item_number: str, dry_run: bool = True, with_ancestors: bool = True, profile_id: int = None, db: Session = Depends(get_db)):
     """
-    Fetches a specific item from Arena and prepares/pushes it to Cin7.
+    Fetches a specific item from Arena and prepares/pushes it to Cin7, then (unless
+    with_ancestors=false) the assemblies that embed it.
     """
-    from .services import sync_service
-    return sync_service.sync_single_item(db, item_number, dry_run)
+    config = require_profile(db, profile_id)
+    # Interactive priority: jumps ahead of queued bulk work and of bulk callers waiting on upstream slots
+    return work_scheduler.run(
+        sync_service.sync_single_item, db, item_number, dry_run, profile_id=profile_id, with_ancestors=with_ancestors,
+        priority=work_scheduler.INTERACTIVE, key=profile_service.work_key(config.id if config else None, "on-demand")
+    )
+
+@app.get("/items", response_model=schemas.ArenaItemPage)
+def browse_items(
+    cursor: str = None,
+    limit: int = 50,
+    prefix: str = None,
+    lifecycle: str = None,
+    category: str = None,
+    transfer: str = None,
+    q: str = None,
+    profile_id: int = None,
+    db: Session = Depends(get_db)
+):
+    """Keyset-paginated browse/search over harvested Arena items. Pass next_cursor back as ?cursor= for the next page."""
+    try:
+        items, next_cursor = catalog_service.search_items(
+            db, cursor=cursor, limit=limit, prefix=prefix,
+            lifecycle=lifecycle, category=category, transfer=transfer, q=q,
+            profile_id=profile_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/items/{guid}", response_model=schemas.ArenaItem)
+def read_item(guid: str, db: Session = Depends(get_db)):
+    item = db.query(models.ArenaItem).filter(models.ArenaItem.guid == guid).first()
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return item
+
+@app.get("/admin/work")
+def get_work_stats():
+    """Queue depth per priority class, upstream slot usage, and Arena request hedging counters."""
+    return {**work_scheduler.get_scheduler().stats(), "hedging": arena_service.hedge_stats()}
+
+@app.get("/admin/circuits")
+def get_circuits():
+    """Circuit breaker state, totals, per-minute series and recent transitions per upstream and profile."""
+    return circuit_breaker.stats()
+
+@app.get("/admin/quota")
+def get_quota(profile_id: int = None, db: Session = Depends(get_db)):
+    """Today's Arena and Cin7 calls of a profile against its daily budget, and what is left for bulk and on-demand work."""
+    config = require_profile(db, profile_id)
+    if not config:
+        raise HTTPException(status_code=400, detail="Configuration missing")
+    return quota_service.usage(config.id)
+
+@app.get("/sync/plan")
+def plan_full_sync(dry_run: bool = True, profile_id: int = None, force_full: bool = False, db: Session = Depends(get_db)):
+    """Estimated Arena and Cin7 calls of a full sync, and whether it fits the remaining call budgets."""
+    config = require_profile(db, profile_id)
+    if not config:
+        raise HTTPException(status_code=400, detail="Configuration missing")
+    changed_since = sync_service.push_changed_since(db, config, force_full)
+    return quota_service.plan(db, config, dry_run, changed_since)
 
 @app.get("/rules", response_model=list[schemas.SyncRule])
 def read_rules(db: Session = Depends(get_db)):
@@ -176,6 +686,21 @@ def create_rule(rule: schemas.SyncRuleCreate, db: Session = Depends(get_db)):
     db.refresh(db_rule)
     return db_rule
 
+@app.get("/mapping")
+def read_field_mapping(profile_id: int = None, db: Session = Depends(get_db)):
+    """The field mapping spec a profile's runs compile (its own, else the global one, else the default)."""
+    return mapping_service.get_spec(db, profile_id)
+
+@app.put("/mapping")
+def update_field_mapping(spec: dict, profile_id: int = None, db: Session = Depends(get_db)):
+    """Stores a field mapping spec for a profile (or globally without profile_id). Applies from the next run."""
+    if profile_id is not None:
+        require_profile(db, profile_id)
+    try:
+        return mapping_service.set_spec(db, spec, profile_id)
+    except mapping_service.MappingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.put("/rules/{rule_id}", response_model=schemas.SyncRule)
 def update_rule(rule_id: int, rule_update: schemas.SyncRuleUpdate, db: Session = Depends(get_db)):
     db_rule = db.query(models.SyncRule).filter(models.SyncRule.id == rule_id).first()
@@ -1,23 +1,89 @@
-import sqlite3
+import sys
+import os
+
+# Allow running as a script from the repo root or from backend/
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import inspect, literal, text
+
+from backend import models, database
+
+def _default_clause(column, dialect):
+    default = column.default
+    if default is None or not default.is_scalar:
+        return ""
+    value = literal(default.arg, type_=column.type).compile(
+        dialect=dialect, compile_kwargs={"literal_binds": True}
+    )
+    return f" DEFAULT {value}"
+
+# Tables whose key gained profile_id since they were first created
+REKEYED_TABLES = ("cin7_bom_snapshots",)
+
+def rebuild_rekeyed_tables(engine):
+    """
+    Rebuilds the REKEYED_TABLES still in their old shape, since SQLite can't change a
+    table's key in place: the old table is renamed, created again from the model and
+    its rows copied over. Copied rows have no profile_id until assign_unowned_rows
+    hands them to the default profile. Returns the tables rebuilt.
+    """
+    inspector = inspect(engine)
+    rebuilt = []
+    for name in REKEYED_TABLES:
+        if not inspector.has_table(name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(name)}
+        if "profile_id" in existing:
+            continue
+        table = models.Base.metadata.tables[name]
+        shared = ", ".join(c.name for c in table.columns if c.name in existing)
+        with engine.begin() as conn:
+            # Index names are global: free them for the new table
+            for index in inspector.get_indexes(name):
+                conn.execute(text(f"DROP INDEX {index['name']}"))
+            conn.execute(text(f"ALTER TABLE {name} RENAME TO {name}_old"))
+            table.create(conn)
+            conn.execute(text(f"INSERT INTO {name} ({shared}) SELECT {shared} FROM {name}_old"))
+            conn.execute(text(f"DROP TABLE {name}_old"))
+        rebuilt.append(name)
+    return rebuilt
+
+def add_missing_columns(engine):
+    """
+    Adds any model column that is missing from an existing table, with its indexes.
+    create_all only creates missing tables, so new columns on existing
+    tables (e.g. configuration) need this. Returns the columns added.
+    """
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table in models.Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl_type = column.type.compile(dialect=engine.dialect)
+                default = _default_clause(column, engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl_type}{default}"))
+                for index in table.indexes:
+                    if column.name in index.columns.keys():
+                        index.create(conn, checkfirst=True)
+                added.append(f"{table.name}.{column.name}")
+    return added
 
 def migrate_db():
     try:
-        conn = sqlite3.connect("connector.db")
-        cursor = conn.cursor()
-        
-        # Check if column exists
-        cursor.execute("PRAGMA table_info(configuration)")
-        columns = [row[1] for row in cursor.fetchall()]
-        
-        if "item_prefix_filter" not in columns:
-            print("Adding 'item_prefix_filter' column to 'configuration' table...")
-            cursor.execute("ALTER TABLE configuration ADD COLUMN item_prefix_filter TEXT DEFAULT '06-'")
-            conn.commit()
-            print("Migration successful.")
+        models.Base.metadata.create_all(bind=database.engine)
+        rebuilt = rebuild_rekeyed_tables(database.engine)
+        if rebuilt:
+            print(f"Rebuilt tables: {', '.join(rebuilt)}")
+        added = add_missing_columns(database.engine)
+        if added:
+            print(f"Added columns: {', '.join(added)}")
         else:
-            print("Column 'item_prefix_filter' already exists.")
-            
-        conn.close()
+            print("Schema is up to date.")
     except Exception as e:
         print(f"Migration failed: {e}")
 
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Float, Index, UniqueConstraint
 from .database import Base
 from datetime import datetime
 
 class Configuration(Base):
+    """
+    A connection profile: one Arena workspace paired with one Cin7 account.
+    The lowest id is the default profile used when a request names none.
+    """
     __tablename__ = "configuration"
     id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, default="default")
     arena_workspace_id = Column(String, default="")
     arena_email = Column(String, default="")
     arena_password = Column(String, default="")
@@ -16,15 +21,44 @@ class Configuration(Base):
     is_cin7_connected = Column(Boolean, default=False)
     item_prefix_filter = Column(String, default="*")
 
+    # Change poller schedule (minutes). The poller tightens towards the minimum while
+    # Arena change activity is high and backs off towards the maximum while idle.
+    sync_interval_minutes = Column(Integer, default=5)
+    min_sync_interval_minutes = Column(Integer, default=1)
+    max_sync_interval_minutes = Column(Integer, default=30)
+
+    # Inbound change-completed notifications: shared HMAC secret, and how long a
+    # queued change waits for duplicate notifications before it is synced.
+    webhook_secret = Column(String, default="")
+    change_debounce_seconds = Column(Integer, default=30)
+    checkpoint_interval = Column(Integer, default=50)   # items between full-sync checkpoints
+    # GUID of the "Transfer Data to ERP?" attribute in this workspace. When set, the harvest
+    # asks Arena to list only items with it set to "Yes" instead of checking every item's details.
+    transfer_attribute_guid = Column(String, default="")
+    # Incremental push: rows changed after push_watermark are pushed, as long as the mapping,
+    # rules and prefix filter still hash to push_scope_hash (otherwise the next push is full)
+    push_watermark = Column(DateTime, nullable=True)
+    push_scope_hash = Column(String, nullable=True)
+    # Upstream call quotas (0 = unlimited). Bulk and poller work stop short of the last
+    # call_budget_reserve_percent of a daily budget, which is kept for on-demand syncs.
+    arena_daily_call_budget = Column(Integer, default=0)
+    cin7_daily_call_budget = Column(Integer, default=0)
+    arena_run_call_budget = Column(Integer, default=0)
+    cin7_run_call_budget = Column(Integer, default=0)
+    call_budget_reserve_percent = Column(Integer, default=10)
+    # Wall-clock limit of one full sync attempt, in minutes (0 = none); a run past it is cancelled
+    run_deadline_minutes = Column(Integer, default=0)
+
 class ArenaItem(Base):
     __tablename__ = "arena_items"
     
     guid = Column(String, primary_key=True, index=True)
+    profile_id = Column(Integer, index=True, nullable=True)  # Configuration.id the item was harvested for
     item_number = Column(String, index=True)
     item_name = Column(String)
-    lifecycle_phase = Column(String)
+    lifecycle_phase = Column(String, index=True)
     revision = Column(String)
-    category = Column(String)
+    category = Column(String, index=True)
     description = Column(Text, nullable=True)
     uom = Column(String)
     
@@ -36,14 +70,22 @@ class ArenaItem(Base):
     sellable = Column(String, nullable=True)
     internal_note_erp = Column(Text, nullable=True)
     last_glg_co = Column(String, nullable=True)
-    transfer_to_erp = Column(String, default="No")
+    transfer_to_erp = Column(String, default="No", index=True)
     
     # Sourcing & BOM
     manufacturer = Column(String, nullable=True)
     manufacturer_item_number = Column(String, nullable=True)
     parent_item_number = Column(String, nullable=True)
+    bom_revision = Column(String, nullable=True)  # revision whose BOM the where-used index (BomEdge) holds
     
-    last_updated = Column(DateTime, default=datetime.utcnow)
+    last_updated = Column(DateTime, default=datetime.utcnow)  # set by the harvest when the row's content changes
+
+    __table_args__ = (
+        # Keyset pagination order for the /items browse API
+        Index("ix_arena_items_number_guid", "item_number", "guid"),
+        # Incremental push: a profile's rows changed since its watermark
+        Index("ix_arena_items_profile_updated", "profile_id", "last_updated"),
+    )
 
 
 class SyncRule(Base):
@@ -52,4 +94,185 @@ class SyncRule(Base):
     rule_key = Column(String, unique=True)  # e.g., "RevenueAccount"
     rule_name = Column(String)              # e.g., "Default Product Revenue Account"
     rule_value = Column(String)             # e.g., "4001: OEM Product"
-    is_enabled = Column(Boolean, default=True)
\ No newline at end of file
+    is_enabled = Column(Boolean, default=True)
+
+
+class ProfileRule(Base):
+    """Per-profile override of a global SyncRule."""
+    __tablename__ = "profile_rules"
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer, index=True)
+    rule_key = Column(String)
+    rule_value = Column(String)
+    is_enabled = Column(Boolean, default=True)
+
+    __table_args__ = (UniqueConstraint("profile_id", "rule_key", name="uq_profile_rules_profile_key"),)
+
+
+class Cin7BomSnapshot(Base):
+    """Last BOM lines the connector wrote to Cin7, used when a product lookup doesn't echo its BOM."""
+    __tablename__ = "cin7_bom_snapshots"
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer, index=True, nullable=True)
+    sku = Column(String, index=True)
+    product_id = Column(String, nullable=True)
+    lines = Column(Text, default="[]")           # JSON list of Cin7 BOM lines
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (UniqueConstraint("profile_id", "sku", name="uq_cin7_bom_snapshots_profile_sku"),)
+
+
+class BomUploadLog(Base):
+    """One row per BOM upload decision: uploaded with a diff, or skipped because nothing changed."""
+    __tablename__ = "bom_upload_log"
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer, index=True, nullable=True)
+    sku = Column(String, index=True)
+    product_id = Column(String, nullable=True)
+    action = Column(String)                      # "uploaded", "skipped" or "failed"
+    added = Column(Integer, default=0)
+    removed = Column(Integer, default=0)
+    changed = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+
+class ChangeQueueEntry(Base):
+    """Durable, de-duplicated queue of completed Arena changes waiting to be synced."""
+    __tablename__ = "change_queue"
+    change_guid = Column(String, primary_key=True, index=True)
+    profile_id = Column(Integer, index=True, nullable=True)
+    change_number = Column(String, nullable=True)
+    source = Column(String, default="webhook")   # "webhook" or "poller"
+    status = Column(String, default="pending", index=True)  # pending, processing, done, failed
+    received_at = Column(DateTime, default=datetime.utcnow)
+    due_at = Column(DateTime, default=datetime.utcnow, index=True)
+    claimed_at = Column(DateTime, nullable=True)
+    processed_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0)
+    items_synced = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+
+
+
+class Lease(Base):
+    """Time-limited named lock shared by all workers and replicas through the database."""
+    __tablename__ = "leases"
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=True)
+    acquired_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+
+
+class PushPartition(Base):
+    """One SKU-hash slice of a partitioned bulk push, claimed by whichever node holds its lease."""
+    __tablename__ = "push_partitions"
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String, index=True)
+    profile_id = Column(Integer, nullable=True)
+    partition_index = Column(Integer)
+    partition_count = Column(Integer)
+    dry_run = Column(Boolean, default=True)
+    status = Column(String, default="pending", index=True)  # pending, running, done, failed
+    holder = Column(String, nullable=True)
+    summary = Column(Text, nullable=True)                     # JSON push summary
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class SyncRun(Base):
+    """A full sync (harvest + push) with the checkpoint it resumes from after a crash, deploy or cancel."""
+    __tablename__ = "sync_runs"
+    run_id = Column(String, primary_key=True)        # uuid4 hex, same ID as the run's artifact
+    profile_id = Column(Integer, nullable=True)
+    dry_run = Column(Boolean, default=True)
+    status = Column(String, default="running", index=True)  # running, interrupted, cancelled, complete, failed
+    stage = Column(String, default="harvest")        # harvest, push, done
+    harvest_shards = Column(Text, nullable=True)     # JSON {prefix: {offset, last_guid, done}} to resume each shard at
+    harvest_summary = Column(Text, nullable=True)    # JSON harvest counters so far
+    push_summary = Column(Text, nullable=True)       # JSON push counters so far
+    changed_since = Column(DateTime, nullable=True)  # push selects rows updated after this; NULL pushes all
+    push_started_at = Column(DateTime, nullable=True)  # becomes the profile's push watermark if the run completes live
+    cancel_requested_at = Column(DateTime, nullable=True)  # set by the cancel endpoint; the executing node polls it
+    message = Column(Text, nullable=True)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    checkpoint_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class SyncRunItem(Base):
+    """Outcome of one pushed SKU within a SyncRun; a resumed push skips SKUs listed here."""
+    __tablename__ = "sync_run_items"
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String, index=True)
+    sku = Column(String)
+    outcome = Column(String)                         # success, mocked or failed
+    error = Column(Text, nullable=True)
+
+
+class DeadLetterItem(Base):
+    """A SKU whose sync failed, retried on its own with backoff until it succeeds or is parked."""
+    __tablename__ = "dead_letter_items"
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer, index=True, nullable=True)
+    sku = Column(String, index=True)
+    source = Column(String)                          # push, change or retry
+    change_guid = Column(String, nullable=True)      # change that carried the item, for source=change
+    error_class = Column(String)                     # transient, validation, auth, not_found, unknown
+    last_error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    status = Column(String, default="pending", index=True)  # pending, retrying, parked, resolved
+    first_failed_at = Column(DateTime, default=datetime.utcnow)
+    last_failed_at = Column(DateTime, default=datetime.utcnow)
+    next_retry_at = Column(DateTime, nullable=True, index=True)
+    resolved_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (UniqueConstraint("profile_id", "sku", name="uq_dead_letter_profile_sku"),)
+
+
+class SkippedItem(Base):
+    """An item the harvest filtered out, remembered so an unchanged revision costs no detail call."""
+    __tablename__ = "skipped_items"
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer, index=True, nullable=True)
+    guid = Column(String, index=True)
+    revision = Column(String, nullable=True)         # revision the verdict was reached on
+    reason = Column(String)                          # skipped_lifecycle or skipped_transfer_erp
+    rules_hash = Column(String)                      # filter definition the verdict was reached under
+    skipped_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (UniqueConstraint("profile_id", "guid", name="uq_skipped_items_profile_guid"),)
+
+
+class BomEdge(Base):
+    """One BOM line (parent assembly -> component) as last seen in Arena, for where-used lookups."""
+    __tablename__ = "bom_edges"
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer, index=True, nullable=True)
+    parent_sku = Column(String, index=True)
+    child_sku = Column(String, index=True)
+    quantity = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (UniqueConstraint("profile_id", "parent_sku", "child_sku", name="uq_bom_edges_parent_child"),)
+
+
+class FieldMapping(Base):
+    """A declarative Arena -> Cin7 field mapping spec (see mapping_service); profile_id NULL is the global one."""
+    __tablename__ = "field_mappings"
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer, index=True, nullable=True, unique=True)
+    spec = Column(Text)                              # JSON spec
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ApiUsage(Base):
+    """Calls made to one upstream for one profile on one UTC day, summed over every replica."""
+    __tablename__ = "api_usage"
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer, index=True, nullable=True)
+    upstream = Column(String)                        # arena or cin7
+    day = Column(String)                             # YYYY-MM-DD (UTC)
+    calls = Column(Integer, default=0)
+
+    __table_args__ = (UniqueConstraint("profile_id", "upstream", "day", name="uq_api_usage_profile_upstream_day"),)
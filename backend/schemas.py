@@ -4,6 +4,7 @@ from typing import Optional
 
 # Configuration Schemas
 class ConfigurationBase(BaseModel):
+    name: str = "default"
     arena_workspace_id: str = ""
     arena_email: str = ""
     arena_password: str = ""
@@ -11,6 +12,19 @@ class ConfigurationBase(BaseModel):
     cin7_api_key: str = ""
     auto_sync_enabled: bool = False
     item_prefix_filter: str = "*" # Added to match new model field
+    sync_interval_minutes: int = 5
+    min_sync_interval_minutes: int = 1
+    max_sync_interval_minutes: int = 30
+    webhook_secret: str = ""
+    change_debounce_seconds: int = 30
+    checkpoint_interval: int = 50
+    transfer_attribute_guid: str = ""
+    arena_daily_call_budget: int = 0
+    cin7_daily_call_budget: int = 0
+    arena_run_call_budget: int = 0
+    cin7_run_call_budget: int = 0
+    call_budget_reserve_percent: int = 10
+    run_deadline_minutes: int = 0
 
 class ConfigurationCreate(ConfigurationBase):
     pass
@@ -44,6 +58,70 @@ class SyncRule(SyncRuleBase):
     class Config:
         from_attributes = True
 
+class ProfileRuleUpdate(BaseModel):
+    rule_value: str
+    is_enabled: bool = True
+
+# Harvested Item Schemas
+class ArenaItem(BaseModel):
+    guid: str
+    profile_id: Optional[int] = None
+    item_number: Optional[str] = None
+    item_name: Optional[str] = None
+    lifecycle_phase: Optional[str] = None
+    revision: Optional[str] = None
+    category: Optional[str] = None
+    description: Optional[str] = None
+    uom: Optional[str] = None
+    sellable: Optional[str] = None
+    transfer_to_erp: Optional[str] = None
+    manufacturer: Optional[str] = None
+    manufacturer_item_number: Optional[str] = None
+    last_updated: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ArenaItemPage(BaseModel):
+    items: list[ArenaItem]
+    next_cursor: Optional[str] = None
+
+# Change Queue Schemas
+class ChangeQueueEntry(BaseModel):
+    change_guid: str
+    profile_id: Optional[int] = None
+    change_number: Optional[str] = None
+    source: str
+    status: str
+    received_at: datetime
+    due_at: datetime
+    processed_at: Optional[datetime] = None
+    attempts: int = 0
+    items_synced: int = 0
+    last_error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+# Dead-Letter Schemas
+class DeadLetterItem(BaseModel):
+    id: int
+    profile_id: Optional[int] = None
+    sku: str
+    source: Optional[str] = None
+    change_guid: Optional[str] = None
+    error_class: Optional[str] = None
+    last_error: Optional[str] = None
+    attempts: int = 0
+    status: str
+    first_failed_at: Optional[datetime] = None
+    last_failed_at: Optional[datetime] = None
+    next_retry_at: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 # Result Schemas
 class SyncResult(BaseModel):
     status: str
@@ -1,21 +1,223 @@
-import requests
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlencode
+import contextvars
+import os
+import re
+import threading
+import time
+from . import work_scheduler, json_codec, circuit_breaker, quota_service, cancellation
 
 logger = logging.getLogger(__name__)
 
+# Hedging: an idempotent GET still outstanding after its endpoint's p95 latency gets a
+# duplicate, and the first response wins. Off unless enabled; hedges are capped at
+# HEDGE_MAX_RATIO of requests so a slow Arena never doubles the quota spent.
+HEDGE_ENABLED = os.getenv("ARENA_HEDGE_REQUESTS", "false").lower() == "true"
+HEDGE_MAX_RATIO = float(os.getenv("ARENA_HEDGE_MAX_RATIO", "0.05"))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_SECONDS = 0.05
+HEDGE_THREADS = int(os.getenv("ARENA_HEDGE_THREADS", "32"))
+
+_GUID_SEGMENT = re.compile(r"/(items|changes)/[^/?]+")
+
+
+class ListingError(RuntimeError):
+    """A page of the item listing could not be fetched."""
+
+
+class LatencyTracker:
+    """Rolling window of one endpoint's successful response times."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self):
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+_trackers = {}
+_hedge_lock = threading.Lock()
+_hedge_counts = {"requests": 0, "hedged": 0, "hedge_wins": 0}
+_hedge_pool = None
+
+def _tracker(tenant, endpoint: str):
+    with _hedge_lock:
+        tracker = _trackers.get((tenant, endpoint))
+        if tracker is None:
+            tracker = _trackers[(tenant, endpoint)] = LatencyTracker()
+        return tracker
+
+def _pool():
+    global _hedge_pool
+    with _hedge_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_THREADS, thread_name_prefix="arena-hedge")
+        return _hedge_pool
+
+def _count(field: str, allow_ratio: float = None):
+    """Bumps a hedging counter; with allow_ratio, only if hedges stay under that share of requests."""
+    with _hedge_lock:
+        if allow_ratio is not None and _hedge_counts["hedged"] >= allow_ratio * _hedge_counts["requests"]:
+            return False
+        _hedge_counts[field] += 1
+        return True
+
+def hedge_stats():
+    with _hedge_lock:
+        counts = dict(_hedge_counts)
+        trackers = dict(_trackers)
+    counts["p95_seconds"] = {
+        f"{endpoint}" if tenant is None else f"{tenant}:{endpoint}": tracker.p95()
+        for (tenant, endpoint), tracker in trackers.items()
+    }
+    return counts
+
+
+class ItemSummary:
+    """
+    The parts of an /items listing entry the harvest uses. Slotted and stripped of
+    the rest of the JSON so that 100k-item listings stay small in memory.
+    """
+    __slots__ = ("guid", "number", "name", "revision", "lifecycle", "transfer")
+
+    def __init__(self, guid, number, name=None, revision=None, lifecycle=None, transfer=None):
+        self.guid = guid
+        self.number = number
+        self.name = name
+        self.revision = revision
+        self.lifecycle = lifecycle   # None if the listing did not carry the phase
+        self.transfer = transfer     # "Transfer Data to ERP?", None if not listed
+
+    @classmethod
+    def from_json(cls, data):
+        transfer = None
+        for attr in data.get("additionalAttributes") or []:
+            if attr.get("name") == "Transfer Data to ERP?":
+                transfer = attr.get("value")
+        return cls(
+            data.get("guid"),
+            data.get("number"),
+            data.get("name"),
+            data.get("revisionNumber"),
+            (data.get("lifecyclePhase") or {}).get("name"),
+            transfer
+        )
+
+
 class ArenaClient:
-    def __init__(self, workspace_id, email, password):
+    def __init__(self, workspace_id, email, password, tenant=None, session=None, hedge=None, budget=None, cancel=None):
         self.base_url = "https://api.arenasolutions.com/v1"
         self.workspace_id = workspace_id
         self.email = email
         self.password = password
         self.session_id = None
+        # Why the last login() was not even attempted (a call budget is used up), if it wasn't
+        self.login_refused = None
+        # Connection profile this client belongs to: selects its concurrency budget and
+        # (when given) its own pooled HTTP session
+        self.tenant = tenant
+        if session is None:
+            # Imported on first use rather than with the app
+            import requests
+            session = requests
+        self.http = session
+        # Per-run call budget (quota_service.RunBudget) on top of the profile's daily budget
+        self.budget = budget
+        # The run's cancellation.CancelToken: once it is cancelled no further call is sent,
+        # and calls are cut short at its deadline
+        self.cancel = cancel
+        self.hedge = HEDGE_ENABLED if hedge is None else hedge
         # Headers initialized with the format Arena requested in your test
         self.headers = {
             "Content-Type": "application/json",
             "Arena-Usage-Reason": "JobinAndJismi Cin7-Connector/1.0 Initial-Harvest"
         }
 
+    def _request(self, method, url, **kwargs):
+        """
+        Sends one HTTP request through this profile's Arena circuit breaker and
+        concurrency budget. Raises CircuitOpenError at once while the upstream is down,
+        QuotaExceeded when a call budget is used up, Cancelled once the run is cancelled
+        and DeadlineExceeded once its deadline has passed (a call's timeout is clipped to
+        it). GETs are hedged when hedging is enabled (a hedge is a call of its own and is
+        charged as one).
+        """
+        if "json" in kwargs:
+            # Encode bodies with the shared codec rather than requests' stdlib encoder
+            kwargs["data"] = json_codec.dumps(kwargs.pop("json"))
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "Content-Type": "application/json"}
+        breaker = circuit_breaker.get("arena", self.tenant)
+
+        def send():
+            import requests
+            cancellation.check(self.cancel)
+            quota_service.charge("arena", self.tenant, self.budget)
+            with work_scheduler.upstream_slot("arena", self.tenant):
+                # The wait for a slot can be long: check again and clip to what is left of the deadline
+                timeout, clipped = cancellation.call_timeout(self.cancel, kwargs.get("timeout"))
+                try:
+                    return self.http.request(method, url, **{**kwargs, "timeout": timeout})
+                except requests.exceptions.Timeout:
+                    if clipped:
+                        raise cancellation.timed_out(self.cancel, f"Arena {method} {url}")
+                    raise
+
+        if method != "GET" or not self.hedge:
+            return breaker.call(send)
+        return self._hedged(lambda: breaker.call(send), self._endpoint(url))
+
+    def _endpoint(self, url):
+        """Latency bucket of a URL: its path with item/change GUIDs folded, e.g. /items/{guid}/bom."""
+        return _GUID_SEGMENT.sub(r"/\1/{guid}", url.split("?")[0].replace(self.base_url, ""))
+
+    def _hedged(self, attempt, endpoint: str):
+        """Runs attempt(), adding a duplicate once it outlasts the endpoint's p95; the first response wins."""
+        tracker = _tracker(self.tenant, endpoint)
+        delay = tracker.p95()
+        _count("requests")
+
+        def timed():
+            started = time.monotonic()
+            response = attempt()
+            if response.status_code < 500:
+                tracker.record(time.monotonic() - started)
+            return response
+
+        # Each attempt runs in a copy of the caller's context so it keeps its priority class
+        pool = _pool()
+        first = pool.submit(contextvars.copy_context().run, timed)
+        pending = {first}
+        if delay is not None:
+            done, _ = wait(pending, timeout=max(delay, HEDGE_MIN_DELAY_SECONDS))
+            if not done and _count("hedged", allow_ratio=HEDGE_MAX_RATIO):
+                pending.add(pool.submit(contextvars.copy_context().run, timed))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is not first:
+                    _count("hedge_wins")
+                # The slower attempt finishes in the background; its response is dropped
+                return response
+        raise error
+
     def login(self):
         url = f"{self.base_url}/login"
         payload = {
@@ -23,10 +225,11 @@ class ArenaClient:
             "email": self.email, 
             "password": self.password
         }
+        self.login_refused = None
         try:
-            response = requests.post(url, json=payload, timeout=10)
+            response = self._request("POST", url, json=payload, timeout=10)
             if response.status_code == 200:
-                data = response.json()
+                data = json_codec.decode(response)
                 # Use the verified key 'arenaSessionId' from your test login output
                 self.session_id = data.get("arenaSessionId")
                 
@@ -42,23 +245,42 @@ class ArenaClient:
                 logger.info(f"Arena Login Successful. Workspace: {data.get('workspaceName')}")
                 return True
             else:
-                error_data = response.json() if response.text else {}
+                error_data = json_codec.decode(response) if response.text else {}
                 error_msg = error_data.get("note") or error_data.get("reason") or response.text
                 logger.error(f"Arena login failed: {response.status_code} - {error_msg}")
                 self.last_error = f"Arena Login Error ({response.status_code}): {error_msg}"
                 return False
+        except quota_service.QuotaExceeded as e:
+            # Not a login failure: the credentials were never sent
+            self.login_refused = f"Arena login not attempted: {e}"
+            logger.warning(self.login_refused)
+            return False
         except Exception as e:
             logger.error(f"Arena login exception: {str(e)}")
             return False
 
     def list_all_items(self, prefix_filter=None):
-        """Fetches all item summaries using pagination with server-side filtering."""
+        """Fetches all item summaries (ItemSummary) using pagination with server-side filtering."""
         if not self.session_id:
             return []
             
         all_items = []
-        offset = 0
-        limit = 400
+        try:
+            for _, items in self.iter_item_pages(prefix_filter):
+                all_items.extend(items)
+        except ListingError as e:
+            logger.error(str(e))
+        return all_items
+
+    def iter_item_pages(self, prefix_filter=None, start_offset=0, limit=400, criteria=None):
+        """
+        Yields (offset, [ItemSummary]) one page at a time, starting at start_offset,
+        so a checkpointed harvest can resume at the page it stopped on.
+        criteria adds further search parameters, e.g. {attribute_guid: "Yes"} to list
+        only items whose additional attribute has that value.
+        Raises ListingError if a page cannot be fetched.
+        """
+        offset = start_offset
         
         # Prepare search query
         # Ensure wildcard is applied exactly once, whether user includes it or not
@@ -67,44 +289,41 @@ class ArenaClient:
             search_param = f"&number={clean_filter}*" 
         else:
             search_param = ""
+        if criteria:
+            search_param += "&" + urlencode(criteria)
         
         while True:
             url = f"{self.base_url}/items?offset={offset}&limit={limit}{search_param}"
-            response = requests.get(url, headers=self.headers, timeout=15)
-            
-            if response.status_code == 200:
-                data = response.json()
-                items = data.get("results", [])
-                all_items.extend(items)
-                
-                if len(items) < limit:
-                    break
-                offset += limit
-            else:
-                logger.error(f"Failed to list items at offset {offset}: {response.text}")
+            response = self._request("GET", url, headers=self.headers, timeout=15)
+            if response.status_code != 200:
+                raise ListingError(f"Failed to list items at offset {offset}: {response.text}")
+
+            results = json_codec.decode(response).get("results", [])
+            yield offset, [ItemSummary.from_json(entry) for entry in results]
+            if len(results) < limit:
                 break
-        return all_items
+            offset += limit
 
     def get_item_details(self, guid):
         """Retrieves detailed information of an item by its GUID."""
         url = f"{self.base_url}/items/{guid}"
-        response = requests.get(url, headers=self.headers, timeout=10)
-        return response.json() if response.status_code == 200 else None
+        response = self._request("GET", url, headers=self.headers, timeout=10)
+        return json_codec.decode(response) if response.status_code == 200 else None
 
     def get_sourcing(self, guid):
         """Retrieves sourcing (manufacturer) information for an item."""
         url = f"{self.base_url}/items/{guid}/sourcing"
-        response = requests.get(url, headers=self.headers, timeout=10)
-        return response.json() if response.status_code == 200 else {}
+        response = self._request("GET", url, headers=self.headers, timeout=10)
+        return json_codec.decode(response) if response.status_code == 200 else {}
 
     def get_bom(self, guid):
-        """Retrieves the Bill of Materials (BOM) for an item."""
+        """Retrieves the Bill of Materials (BOM) lines for an item; None if Arena doesn't return them."""
         url = f"{self.base_url}/items/{guid}/bom"
-        response = requests.get(url, headers=self.headers, timeout=10)
+        response = self._request("GET", url, headers=self.headers, timeout=10)
         if response.status_code == 200:
-            data = response.json()
+            data = json_codec.decode(response)
             return data.get("results", [])
-        return []
+        return None
 
     def get_changes(self):
         """Fetches recent changes (ECOs/DCOs)."""
@@ -112,18 +331,24 @@ class ArenaClient:
         # We might want to sort by creationDate desc.
         # Arena API usually supports params like 'offset', 'limit'.
         url = f"{self.base_url}/changes?limit=50"
-        response = requests.get(url, headers=self.headers, timeout=15)
+        response = self._request("GET", url, headers=self.headers, timeout=15)
         if response.status_code == 200:
-            data = response.json()
+            data = json_codec.decode(response)
             return data.get("results", [])
         return []
 
+    def get_change(self, change_guid):
+        """Fetches a single change, e.g. to confirm the status claimed by a notification."""
+        url = f"{self.base_url}/changes/{change_guid}"
+        response = self._request("GET", url, headers=self.headers, timeout=15)
+        return json_codec.decode(response) if response.status_code == 200 else None
+
     def get_change_items(self, change_guid):
         """Fetches items affected by a specific change."""
         # Endpoint: /changes/{guid}/items
         url = f"{self.base_url}/changes/{change_guid}/items"
-        response = requests.get(url, headers=self.headers, timeout=15)
+        response = self._request("GET", url, headers=self.headers, timeout=15)
         if response.status_code == 200:
-            data = response.json()
+            data = json_codec.decode(response)
             return data.get("results", [])
         return []
\ No newline at end of file
@@ -0,0 +1,67 @@
+import gzip
+import logging
+import os
+import re
+import uuid
+from . import json_codec
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", "./backend/artifacts")
+
+_RUN_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+def new_run_id():
+    """Generates a new opaque run identifier."""
+    return uuid.uuid4().hex
+
+def artifact_path(run_id: str):
+    """Resolves the on-disk location of a run artifact. Rejects anything that isn't a run ID."""
+    if not _RUN_ID_PATTERN.match(run_id or ""):
+        raise ValueError(f"Invalid run id: {run_id}")
+    return os.path.join(ARTIFACT_DIR, f"{run_id}.ndjson.gz")
+
+def artifact_status(run_id: str):
+    """Returns 'ready', 'running' or 'missing' for a run artifact."""
+    path = artifact_path(run_id)
+    if os.path.exists(path):
+        return "ready"
+    if os.path.exists(path + ".part"):
+        return "running"
+    return "missing"
+
+def encode_ndjson(records):
+    """Encodes an iterable of dict records as NDJSON lines, one at a time."""
+    for record in records:
+        yield json_codec.dumps(record).decode("utf-8") + "\n"
+
+def reserve_artifact(run_id: str):
+    """Marks an artifact as running before its writer has started."""
+    path = artifact_path(run_id)
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    open(path + ".part", "wb").close()
+
+def write_artifact(run_id: str, records):
+    """
+    Drains a record iterator into a gzip-compressed NDJSON artifact.
+    The file is written under a .part suffix and renamed once complete,
+    so readers never see a half-written artifact as ready. Returns False (and leaves no
+    artifact behind) if the records or the write failed.
+    """
+    path = artifact_path(run_id)
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    part_path = path + ".part"
+    count = 0
+    try:
+        with gzip.open(part_path, "wt", encoding="utf-8") as f:
+            for line in encode_ndjson(records):
+                f.write(line)
+                count += 1
+        os.replace(part_path, path)
+        logger.info(f"Artifact {run_id} written ({count} records).")
+        return True
+    except Exception as e:
+        logger.error(f"Artifact {run_id} failed after {count} records: {e}")
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return False
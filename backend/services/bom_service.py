@@ -0,0 +1,104 @@
+from .. import models, database
+from datetime import datetime
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+def bom_lines(bom_resolved_list):
+    """Builds Cin7 BOM lines from resolved components ({"sku", "qty", "cin7_id"})."""
+    lines = []
+    for item in bom_resolved_list:
+        line = {"Quantity": item.get("qty", 0)}
+        if item.get("cin7_id"):
+            line["ComponentProductID"] = item.get("cin7_id")
+        else:
+            line["ProductCode"] = item.get("sku")
+        lines.append(line)
+    return lines
+
+def _quantity(line):
+    try:
+        return float(line.get("Quantity") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def diff_bom(current, desired):
+    """
+    Line-level diff between the BOM in Cin7 and the one we want to write.
+    Lines are matched by component product ID first, then by product code.
+    """
+    current_by_id = {l.get("ComponentProductID"): l for l in current if l.get("ComponentProductID")}
+    current_by_code = {l.get("ProductCode"): l for l in current if l.get("ProductCode")}
+
+    added, changed = [], []
+    matched = set()
+    for line in desired:
+        existing = current_by_id.get(line.get("ComponentProductID")) or current_by_code.get(line.get("ProductCode"))
+        if existing is None or id(existing) in matched:
+            added.append(line)
+            continue
+        matched.add(id(existing))
+        if _quantity(existing) != _quantity(line):
+            changed.append({"line": line, "was": _quantity(existing)})
+
+    removed = [l for l in current if id(l) not in matched]
+    return {"added": added, "removed": removed, "changed": changed}
+
+def is_empty(diff):
+    return not (diff["added"] or diff["removed"] or diff["changed"])
+
+def current_bom(profile_id, sku, product=None):
+    """
+    Current Cin7 BOM for a product: the lines echoed on the product lookup when present,
+    otherwise the snapshot of what the profile last wrote.
+    """
+    if product and product.get("BillOfMaterialsProducts") is not None:
+        return product.get("BillOfMaterialsProducts") or []
+
+    db = database.SessionLocal()
+    try:
+        snapshot = db.query(models.Cin7BomSnapshot).filter(
+            models.Cin7BomSnapshot.profile_id == profile_id, models.Cin7BomSnapshot.sku == sku
+        ).first()
+        return json.loads(snapshot.lines) if snapshot else []
+    finally:
+        db.close()
+
+def record_bom_sync(profile_id, sku, product_id, action, diff, lines=None):
+    """
+    Logs a BOM upload decision, and on a successful write snapshots the lines.
+    Uses its own session because it is called from push worker threads.
+    """
+    db = database.SessionLocal()
+    try:
+        db.add(models.BomUploadLog(
+            profile_id=profile_id,
+            sku=sku,
+            product_id=product_id,
+            action=action,
+            added=len(diff["added"]),
+            removed=len(diff["removed"]),
+            changed=len(diff["changed"])
+        ))
+        if lines is not None:
+            snapshot = db.query(models.Cin7BomSnapshot).filter(
+                models.Cin7BomSnapshot.profile_id == profile_id, models.Cin7BomSnapshot.sku == sku
+            ).first()
+            if snapshot is None:
+                snapshot = models.Cin7BomSnapshot(profile_id=profile_id, sku=sku)
+                db.add(snapshot)
+            snapshot.product_id = product_id
+            snapshot.lines = json.dumps(lines)
+            snapshot.updated_at = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to record BOM {action} for {sku}: {e}")
+    finally:
+        db.close()
+
+    if action == "skipped":
+        logger.info(f"BOM for {sku} unchanged, upload skipped.")
+    else:
+        logger.info(f"BOM for {sku} {action}: +{len(diff['added'])} -{len(diff['removed'])} ~{len(diff['changed'])}")
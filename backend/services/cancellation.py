@@ -0,0 +1,164 @@
+"""
+Cooperative cancellation of long-running syncs.
+
+A CancelToken is handed to a run's Arena and Cin7 clients, which refuse every call once
+it is cancelled, and is checked by the harvest writer, the push window and BOM
+recursion. Nothing is interrupted mid-call: a cancel takes effect at the next check, so
+at most the HTTP calls already in flight (each bounded by its timeout) finish first.
+
+A token can carry a wall-clock deadline, and a poll (e.g. a run's cancel flag in the
+database) so a cancel requested on another replica reaches it. Tokens of work running in
+this process are registered by name, which is how the cancel endpoint and shutdown find them.
+"""
+from contextlib import contextmanager
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# How often a token re-reads its poll (a DB query) at most
+POLL_SECONDS = float(os.getenv("CANCEL_POLL_SECONDS", "5"))
+# How long shutdown waits for cancelled work to wind down
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("SHUTDOWN_GRACE_SECONDS", "30"))
+
+CANCEL = "cancel"       # asked for through the API
+DEADLINE = "deadline"   # the run's wall-clock deadline passed
+SHUTDOWN = "shutdown"   # the process is shutting down; the run is left for another node
+
+
+class Cancelled(RuntimeError):
+    """The work's token was cancelled; not counted as an upstream failure."""
+
+
+class DeadlineExceeded(Cancelled):
+    """The work's deadline passed, before or during an upstream call."""
+
+
+class CancelToken:
+    def __init__(self, deadline_seconds: float = None, poll=None):
+        # poll() returns a reason string once the work should stop, else None
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self.reason = None
+        self.kind = None
+        self._poll = poll
+        self._polled_at = time.monotonic()
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self, reason: str = "Cancelled", kind: str = CANCEL):
+        """Cancels the token; the first reason wins."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason, self.kind = reason, kind
+            self._event.set()
+        logger.info(f"Cancelling: {reason}")
+
+    @property
+    def cancelled(self):
+        if self._event.is_set():
+            return True
+        now = time.monotonic()
+        if self.deadline is not None and now >= self.deadline:
+            self.cancel("Run deadline exceeded", DEADLINE)
+            return True
+        if self._poll is not None and now - self._polled_at >= POLL_SECONDS:
+            with self._lock:
+                due, self._polled_at = now - self._polled_at >= POLL_SECONDS, now
+            if due:
+                try:
+                    reason = self._poll()
+                except Exception as e:
+                    logger.warning(f"Could not check for a cancel request: {e}")
+                    reason = None
+                if reason:
+                    self.cancel(reason)
+        return self._event.is_set()
+
+    def check(self):
+        """Raises Cancelled once the token is cancelled, DeadlineExceeded once its deadline passed."""
+        if self.cancelled:
+            raise (DeadlineExceeded if self.kind == DEADLINE else Cancelled)(self.reason)
+
+    def remaining(self):
+        """Seconds left before the deadline, or None without one."""
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+def check(token: CancelToken = None):
+    """token.check() for callers whose token is optional."""
+    if token is not None:
+        token.check()
+
+def call_timeout(token: CancelToken, timeout):
+    """
+    An HTTP call's timeout clipped to what is left of the token's deadline, and whether
+    it was clipped. Raises like check() if the token is already cancelled or out of time.
+    """
+    check(token)
+    remaining = token.remaining() if token is not None else None
+    if remaining is None or (timeout is not None and timeout <= remaining):
+        return timeout, False
+    return max(remaining, 0.001), True
+
+def timed_out(token: CancelToken, what: str):
+    """Cancels the token for a call that timed out because its deadline clipped it; returns the error to raise."""
+    token.cancel("Run deadline exceeded", DEADLINE)
+    return DeadlineExceeded(f"Run deadline reached during {what}")
+
+
+_tokens = {}
+_closed = False
+_cond = threading.Condition()
+
+@contextmanager
+def running(name: str, token: CancelToken = None):
+    """
+    Registers the token (a new one if not given) under `name` for the duration of the
+    block. Once shutdown has begun, the token is cancelled straight away.
+    """
+    token = token or CancelToken()
+    with _cond:
+        _tokens[name] = token
+        closed = _closed
+    if closed:
+        token.cancel("Shutting down", SHUTDOWN)
+    try:
+        yield token
+    finally:
+        with _cond:
+            if _tokens.get(name) is token:
+                del _tokens[name]
+            _cond.notify_all()
+
+def cancel(name: str, reason: str = "Cancelled"):
+    """Cancels the work registered under `name` in this process. False if there is none."""
+    with _cond:
+        token = _tokens.get(name)
+    if token is None:
+        return False
+    token.cancel(reason)
+    return True
+
+def active():
+    with _cond:
+        return sorted(_tokens)
+
+def shutdown(grace_seconds: float = None):
+    """
+    Cancels all registered work and refuses new work, then waits up to grace_seconds for
+    it to wind down. Returns the names of work still running when the wait ended.
+    """
+    global _closed
+    grace = SHUTDOWN_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    with _cond:
+        _closed = True
+        tokens = list(_tokens.values())
+    for token in tokens:
+        token.cancel("Shutting down", SHUTDOWN)
+    ends = time.monotonic() + grace
+    with _cond:
+        while _tokens and time.monotonic() < ends:
+            _cond.wait(ends - time.monotonic())
+        return sorted(_tokens)
@@ -0,0 +1,128 @@
+import base64
+import json
+import logging
+import re
+from sqlalchemy import text, or_, and_
+from sqlalchemy.orm import Session
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "arena_items_fts"
+
+# External-content FTS5 table kept in step with arena_items by triggers,
+# so harvest code doesn't need to know the index exists.
+_FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        item_number, item_name, description,
+        content='arena_items', content_rowid='rowid'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS arena_items_fts_ai AFTER INSERT ON arena_items BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, item_number, item_name, description)
+        VALUES (new.rowid, new.item_number, new.item_name, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS arena_items_fts_ad AFTER DELETE ON arena_items BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, item_number, item_name, description)
+        VALUES ('delete', old.rowid, old.item_number, old.item_name, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS arena_items_fts_au AFTER UPDATE ON arena_items BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, item_number, item_name, description)
+        VALUES ('delete', old.rowid, old.item_number, old.item_name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, item_number, item_name, description)
+        VALUES (new.rowid, new.item_number, new.item_name, new.description);
+    END""",
+]
+
+MAX_PAGE_SIZE = 500
+
+def is_sqlite(bind):
+    return bind.dialect.name == "sqlite"
+
+def ensure_search_index(engine):
+    """
+    Creates the browse indexes and, on SQLite, the FTS table and its triggers.
+    create_all only builds indexes for new tables, so existing databases get them here.
+    """
+    for index in models.ArenaItem.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    if not is_sqlite(engine):
+        return
+
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type='table' AND name=:name"),
+            {"name": FTS_TABLE}
+        ).first()
+        for statement in _FTS_DDL:
+            conn.execute(text(statement))
+        if not exists:
+            # Backfill rows harvested before the index existed
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            logger.info("Built full-text index over harvested Arena items.")
+
+def encode_cursor(item):
+    raw = json.dumps([item.item_number, item.guid]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        item_number, guid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return item_number, guid
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _fts_query(q: str):
+    """Turns free text into an FTS5 prefix query, quoting each token so user input can't inject syntax."""
+    tokens = re.findall(r"\w+", q)
+    return " ".join(f'"{t}"*' for t in tokens)
+
+def search_items(db: Session, cursor: str = None, limit: int = 50, prefix: str = None,
+                 lifecycle: str = None, category: str = None, transfer: str = None, q: str = None,
+                 profile_id: int = None):
+    """
+    Keyset-paginated browse over harvested items, ordered by (item_number, guid).
+    Returns the page and the cursor for the next one (None on the last page).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    item = models.ArenaItem
+    query = db.query(item)
+
+    if profile_id is not None:
+        query = query.filter(item.profile_id == profile_id)
+    if prefix and prefix != "*":
+        # Range scan instead of LIKE so the item_number index is used
+        clean = prefix.rstrip("*")
+        query = query.filter(item.item_number >= clean, item.item_number < clean + "\uffff")
+    if lifecycle:
+        query = query.filter(item.lifecycle_phase == lifecycle)
+    if category:
+        query = query.filter(item.category == category)
+    if transfer:
+        query = query.filter(item.transfer_to_erp == transfer)
+    if q:
+        if is_sqlite(db.get_bind()):
+            match = _fts_query(q)
+            if not match:
+                return [], None
+            query = query.filter(text(
+                f"arena_items.rowid IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match)"
+            ).bindparams(match=match))
+        else:
+            pattern = f"%{q}%"
+            query = query.filter(or_(
+                item.item_number.ilike(pattern),
+                item.item_name.ilike(pattern),
+                item.description.ilike(pattern)
+            ))
+
+    if cursor:
+        after_number, after_guid = decode_cursor(cursor)
+        query = query.filter(or_(
+            item.item_number > after_number,
+            and_(item.item_number == after_number, item.guid > after_guid)
+        ))
+
+    rows = query.order_by(item.item_number, item.guid).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
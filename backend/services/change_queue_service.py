@@ -0,0 +1,128 @@
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from .. import models
+import hashlib
+import hmac
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_TOLERANCE_SECONDS = 300
+MAX_ATTEMPTS = 5
+# A change keeps absorbing duplicate notifications for at most this many debounce windows
+MAX_DEBOUNCE_WINDOWS = 5
+# Entries left 'processing' this long (e.g. by a crashed worker) are handed out again
+STALE_CLAIM_MINUTES = 30
+
+def sign_payload(secret: str, timestamp: str, body: bytes):
+    """HMAC-SHA256 over '<timestamp>.<body>', hex encoded with a 'sha256=' prefix."""
+    message = timestamp.encode() + b"." + body
+    return "sha256=" + hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+def verify_signature(secret: str, body: bytes, timestamp: str, signature: str):
+    """Checks a notification's signature and rejects stale timestamps to stop replays."""
+    if not secret or not timestamp or not signature:
+        return False
+    try:
+        sent_at = int(timestamp)
+    except ValueError:
+        return False
+    if abs(time.time() - sent_at) > SIGNATURE_TOLERANCE_SECONDS:
+        return False
+    return hmac.compare_digest(sign_payload(secret, timestamp, body), signature)
+
+def enqueue(db: Session, change_guid: str, change_number: str = None, source: str = "webhook", debounce_seconds: int = 0, profile_id: int = None):
+    """
+    Adds a completed change to the queue. Returns True if it is new.
+    A repeat notification for a pending change pushes its due time back (debounce),
+    capped so a noisy change still gets synced; already processed changes are ignored.
+    """
+    now = datetime.utcnow()
+    entry = db.query(models.ChangeQueueEntry).filter(models.ChangeQueueEntry.change_guid == change_guid).first()
+
+    if entry is None:
+        db.add(models.ChangeQueueEntry(
+            change_guid=change_guid,
+            profile_id=profile_id,
+            change_number=change_number,
+            source=source,
+            status="pending",
+            received_at=now,
+            due_at=now + timedelta(seconds=debounce_seconds)
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent notification queued the same change first
+            db.rollback()
+            return False
+        logger.info(f"Queued change {change_number or change_guid} from {source}.")
+        return True
+
+    if entry.status == "pending" and debounce_seconds:
+        latest = entry.received_at + timedelta(seconds=debounce_seconds * MAX_DEBOUNCE_WINDOWS)
+        entry.due_at = min(now + timedelta(seconds=debounce_seconds), latest)
+        db.commit()
+    return False
+
+def is_processed(db: Session, change_guid: str):
+    entry = db.query(models.ChangeQueueEntry).filter(models.ChangeQueueEntry.change_guid == change_guid).first()
+    return entry is not None and entry.status in ("processing", "done", "failed")
+
+def claim_due(db: Session, limit: int = 20, profile_id: int = None):
+    """
+    Atomically claims up to `limit` due entries (of one profile, if given) for processing, oldest due first.
+    The conditional update makes concurrent drains skip entries someone else claimed.
+    """
+    now = datetime.utcnow()
+    entry = models.ChangeQueueEntry
+
+    db.query(entry).filter(
+        entry.status == "processing",
+        entry.claimed_at < now - timedelta(minutes=STALE_CLAIM_MINUTES)
+    ).update({"status": "pending"}, synchronize_session=False)
+    db.commit()
+
+    candidates = db.query(entry.change_guid).filter(entry.status == "pending", entry.due_at <= now)
+    if profile_id is not None:
+        candidates = candidates.filter(entry.profile_id == profile_id)
+    candidates = candidates.order_by(entry.due_at).limit(limit).all()
+
+    claimed = []
+    for (guid,) in candidates:
+        updated = db.query(entry).filter(
+            entry.change_guid == guid, entry.status == "pending"
+        ).update({"status": "processing", "claimed_at": now}, synchronize_session=False)
+        db.commit()
+        if updated:
+            claimed.append(db.query(entry).filter(entry.change_guid == guid).first())
+    return claimed
+
+def mark_done(db: Session, entry, items_synced: int = 0, error: str = None):
+    entry.status = "done"
+    entry.processed_at = datetime.utcnow()
+    entry.attempts = (entry.attempts or 0) + 1
+    entry.items_synced = items_synced
+    entry.last_error = error
+    db.commit()
+
+def mark_retry(db: Session, entry, error: str):
+    """Puts an entry back with exponential backoff, or fails it after MAX_ATTEMPTS."""
+    entry.attempts = (entry.attempts or 0) + 1
+    entry.last_error = error
+    if entry.attempts >= MAX_ATTEMPTS:
+        entry.status = "failed"
+        entry.processed_at = datetime.utcnow()
+        logger.error(f"Change {entry.change_number or entry.change_guid} failed after {entry.attempts} attempts: {error}")
+    else:
+        entry.status = "pending"
+        entry.due_at = datetime.utcnow() + timedelta(seconds=min(30 * 2 ** entry.attempts, 3600))
+    db.commit()
+
+def release(db: Session, entries):
+    """Returns claimed entries to the queue untouched (e.g. Arena login failed)."""
+    for entry in entries:
+        entry.status = "pending"
+    db.commit()
@@ -1,38 +1,105 @@
-import requests
 import logging
+from . import work_scheduler, json_codec, circuit_breaker, quota_service, cancellation
 
 logger = logging.getLogger(__name__)
 
 class Cin7Client:
-    def __init__(self, account_id, api_key):
+    def __init__(self, account_id, api_key, tenant=None, session=None, budget=None, cancel=None):
         self.base_url = "https://inventory.dearsystems.com/ExternalApi/v2"
+        self.tenant = tenant
+        if session is None:
+            # Imported on first use rather than with the app
+            import requests
+            session = requests
+        self.http = session
+        # Per-run call budget (quota_service.RunBudget) on top of the profile's daily budget
+        self.budget = budget
+        # The run's cancellation.CancelToken: once it is cancelled no further call is sent,
+        # and calls are cut short at its deadline
+        self.cancel = cancel
         self.headers = {
             "api-auth-accountid": account_id,
             "api-auth-applicationkey": api_key,
             "Content-Type": "application/json"
         }
 
-    def get_product_by_sku(self, sku):
-        """Checks if a product exists by SKU in Cin7 Omni."""
+    def _request(self, method, url, **kwargs):
+        """
+        Sends one HTTP request through this profile's Cin7 circuit breaker and
+        concurrency budget. Raises CircuitOpenError at once while the upstream is down,
+        QuotaExceeded when a call budget is used up, Cancelled once the run is cancelled
+        and DeadlineExceeded once its deadline has passed (a call's timeout is clipped to it).
+        """
+        if "json" in kwargs:
+            # Encode bodies with the shared codec rather than requests' stdlib encoder
+            kwargs["data"] = json_codec.dumps(kwargs.pop("json"))
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "Content-Type": "application/json"}
+        def send():
+            import requests
+            cancellation.check(self.cancel)
+            quota_service.charge("cin7", self.tenant, self.budget)
+            with work_scheduler.upstream_slot("cin7", self.tenant):
+                # The wait for a slot can be long: check again and clip to what is left of the deadline
+                timeout, clipped = cancellation.call_timeout(self.cancel, kwargs.get("timeout"))
+                try:
+                    return self.http.request(method, url, **{**kwargs, "timeout": timeout})
+                except requests.exceptions.Timeout:
+                    if clipped:
+                        raise cancellation.timed_out(self.cancel, f"Cin7 {method} {url}")
+                    raise
+        return circuit_breaker.get("cin7", self.tenant).call(send)
+
+    def get_product_by_sku(self, sku, include_bom=False):
+        """Checks if a product exists by SKU in Cin7 Omni. include_bom also returns its BillOfMaterialsProducts."""
         url = f"{self.base_url}/Product"
         params = {"SKU": sku}
+        if include_bom:
+            params["IncludeBOM"] = "true"
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
+            response = self._request("GET", url, headers=self.headers, params=params, timeout=10)
             if response.status_code == 200:
-                data = response.json()
+                data = json_codec.decode(response)
                 products = data.get("Products", [])
                 return products[0] if products else None
             return None
+        except cancellation.Cancelled:
+            # Not a lookup or write failure: the caller stops the run
+            raise
         except Exception as e:
             logger.error(f"Error searching Cin7 for SKU {sku}: {e}")
             return None
 
-    def create_or_update_product(self, product_data):
-        """Creates or updates a product with descriptive error handling."""
+    def list_products(self, page=1, limit=1000):
+        """Fetches one page of the Cin7 product catalog. Returns (products, total)."""
+        url = f"{self.base_url}/Product"
+        params = {"Page": page, "Limit": limit}
+        response = self._request("GET", url, headers=self.headers, params=params, timeout=30)
+        if response.status_code != 200:
+            raise RuntimeError(f"Cin7 Error ({response.status_code}) listing products page {page}: {response.text}")
+        data = json_codec.decode(response)
+        return data.get("Products", []), data.get("Total", 0)
+
+    def iter_all_products(self, limit=1000):
+        """Pages through the whole Cin7 product catalog."""
+        page = 1
+        while True:
+            products, total = self.list_products(page, limit)
+            yield from products
+            if len(products) < limit or page * limit >= total:
+                break
+            page += 1
+
+    def create_or_update_product(self, product_data, existing=None):
+        """
+        Creates or updates a product with descriptive error handling.
+        Pass the already-fetched Cin7 product as `existing` (or False for a known-new SKU)
+        to skip the SKU lookup.
+        """
         sku = product_data.get("SKU")
         
         # Check if the product already exists to determine if we are updating
-        existing = self.get_product_by_sku(sku)
+        if existing is None:
+            existing = self.get_product_by_sku(sku)
         
         if existing:
             # Map the Cin7 Internal ID to the payload to prevent 409 Conflict errors
@@ -44,16 +111,16 @@ class Cin7Client:
         url = f"{self.base_url}/Product"
         try:
             if existing:
-                response = requests.put(url, headers=self.headers, json=product_data, timeout=15)
+                response = self._request("PUT", url, headers=self.headers, json=product_data, timeout=15)
             else:
-                response = requests.post(url, headers=self.headers, json=product_data, timeout=15)
+                response = self._request("POST", url, headers=self.headers, json=product_data, timeout=15)
             
             if response.status_code in [200, 201, 202]:
-                return {"status": "success", "data": response.json()}
+                return {"status": "success", "data": json_codec.decode(response)}
             else:
                 # Parse descriptive error messages from the Cin7 response
                 try:
-                    error_list = response.json()
+                    error_list = json_codec.decode(response)
                     # Cin7 returns a list of error objects
                     error_msg = "; ".join([f"{e.get('Exception')}" for e in error_list])
                 except:
@@ -64,8 +131,12 @@ class Cin7Client:
                     "status": "error", 
                     "message": f"Cin7 Error ({response.status_code}): {error_msg}"
                 }
+        except cancellation.Cancelled:
+            raise
         except Exception as e:
             logger.error(f"Cin7 Exception for {sku}: {e}")
+            return {"status": "error", "message": f"Cin7 Exception: {e}"}
+
     def upload_bill_of_materials(self, product_id, bom_products):
         """Uploads BOM for a product. Deletes existing BOM if necessary implicitly by overwriting or explicit call not shown."""
         url = f"{self.base_url}/BillOfMaterials"
@@ -85,14 +156,14 @@ class Cin7Client:
             # If PUT fails with 404, we might retry POST? Or assume POST is for creation.
             # Actually, standard Dear API documentation often says "POST /BillOfMaterials" to create/update.
             
-            response = requests.post(url, headers=self.headers, json=payload, timeout=15)
+            response = self._request("POST", url, headers=self.headers, json=payload, timeout=15)
             
             if response.status_code in [200, 201]:
-                return {"status": "success", "data": response.json()}
+                return {"status": "success", "data": json_codec.decode(response)}
             else:
                  # Parse error
                 try:
-                    error_data = response.json()
+                    error_data = json_codec.decode(response)
                     if isinstance(error_data, list):
                         error_msg = "; ".join([f"{e.get('Exception') or e.get('Message', 'Unknown Error')}" for e in error_data])
                     else:
@@ -103,6 +174,8 @@ class Cin7Client:
                 logger.error(f"Failed to upload BOM for {product_id}: {error_msg}")
                 return {"status": "error", "message": error_msg}
 
+        except cancellation.Cancelled:
+            raise
         except Exception as e:
             logger.error(f"Exception uploading BOM for {product_id}: {e}")
             return {"status": "error", "message": str(e)}
\ No newline at end of file
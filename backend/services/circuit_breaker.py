@@ -0,0 +1,177 @@
+"""
+Circuit breakers for the upstream APIs, one per (upstream, tenant) like the work
+scheduler's budgets.
+
+A breaker is closed while calls succeed. After FAILURE_THRESHOLD consecutive failures
+(connection errors, timeouts, 5xx) it opens and every call fails at once with
+CircuitOpenError instead of waiting out its timeout. After RESET_SECONDS it turns
+half-open and lets a single probe through: success closes it, failure opens it again.
+Transitions keep the profile's is_arena_connected / is_cin7_connected flags current.
+"""
+from collections import deque
+from datetime import datetime
+import logging
+import os
+import threading
+import time
+from .. import models, database
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+# Per-minute samples kept for /admin/circuits
+SERIES_MINUTES = 60
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+STATUS_COLUMNS = {"arena": "is_arena_connected", "cin7": "is_cin7_connected"}
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, upstream: str, tenant=None, failure_threshold: int = None, reset_seconds: float = None):
+        self.upstream = upstream
+        self.tenant = tenant
+        self.name = upstream if tenant is None else f"{upstream}:{tenant}"
+        self.failure_threshold = max(1, failure_threshold or FAILURE_THRESHOLD)
+        self.reset_seconds = reset_seconds if reset_seconds is not None else RESET_SECONDS
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._reported = None        # connection flag last written to the profile
+        self._lock = threading.Lock()
+        self.totals = {"requests": 0, "failures": 0, "rejected": 0, "opened": 0}
+        self.series = deque(maxlen=SERIES_MINUTES)
+        self.transitions = deque(maxlen=20)
+
+    def _sample(self, field: str):
+        minute = datetime.utcnow().replace(second=0, microsecond=0)
+        if not self.series or self.series[-1]["minute"] != minute:
+            self.series.append({"minute": minute, "requests": 0, "failures": 0, "rejected": 0})
+        self.series[-1][field] += 1
+        self.totals[field] += 1
+
+    def _move(self, state: str, reason: str):
+        # Caller holds the lock
+        if state == self.state:
+            return
+        self.transitions.append({"at": datetime.utcnow(), "from": self.state, "to": state, "reason": reason})
+        logger.warning(f"Circuit {self.name}: {self.state} -> {state} ({reason})")
+        self.state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.totals["opened"] += 1
+
+    def before_call(self):
+        """Admits a call or raises CircuitOpenError. An admitted call must report its outcome."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._move(HALF_OPEN, "reset timeout elapsed")
+            if self.state == OPEN or (self.state == HALF_OPEN and self._probing):
+                self._sample("rejected")
+                retry_in = max(0.0, self.reset_seconds - (time.monotonic() - (self._opened_at or 0)))
+                raise CircuitOpenError(f"{self.upstream} circuit open; retry in {retry_in:.0f}s")
+            if self.state == HALF_OPEN:
+                self._probing = True
+            self._sample("requests")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self._move(CLOSED, "call succeeded")
+            report = self._reported is not True
+            self._reported = True
+        if report:
+            self._report(True)
+
+    def record_failure(self, reason: str):
+        with self._lock:
+            self._sample("failures")
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._move(OPEN, reason)
+            report = self.state == OPEN and self._reported is not False
+            if report:
+                self._reported = False
+        if report:
+            self._report(False)
+
+    def call(self, send):
+        """Runs send() -> response through the breaker. 5xx responses count as failures."""
+        import requests
+        self.before_call()
+        try:
+            response = send()
+        except requests.exceptions.RequestException as e:
+            self.record_failure(type(e).__name__)
+            raise
+        except Exception:
+            # Not the upstream's fault (e.g. a bug in the caller); release a half-open probe
+            with self._lock:
+                self._probing = False
+            raise
+        if response.status_code >= 500:
+            self.record_failure(f"HTTP {response.status_code}")
+        else:
+            self.record_success()
+        return response
+
+    def _report(self, connected: bool):
+        """Writes the connection flag to the breaker's profile (tenant = Configuration.id)."""
+        column = STATUS_COLUMNS.get(self.upstream)
+        if self.tenant is None or column is None:
+            return
+        db = database.SessionLocal()
+        try:
+            db.query(models.Configuration).filter(models.Configuration.id == self.tenant).update(
+                {column: connected}, synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            logger.error(f"Could not record {self.name} connection status: {e}")
+        finally:
+            db.close()
+
+    def rejecting(self):
+        """True while a call would be rejected outright (not yet due for a probe)."""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self._opened_at < self.reset_seconds
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "totals": dict(self.totals),
+                "series": list(self.series),
+                "transitions": list(self.transitions),
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get(upstream: str, tenant=None):
+    with _breakers_lock:
+        breaker = _breakers.get((upstream, tenant))
+        if breaker is None:
+            breaker = _breakers[(upstream, tenant)] = CircuitBreaker(upstream, tenant)
+        return breaker
+
+def is_open(upstream: str, tenant=None):
+    """True while calls to the upstream are being rejected, so callers can skip work up front."""
+    with _breakers_lock:
+        breaker = _breakers.get((upstream, tenant))
+    return breaker is not None and breaker.rejecting()
+
+def stats():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
@@ -0,0 +1,173 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+from .. import models, database
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Failed attempts (including the original failure) before an item is parked for a human
+MAX_ATTEMPTS = int(os.getenv("DEAD_LETTER_MAX_ATTEMPTS", "5"))
+BASE_BACKOFF_SECONDS = 60
+MAX_BACKOFF_SECONDS = 6 * 3600
+# Entries left 'retrying' this long (e.g. by a crashed worker) are handed out again
+STALE_CLAIM_MINUTES = 30
+
+_STATUS_CODE = re.compile(r"\((\d{3})\)")
+_TRANSIENT_HINTS = ("circuit open", "timeout", "timed out", "connection", "exception", "temporarily", "rate limit")
+
+def classify_error(message: str):
+    """Buckets an error message from the clients: transient, validation, auth, not_found or unknown."""
+    text = message or ""
+    match = _STATUS_CODE.search(text)
+    if match:
+        code = int(match.group(1))
+        if code == 429 or code >= 500:
+            return "transient"
+        if code in (401, 403):
+            return "auth"
+        if code == 404:
+            return "not_found"
+        if 400 <= code < 500:
+            return "validation"
+    lowered = text.lower()
+    if "not found" in lowered:
+        return "not_found"
+    if "login failed" in lowered:
+        return "auth"
+    if any(hint in lowered for hint in _TRANSIENT_HINTS):
+        return "transient"
+    return "unknown"
+
+def backoff(attempts: int):
+    return timedelta(seconds=min(BASE_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0), MAX_BACKOFF_SECONDS))
+
+def _fail(entry, error: str, now):
+    entry.attempts = (entry.attempts or 0) + 1
+    entry.last_error = error
+    entry.error_class = classify_error(error)
+    entry.last_failed_at = now
+    if entry.attempts >= MAX_ATTEMPTS:
+        entry.status = "parked"
+        entry.next_retry_at = None
+        logger.error(f"Parked {entry.sku} after {entry.attempts} failed attempts: {error}")
+    else:
+        entry.status = "pending"
+        entry.next_retry_at = now + backoff(entry.attempts)
+
+def record_failure(profile_id: int, sku: str, error: str, source: str = "push", change_guid: str = None):
+    """
+    Persists a failed SKU (on its own session, so push workers can call it). A repeat
+    failure counts as another attempt; an item that had been resolved starts over.
+    """
+    if not sku:
+        return
+    db = database.SessionLocal()
+    try:
+        now = datetime.utcnow()
+        entry = db.query(models.DeadLetterItem).filter(
+            models.DeadLetterItem.profile_id == profile_id, models.DeadLetterItem.sku == sku
+        ).first()
+        if entry is None:
+            entry = models.DeadLetterItem(profile_id=profile_id, sku=sku, attempts=0, first_failed_at=now)
+            db.add(entry)
+        elif entry.status == "resolved":
+            entry.attempts = 0
+            entry.first_failed_at = now
+            entry.resolved_at = None
+        elif entry.status == "retrying":
+            # The retry worker owns it right now and will record its own outcome
+            entry.last_error = error
+            db.commit()
+            return
+        entry.source = source
+        entry.change_guid = change_guid
+        if entry.status != "parked":
+            _fail(entry, error, now)
+        else:
+            entry.attempts = (entry.attempts or 0) + 1
+            entry.last_error = error
+            entry.last_failed_at = now
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker recorded the same SKU first; its entry stands
+            db.rollback()
+    finally:
+        db.close()
+
+def open_skus(db: Session, profile_id: int):
+    """SKUs of a profile with an unresolved entry, so a push only touches the queue for those."""
+    rows = db.query(models.DeadLetterItem.sku).filter(
+        models.DeadLetterItem.profile_id == profile_id, models.DeadLetterItem.status != "resolved"
+    )
+    return {sku for (sku,) in rows}
+
+def resolve(profile_id: int, sku: str):
+    """Marks a SKU's entry resolved after any successful sync of it."""
+    db = database.SessionLocal()
+    try:
+        db.query(models.DeadLetterItem).filter(
+            models.DeadLetterItem.profile_id == profile_id,
+            models.DeadLetterItem.sku == sku,
+            models.DeadLetterItem.status != "resolved"
+        ).update({"status": "resolved", "resolved_at": datetime.utcnow(), "next_retry_at": None}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def claim_due(db: Session, profile_id: int, limit: int = 20):
+    """Atomically claims a profile's entries whose retry is due, oldest due first."""
+    now = datetime.utcnow()
+    entry = models.DeadLetterItem
+
+    db.query(entry).filter(
+        entry.status == "retrying",
+        entry.last_failed_at < now - timedelta(minutes=STALE_CLAIM_MINUTES)
+    ).update({"status": "pending", "next_retry_at": now}, synchronize_session=False)
+    db.commit()
+
+    candidates = db.query(entry.id).filter(
+        entry.profile_id == profile_id, entry.status == "pending", entry.next_retry_at <= now
+    ).order_by(entry.next_retry_at).limit(limit).all()
+
+    claimed = []
+    for (entry_id,) in candidates:
+        updated = db.query(entry).filter(
+            entry.id == entry_id, entry.status == "pending"
+        ).update({"status": "retrying", "last_failed_at": now}, synchronize_session=False)
+        db.commit()
+        if updated:
+            claimed.append(db.query(entry).filter(entry.id == entry_id).first())
+    return claimed
+
+def claim(db: Session, entry_id: int):
+    """Claims one entry for a manual retry, whatever its status (parked included)."""
+    entry = models.DeadLetterItem
+    updated = db.query(entry).filter(
+        entry.id == entry_id, entry.status.in_(["pending", "parked"])
+    ).update({"status": "retrying"}, synchronize_session=False)
+    db.commit()
+    return db.query(entry).filter(entry.id == entry_id).first() if updated else None
+
+def mark_resolved(db: Session, entry):
+    entry.status = "resolved"
+    entry.resolved_at = datetime.utcnow()
+    entry.next_retry_at = None
+    db.commit()
+
+def mark_failed(db: Session, entry, error: str):
+    """Counts a failed retry: reschedules it with backoff, or parks it after MAX_ATTEMPTS."""
+    _fail(entry, error, datetime.utcnow())
+    db.commit()
+
+def requeue(db: Session, profile_id: int = None, status: str = "parked"):
+    """Makes entries (parked ones by default) due right away with a fresh attempt budget."""
+    query = db.query(models.DeadLetterItem).filter(models.DeadLetterItem.status == status)
+    if profile_id is not None:
+        query = query.filter(models.DeadLetterItem.profile_id == profile_id)
+    count = query.update({"status": "pending", "attempts": 0, "next_retry_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return count
@@ -0,0 +1,55 @@
+"""
+JSON codec shared by the upstream clients, the API responses and the NDJSON artifacts.
+Uses orjson when it is installed and falls back to the standard library otherwise;
+JSON_CODEC=json forces the fallback. orjson itself is imported on first use, not with
+the app.
+"""
+import dataclasses
+import datetime
+import enum
+import importlib.util
+import json
+import os
+
+CODEC = "orjson" if importlib.util.find_spec("orjson") is not None and os.getenv("JSON_CODEC", "orjson") != "json" else "json"
+
+if CODEC == "orjson":
+    def _bind_orjson():
+        """Replaces dumps and loads with the orjson ones; racing callers bind the same."""
+        global dumps, loads
+        import orjson
+        options = orjson.OPT_NON_STR_KEYS
+
+        def dumps(obj) -> bytes:
+            return orjson.dumps(obj, default=str, option=options)
+
+        loads = orjson.loads
+
+    def dumps(obj) -> bytes:
+        _bind_orjson()
+        return dumps(obj)
+
+    def loads(data):
+        _bind_orjson()
+        return loads(data)
+else:
+    def _default(obj):
+        # The types orjson writes natively, written the same way; anything else (UUID,
+        # Decimal, ...) goes through str, as orjson's default=str does
+        if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+            return obj.isoformat()
+        if isinstance(obj, enum.Enum):
+            return obj.value
+        if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+            return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+        return str(obj)
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(data):
+        return json.loads(data)
+
+def decode(response):
+    """Parses an HTTP response body; raises ValueError if it is not JSON, like response.json()."""
+    return loads(response.content)
@@ -0,0 +1,134 @@
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from .. import models, database
+import logging
+import os
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process among uvicorn workers and replicas
+NODE_ID = os.getenv("NODE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+def acquire(db, name: str, ttl_seconds: int, holder: str = NODE_ID):
+    """
+    Takes or renews a lease. Succeeds if the lease is free, expired or already ours.
+    The conditional UPDATE (or the primary key on INSERT) makes this atomic across nodes.
+    """
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=ttl_seconds)
+    lease = models.Lease
+
+    updated = db.query(lease).filter(
+        lease.name == name,
+        or_(lease.holder == holder, lease.holder.is_(None), lease.expires_at < now)
+    ).update({"holder": holder, "expires_at": expires, "acquired_at": now}, synchronize_session=False)
+    if updated:
+        db.commit()
+        return True
+
+    db.rollback()
+    if db.query(lease.name).filter(lease.name == name).first():
+        return False
+    try:
+        db.add(lease(name=name, holder=holder, acquired_at=now, expires_at=expires))
+        db.commit()
+        return True
+    except IntegrityError:
+        # Another node inserted it first
+        db.rollback()
+        return False
+
+def release(db, name: str, holder: str = NODE_ID):
+    db.query(models.Lease).filter(
+        models.Lease.name == name, models.Lease.holder == holder
+    ).update({"holder": None, "expires_at": None}, synchronize_session=False)
+    db.commit()
+
+def _acquire_once(name, ttl_seconds, holder):
+    db = database.SessionLocal()
+    try:
+        return acquire(db, name, ttl_seconds, holder)
+    except Exception as e:
+        logger.warning(f"Lease '{name}' could not be renewed: {e}")
+        return False
+    finally:
+        db.close()
+
+@contextmanager
+def held(name: str, ttl_seconds: int = 60, holder: str = NODE_ID):
+    """
+    Holds a lease for the duration of the block, renewing it in the background so long
+    work doesn't lose it. Yields False (and runs nothing under the lease) if it is taken.
+    """
+    if not _acquire_once(name, ttl_seconds, holder):
+        yield False
+        return
+
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(ttl_seconds / 3):
+            _acquire_once(name, ttl_seconds, holder)
+
+    keeper = threading.Thread(target=heartbeat, name=f"lease-{name}", daemon=True)
+    keeper.start()
+    try:
+        yield True
+    finally:
+        stop.set()
+        keeper.join()
+        db = database.SessionLocal()
+        try:
+            release(db, name, holder)
+        finally:
+            db.close()
+
+
+class LeaderElection:
+    """
+    Keeps one node in charge of scheduled jobs. Every node tries to take the lease each
+    renew interval; the holder keeps renewing it, and if it dies the lease expires and
+    another node takes over within ttl_seconds.
+    """
+
+    def __init__(self, name: str, ttl_seconds: int = 30, renew_seconds: int = 10, holder: str = NODE_ID):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.renew_seconds = renew_seconds
+        self.holder = holder
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _campaign(self):
+        was_leader = self.is_leader
+        self.is_leader = _acquire_once(self.name, self.ttl_seconds, self.holder)
+        if self.is_leader != was_leader:
+            state = "acquired" if self.is_leader else "lost"
+            logger.info(f"Leader lease '{self.name}' {state} by {self.holder}.")
+
+    def start(self):
+        self._campaign()
+
+        def loop():
+            while not self._stop.wait(self.renew_seconds):
+                self._campaign()
+
+        self._thread = threading.Thread(target=loop, name=f"leader-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self.is_leader:
+            db = database.SessionLocal()
+            try:
+                release(db, self.name, self.holder)
+            finally:
+                db.close()
+            self.is_leader = False
@@ -0,0 +1,245 @@
+"""
+Declarative Arena -> Cin7 field mapping.
+
+A spec has two sections:
+  "item"    - Arena item JSON (+ sourcing) -> ArenaItem columns, one entry per column:
+              {"column", "field": "category.name"} | {"column", "attribute": "Sellable"}
+              | {"column", "sourcing": "supplier.name"}
+  "product" - ArenaItem -> Cin7 product payload, one entry per payload field:
+              {"target", "source": column, "default"?}      value, or default when empty
+              {"target", "rule": key, "default"}            SyncRule value for the profile
+              {"target", "value": constant}
+              {"target", "transform": name, "sources"?, "args"?}
+              transforms: yes_no, join, price_tiers
+  "bom"     - fields added when the product has a BOM
+
+The spec is stored in field_mappings (per profile, else global, else DEFAULT_SPEC) and
+compiled once per run: each entry becomes a reader function and rule values are looked
+up once, so mapping an item runs no DB queries and no per-field spec parsing.
+"""
+from sqlalchemy.orm import Session
+from datetime import datetime
+from .. import models
+from . import bom_service, profile_service
+import copy
+import functools
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Columns a spec may read from or write to; the compact harvest record carries exactly these
+ITEM_COLUMNS = (
+    "item_number", "item_name", "revision", "lifecycle_phase", "category", "description", "uom",
+    "costing_method", "inventory_account", "cogs_account", "sellable", "internal_note_erp",
+    "last_glg_co", "transfer_to_erp", "manufacturer", "manufacturer_item_number"
+)
+
+DEFAULT_SPEC = {
+    "item": [
+        {"column": "item_number", "field": "number"},
+        {"column": "item_name", "field": "name"},
+        {"column": "revision", "field": "revisionNumber"},
+        {"column": "lifecycle_phase", "field": "lifecyclePhase.name"},
+        {"column": "category", "field": "category.name"},
+        {"column": "description", "field": "description"},
+        {"column": "uom", "field": "uom"},
+        {"column": "costing_method", "attribute": "Costing Method"},
+        {"column": "inventory_account", "attribute": "Inventory Account"},
+        {"column": "cogs_account", "attribute": "COGS Account"},
+        {"column": "sellable", "attribute": "Sellable"},
+        {"column": "internal_note_erp", "attribute": "Internal Note for ERP"},
+        {"column": "last_glg_co", "attribute": "Last GLG CO"},
+        {"column": "transfer_to_erp", "attribute": "Transfer Data to ERP?"},
+        {"column": "manufacturer", "sourcing": "supplier.name"},
+        {"column": "manufacturer_item_number", "sourcing": "number"},
+    ],
+    "product": [
+        {"target": "SKU", "source": "item_number"},
+        {"target": "Name", "source": "item_name"},
+        {"target": "Category", "source": "category", "default": "Fabricated Metal"},
+        {"target": "Description", "source": "description", "default": ""},
+        {"target": "UOM", "source": "uom", "default": "EA"},
+        {"target": "CostingMethod", "source": "costing_method", "default": "FIFO - Batch"},
+        # Rules #2, #3, #4: dynamic defaults from SyncRule
+        {"target": "RevenueAccount", "rule": "RevenueAccount", "default": "4001: OEM Product"},
+        {"target": "InventoryAccount", "rule": "InventoryAccount", "default": "1402: Raw Materials"},
+        {"target": "COGSAccount", "rule": "COGSAccount", "default": "4100: Cost of Sales"},
+        {"target": "DefaultLocation", "rule": "DefaultLocation", "default": "Main Warehouse"},
+        {"target": "Type", "rule": "ProductType", "default": "Stock"},
+        {"target": "Sellable", "transform": "yes_no", "sources": ["sellable"]},
+        {"target": "Status", "value": "Active"},
+        {"target": "InternalNote", "source": "internal_note_erp", "default": ""},
+        {"target": "AdditionalAttribute1", "source": "revision"},
+        {"target": "AdditionalAttribute2", "source": "last_glg_co"},
+        # Combined Mfr string: [manufacturer] [manufacturer_item_number]
+        {"target": "AdditionalAttribute4", "transform": "join", "sources": ["manufacturer", "manufacturer_item_number"]},
+        {"target": "AttributeSet", "value": "Item"},
+        # Mandatory PriceTiers object to resolve Cin7 Error 400
+        {"target": "PriceTiers", "transform": "price_tiers", "args": {"tiers": 10, "price": 0.0}},
+    ],
+    "bom": {
+        "QuantityToProduce": 1.0,
+        "AssemblyCostEstimationMethod": "Average Cost",
+    },
+}
+
+
+class MappingError(ValueError):
+    """A mapping spec that cannot be compiled."""
+
+
+def _price_tiers(tiers=10, price=0.0):
+    return {("Standard" if n == 1 else f"Tier {n}"): float(price) for n in range(1, int(tiers) + 1)}
+
+def _column(name):
+    if name not in ITEM_COLUMNS:
+        raise MappingError(f"Unknown item column: {name!r}")
+    return name
+
+
+def _path(dotted):
+    parts = dotted.split(".")
+    def get(obj):
+        for part in parts:
+            obj = (obj or {}).get(part)
+        return obj
+    return get
+
+def _item_reader(entry):
+    """(details, attrs, vendor) -> value of one item column."""
+    if "field" in entry:
+        get = _path(entry["field"])
+        return lambda details, attrs, vendor: get(details)
+    if "attribute" in entry:
+        name = entry["attribute"]
+        return lambda details, attrs, vendor: attrs.get(name)
+    if "sourcing" in entry:
+        get = _path(entry["sourcing"])
+        return lambda details, attrs, vendor: get(vendor)
+    raise MappingError(f"Item column {entry.get('column')!r} has no field, attribute or sourcing")
+
+def _source_reader(entry):
+    column = _column(entry["source"])
+    if "default" in entry:
+        default = entry["default"]
+        return lambda item: getattr(item, column) or default
+    return lambda item: getattr(item, column)
+
+def _constant(value):
+    if isinstance(value, (dict, list)):
+        # Each payload gets its own copy
+        return lambda item: copy.deepcopy(value)
+    return lambda item: value
+
+def _transform(entry):
+    name = entry["transform"]
+    columns = [_column(column) for column in entry.get("sources") or []]
+    args = entry.get("args") or {}
+    if name == "yes_no":
+        if len(columns) != 1:
+            raise MappingError("yes_no takes one source")
+        column, true = columns[0], args.get("true", "Yes")
+        return lambda item: getattr(item, column) == true
+    if name == "join":
+        separator = args.get("separator", " ")
+        return lambda item: separator.join([getattr(item, column) or "" for column in columns]).strip()
+    if name == "price_tiers":
+        # The same values for every item: build once, copy per payload
+        tiers = _price_tiers(**args)
+        return lambda item: dict(tiers)
+    raise MappingError(f"Unknown transform: {name!r}")
+
+
+class CompiledMapping:
+    """
+    A spec compiled against one profile's rules: every entry becomes a small reader
+    function, with rule values resolved up front. Thread-safe; build once per run.
+    """
+
+    def __init__(self, spec: dict, rules: dict):
+        self.spec = spec
+        item_entries = spec.get("item") or []
+        self._items = [(_column(entry.get("column")), _item_reader(entry)) for entry in item_entries]
+        self._attributes = {entry["attribute"] for entry in item_entries if "attribute" in entry}
+        self._fields = [self._product_field(entry, rules) for entry in spec.get("product") or []]
+        self._bom_fields = dict(spec.get("bom") or {})
+
+    def _product_field(self, entry, rules):
+        target = entry.get("target")
+        if not isinstance(target, str) or not target:
+            raise MappingError(f"Product field without a target: {entry!r}")
+        if "source" in entry:
+            return target, _source_reader(entry)
+        if "rule" in entry:
+            # Resolved now: the rule snapshot is fixed for the run
+            return target, _constant(rules.get(entry["rule"], entry.get("default")))
+        if "value" in entry:
+            return target, _constant(entry["value"])
+        if "transform" in entry:
+            return target, _transform(entry)
+        raise MappingError(f"Product field {target!r} has no source, rule, value or transform")
+
+    def item(self, details, sourcing=None):
+        """ArenaItem column values for an Arena item JSON and its sourcing response."""
+        attrs = {
+            a.get("name"): a.get("value") for a in details.get("additionalAttributes") or []
+            if a.get("name") in self._attributes
+        }
+        vendor = ((sourcing or {}).get("results") or [{}])[0].get("vendorItem") or {}
+        return {column: read(details, attrs, vendor) for column, read in self._items}
+
+    def product(self, item, bom_resolved_list=None):
+        """Cin7 product payload for an ArenaItem (or HarvestedItem) and its resolved BOM."""
+        payload = {target: read(item) for target, read in self._fields}
+        if bom_resolved_list:
+            payload["AssemblyBOM"] = True
+            payload["BillOfMaterial"] = True
+            payload.update(self._bom_fields)
+            payload["BillOfMaterialsProducts"] = bom_service.bom_lines(bom_resolved_list)
+        else:
+            payload["AssemblyBOM"] = False
+            payload["BillOfMaterial"] = False
+        return payload
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_cached(spec_json: str, rules_json: str):
+    return CompiledMapping(json.loads(spec_json), json.loads(rules_json))
+
+def compile_mapping(spec: dict, rules: dict):
+    """Compiles a spec; identical spec and rules reuse the compiled mapping."""
+    return _compile_cached(json.dumps(spec, sort_keys=True), json.dumps(rules or {}, sort_keys=True))
+
+def get_spec(db: Session, profile_id: int = None):
+    """The profile's stored spec, else the global one, else DEFAULT_SPEC."""
+    query = db.query(models.FieldMapping)
+    row = None
+    if profile_id is not None:
+        row = query.filter(models.FieldMapping.profile_id == profile_id).first()
+    if row is None:
+        row = query.filter(models.FieldMapping.profile_id.is_(None)).first()
+    return json.loads(row.spec) if row else DEFAULT_SPEC
+
+def set_spec(db: Session, spec: dict, profile_id: int = None):
+    """Validates (by compiling) and stores a spec for a profile, or globally."""
+    try:
+        compile_mapping(spec, {})
+    except MappingError:
+        raise
+    except Exception as e:
+        raise MappingError(f"Invalid mapping spec: {e}")
+    row = db.query(models.FieldMapping).filter(
+        models.FieldMapping.profile_id == profile_id if profile_id is not None else models.FieldMapping.profile_id.is_(None)
+    ).first()
+    if row is None:
+        row = models.FieldMapping(profile_id=profile_id)
+        db.add(row)
+    row.spec = json.dumps(spec)
+    row.updated_at = datetime.utcnow()
+    db.commit()
+    return spec
+
+def for_profile(db: Session, profile_id: int = None):
+    """The compiled mapping for a run: the profile's spec against its rule snapshot."""
+    return compile_mapping(get_spec(db, profile_id), profile_service.load_rules(db, profile_id))
@@ -0,0 +1,127 @@
+from sqlalchemy.orm import Session
+from datetime import datetime
+from .. import models, database
+from . import lease_service, artifact_service, cancellation
+from .sync_service import iter_push_to_cin7, _tally_push_record
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+PARTITION_LEASE_TTL_SECONDS = 120
+
+def _lease_name(partition):
+    return f"push-partition:{partition.run_id}:{partition.partition_index}"
+
+def create_partitioned_push(db: Session, partitions: int, dry_run: bool = True, profile_id: int = None):
+    """
+    Splits a bulk push into SKU hash ranges. Every node's partition job claims open
+    ranges through a lease, so adding replicas adds push throughput.
+    """
+    run_id = artifact_service.new_run_id()
+    for index in range(partitions):
+        db.add(models.PushPartition(
+            run_id=run_id,
+            profile_id=profile_id,
+            partition_index=index,
+            partition_count=partitions,
+            dry_run=dry_run
+        ))
+    db.commit()
+    logger.info(f"Partitioned push {run_id} created with {partitions} partitions.")
+    return run_id
+
+def _run_partition(db: Session, partition, cancel=None):
+    summary = {"success": 0, "failed": 0, "mocked": 0}
+    errors = []
+    records = iter_push_to_cin7(
+        db, dry_run=partition.dry_run, run_id=partition.run_id,
+        partition=(partition.partition_index, partition.partition_count),
+        profile_id=partition.profile_id, cancel=cancel
+    )
+    for record in records:
+        if record.get("status") == "cancelled":
+            # Stopped by shutdown: open again for any node to push
+            return "pending", {"message": record.get("message")}
+        if record.get("status") == "error":
+            return "failed", {"message": record.get("message")}
+        _tally_push_record(summary, record)
+        if "Error" in record:
+            errors.append(record)
+    return "done", {"summary": summary, "errors": errors}
+
+def run_next_partition():
+    """
+    Claims one open (or abandoned) partition and pushes it while holding its lease.
+    A partition left 'running' by a node that died becomes claimable once its lease expires.
+    Returns the partition's run ID and index, or None if nothing was claimable.
+    """
+    db = database.SessionLocal()
+    try:
+        candidates = db.query(models.PushPartition).filter(
+            models.PushPartition.status.in_(["pending", "running"])
+        ).order_by(models.PushPartition.created_at, models.PushPartition.partition_index).all()
+
+        for partition in candidates:
+            with lease_service.held(_lease_name(partition), PARTITION_LEASE_TTL_SECONDS) as claimed:
+                if not claimed:
+                    continue
+                db.refresh(partition)
+                if partition.status not in ("pending", "running"):
+                    continue
+
+                partition.status = "running"
+                partition.holder = lease_service.NODE_ID
+                db.commit()
+                logger.info(f"Pushing partition {partition.partition_index + 1}/{partition.partition_count} of {partition.run_id}.")
+
+                try:
+                    with cancellation.running(_lease_name(partition)) as cancel:
+                        status, result = _run_partition(db, partition, cancel)
+                except Exception as e:
+                    logger.error(f"Partition {partition.partition_index} of {partition.run_id} failed: {e}")
+                    status, result = "failed", {"message": str(e)}
+
+                partition.status = status
+                partition.summary = json.dumps(result, default=str)
+                if status != "pending":
+                    partition.finished_at = datetime.utcnow()
+                db.commit()
+                return partition.run_id, partition.partition_index
+        return None
+    finally:
+        db.close()
+
+def partitioned_push_status(db: Session, run_id: str):
+    partitions = db.query(models.PushPartition).filter(
+        models.PushPartition.run_id == run_id
+    ).order_by(models.PushPartition.partition_index).all()
+    if not partitions:
+        return None
+
+    totals = {"success": 0, "failed": 0, "mocked": 0}
+    details = []
+    for partition in partitions:
+        result = json.loads(partition.summary) if partition.summary else {}
+        for key, value in (result.get("summary") or {}).items():
+            totals[key] += value
+        details.append({
+            "partition": partition.partition_index,
+            "status": partition.status,
+            "holder": partition.holder,
+            "summary": result.get("summary"),
+            "errors": result.get("errors", []),
+            "message": result.get("message"),
+        })
+
+    statuses = {p.status for p in partitions}
+    if statuses <= {"done"}:
+        status = "complete"
+    elif statuses <= {"done", "failed"}:
+        status = "failed"
+    else:
+        status = "running"
+    return {
+        "run_id": run_id, "profile_id": partitions[0].profile_id, "status": status,
+        "dry_run": partitions[0].dry_run, "summary": totals, "partitions": details
+    }
@@ -0,0 +1,49 @@
+"""
+Item number prefix filters. Configuration.item_prefix_filter holds a comma-separated
+list of prefix families, e.g. "06-, 12-, 30-, !06-99": plain entries are included,
+entries starting with '!' are excluded, and an empty filter or '*' means everything.
+Each included prefix is harvested as its own shard.
+"""
+from sqlalchemy import and_, not_, or_
+
+def _clean(entry: str):
+    return entry.strip().rstrip("*").strip()
+
+def parse_prefix_filter(value: str):
+    """Returns (includes, excludes). An empty includes list means every item number."""
+    includes, excludes = set(), set()
+    include_all = False
+    for entry in (value or "").split(","):
+        entry = entry.strip()
+        if entry.startswith("!"):
+            prefix = _clean(entry[1:])
+            if prefix:
+                excludes.add(prefix)
+        elif entry:
+            prefix = _clean(entry)
+            if prefix:
+                includes.add(prefix)
+            else:
+                # A bare '*' includes everything, whatever else is listed
+                include_all = True
+
+    if include_all:
+        return [], sorted(excludes)
+    # A prefix already covered by a shorter one would only harvest duplicates
+    covered = [p for p in includes if not any(p != other and p.startswith(other) for other in includes)]
+    return sorted(covered), sorted(excludes)
+
+def matches(item_number: str, includes: list, excludes: list):
+    number = item_number or ""
+    if includes and not any(number.startswith(prefix) for prefix in includes):
+        return False
+    return not any(number.startswith(prefix) for prefix in excludes)
+
+def sql_filter(column, includes: list, excludes: list):
+    """SQL condition equivalent to matches(), or None when the filter lets everything through."""
+    conditions = []
+    if includes:
+        conditions.append(or_(*[column.like(f"{prefix}%") for prefix in includes]))
+    for prefix in excludes:
+        conditions.append(not_(column.like(f"{prefix}%")))
+    return and_(*conditions) if conditions else None
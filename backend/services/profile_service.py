@@ -0,0 +1,112 @@
+"""
+Connection profiles: each Configuration row pairs one Arena workspace with one Cin7
+account. Profiles sync side by side in one process; each gets its own pooled HTTP
+sessions, its own upstream concurrency budgets (see work_scheduler), its own rule
+snapshot and its own poll schedule. Item and change GUIDs come from Arena, so two
+profiles must not point at the same Arena workspace.
+"""
+from sqlalchemy.orm import Session
+from .. import models
+from .arena_service import ArenaClient
+from .cin7_service import Cin7Client
+from . import work_scheduler
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_NAME = "default"
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_profile(db: Session, profile_id: int = None):
+    """Returns the given profile, or the default (lowest id) profile when none is named."""
+    query = db.query(models.Configuration)
+    if profile_id is not None:
+        return query.filter(models.Configuration.id == profile_id).first()
+    return query.order_by(models.Configuration.id).first()
+
+def list_profiles(db: Session):
+    return db.query(models.Configuration).order_by(models.Configuration.id).all()
+
+def profile_ids(db: Session):
+    return [pid for (pid,) in db.query(models.Configuration.id).order_by(models.Configuration.id)]
+
+def work_key(profile_id, name: str):
+    """Fairness key for the work scheduler, so profiles round-robin instead of queueing."""
+    return f"{profile_id}:{name}"
+
+def assign_unowned_rows(db: Session):
+    """Hands rows written before profiles existed to the default profile."""
+    default = get_profile(db)
+    if not default:
+        return
+    for model in (models.ArenaItem, models.ChangeQueueEntry, models.PushPartition, models.Cin7BomSnapshot, models.BomUploadLog):
+        db.query(model).filter(model.profile_id.is_(None)).update(
+            {"profile_id": default.id}, synchronize_session=False
+        )
+    if not default.name:
+        default.name = DEFAULT_PROFILE_NAME
+    db.commit()
+
+def http_session(profile_id, upstream: str):
+    """
+    Pooled requests.Session for one profile's upstream. Keep-alive connections are
+    reused across runs, and the pool is sized to the upstream's concurrency budget.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    with _sessions_lock:
+        session = _sessions.get((profile_id, upstream))
+        if session is None:
+            size = work_scheduler.DEFAULT_UPSTREAM_LIMITS[upstream]
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=size))
+            _sessions[(profile_id, upstream)] = session
+        return session
+
+def arena_client(config, budget=None, cancel=None):
+    return ArenaClient(
+        config.arena_workspace_id, config.arena_email, config.arena_password,
+        tenant=config.id, session=http_session(config.id, "arena"), budget=budget, cancel=cancel
+    )
+
+def cin7_client(config, budget=None, cancel=None):
+    return Cin7Client(
+        config.cin7_api_user, config.cin7_api_key,
+        tenant=config.id, session=http_session(config.id, "cin7"), budget=budget, cancel=cancel
+    )
+
+def load_rules(db: Session, profile_id: int = None):
+    """
+    Snapshot of the effective sync rules for a profile: enabled global rules, overlaid
+    with the profile's own enabled overrides. Taken once per run so worker threads never
+    query rules through a shared session.
+    """
+    rules = {
+        rule.rule_key: rule.rule_value
+        for rule in db.query(models.SyncRule).filter(models.SyncRule.is_enabled == True)
+    }
+    if profile_id is not None:
+        overrides = db.query(models.ProfileRule).filter(models.ProfileRule.profile_id == profile_id)
+        for rule in overrides:
+            if rule.is_enabled:
+                rules[rule.rule_key] = rule.rule_value
+            else:
+                # A disabled override switches the global rule off for this profile
+                rules.pop(rule.rule_key, None)
+    return rules
+
+def set_profile_rule(db: Session, profile_id: int, rule_key: str, rule_value: str, is_enabled: bool = True):
+    rule = db.query(models.ProfileRule).filter(
+        models.ProfileRule.profile_id == profile_id, models.ProfileRule.rule_key == rule_key
+    ).first()
+    if rule is None:
+        rule = models.ProfileRule(profile_id=profile_id, rule_key=rule_key)
+        db.add(rule)
+    rule.rule_value = rule_value
+    rule.is_enabled = is_enabled
+    db.commit()
+    db.refresh(rule)
+    return rule
@@ -0,0 +1,322 @@
+"""
+Upstream call quotas, per profile, like the circuit breakers.
+
+Every Arena and Cin7 request is charged here before it is sent. A profile's daily
+budget (Configuration.arena_daily_call_budget / cin7_daily_call_budget, 0 = unlimited)
+is shared by every replica through the api_usage table; counts are kept in memory and
+flushed every FLUSH_CALLS calls or FLUSH_SECONDS. Bulk and poller work stop at the last
+call_budget_reserve_percent of the day's budget, which stays available to interactive
+(on-demand) syncs. A run can also carry a RunBudget capping its own calls.
+
+plan() estimates the calls a full sync will make from the cached catalog state, so a
+run that does not fit the remaining budget is refused before it starts (with the
+estimate, to be started again once the budget allows) instead of stopping halfway.
+"""
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from datetime import datetime
+import logging
+import math
+import os
+import threading
+import time
+from .. import models, database
+from . import work_scheduler, prefix_service, run_service
+
+logger = logging.getLogger(__name__)
+
+FLUSH_CALLS = int(os.getenv("QUOTA_FLUSH_CALLS", "50"))
+FLUSH_SECONDS = float(os.getenv("QUOTA_FLUSH_SECONDS", "10"))
+# How long a profile's budget settings are cached between reads
+LIMITS_TTL_SECONDS = 30
+UPSTREAMS = ("arena", "cin7")
+# Arena list page size used by the harvest (ArenaClient.iter_item_pages)
+LIST_PAGE_SIZE = 400
+
+
+class QuotaExceeded(RuntimeError):
+    """A call was refused because it would overrun a daily or per-run call budget."""
+
+
+class RunBudget:
+    """Calls one run may make per upstream (0 or missing = unlimited), shared by the run's clients."""
+
+    def __init__(self, limits: dict):
+        self.limits = {upstream: limit for upstream, limit in limits.items() if limit}
+        self.used = {upstream: 0 for upstream in UPSTREAMS}
+        self._lock = threading.Lock()
+
+    def take(self, upstream: str):
+        with self._lock:
+            limit = self.limits.get(upstream)
+            if limit and self.used[upstream] >= limit:
+                raise QuotaExceeded(f"{upstream} run call budget of {limit} used up")
+            self.used[upstream] += 1
+
+    def exhausted(self, upstream: str):
+        with self._lock:
+            limit = self.limits.get(upstream)
+            return bool(limit) and self.used[upstream] >= limit
+
+def run_budget(config):
+    return RunBudget({"arena": config.arena_run_call_budget, "cin7": config.cin7_run_call_budget})
+
+
+def _today():
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+
+class DailyUsage:
+    """Calls made today to one upstream for one profile, as far as this replica knows."""
+
+    def __init__(self, upstream: str, tenant):
+        self.upstream = upstream
+        self.tenant = tenant
+        self.day = None
+        self.calls = 0
+        self._pending = 0
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _roll(self):
+        # Caller holds the lock
+        today = _today()
+        if self.day != today:
+            self.day, self.calls, self._pending = today, self._stored(today), 0
+
+    def _stored(self, day):
+        if self.tenant is None:
+            return 0
+        db = database.SessionLocal()
+        try:
+            row = db.query(models.ApiUsage).filter(
+                models.ApiUsage.profile_id == self.tenant, models.ApiUsage.upstream == self.upstream,
+                models.ApiUsage.day == day
+            ).first()
+            return row.calls if row else 0
+        except Exception as e:
+            logger.warning(f"Could not read {self.upstream} call usage: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def take(self, allowed):
+        """Counts one call, or raises QuotaExceeded if it would go past `allowed` (None: no limit)."""
+        with self._lock:
+            self._roll()
+            if allowed is not None and self.calls >= allowed:
+                raise QuotaExceeded(f"{self.upstream} daily call budget reached ({self.calls}/{allowed} calls today)")
+            self.calls += 1
+            self._pending += 1
+            due = self._pending >= FLUSH_CALLS or time.monotonic() - self._flushed_at >= FLUSH_SECONDS
+        if due and not self._flush_lock.locked():
+            # Off the caller's thread: the caller may hold a write transaction the flush would wait on
+            threading.Thread(target=self.flush, name=f"quota-{self.upstream}", daemon=True).start()
+
+    def remaining(self, allowed):
+        with self._lock:
+            self._roll()
+            return None if allowed is None else max(0, allowed - self.calls)
+
+    def flush(self):
+        """Adds this replica's unflushed calls to api_usage and picks up the other replicas' calls."""
+        if self.tenant is None or not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                day, pending = self.day, self._pending
+                self._pending = 0
+                self._flushed_at = time.monotonic()
+            if day is None:
+                return
+            db = database.SessionLocal()
+            try:
+                row = db.query(models.ApiUsage).filter(
+                    models.ApiUsage.profile_id == self.tenant, models.ApiUsage.upstream == self.upstream,
+                    models.ApiUsage.day == day
+                ).with_for_update().first()
+                if row is None:
+                    row = models.ApiUsage(profile_id=self.tenant, upstream=self.upstream, day=day, calls=0)
+                    db.add(row)
+                row.calls = (row.calls or 0) + pending
+                db.commit()
+                total = row.calls
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Could not record {self.upstream} call usage: {e}")
+                with self._lock:
+                    self._pending += pending
+                return
+            finally:
+                db.close()
+            with self._lock:
+                if self.day == day:
+                    self.calls = max(self.calls, total + self._pending)
+        finally:
+            self._flush_lock.release()
+
+
+_usage = {}
+_limits = {}
+_registry_lock = threading.Lock()
+
+def _daily(upstream: str, tenant):
+    with _registry_lock:
+        usage = _usage.get((upstream, tenant))
+        if usage is None:
+            usage = _usage[(upstream, tenant)] = DailyUsage(upstream, tenant)
+        return usage
+
+def _profile_limits(tenant):
+    """(daily budget per upstream, reserve percent) of a profile, cached for LIMITS_TTL_SECONDS."""
+    if tenant is None:
+        return {}, 0
+    with _registry_lock:
+        cached = _limits.get(tenant)
+    if cached and time.monotonic() - cached[0] < LIMITS_TTL_SECONDS:
+        return cached[1], cached[2]
+    db = database.SessionLocal()
+    try:
+        config = db.query(models.Configuration).filter(models.Configuration.id == tenant).first()
+        daily = {"arena": config.arena_daily_call_budget or 0, "cin7": config.cin7_daily_call_budget or 0} if config else {}
+        reserve = (config.call_budget_reserve_percent or 0) if config else 0
+    except Exception as e:
+        # Never block calls because the settings could not be read; try again next call
+        logger.warning(f"Could not read call budgets of profile {tenant}: {e}")
+        return {}, 0
+    finally:
+        db.close()
+    with _registry_lock:
+        _limits[tenant] = (time.monotonic(), daily, reserve)
+    return daily, reserve
+
+def forget_limits(tenant=None):
+    """Drops cached budget settings, e.g. after a profile's settings were saved."""
+    with _registry_lock:
+        if tenant is None:
+            _limits.clear()
+        else:
+            _limits.pop(tenant, None)
+
+def allowance(upstream: str, tenant, priority: int = None):
+    """Daily calls the priority class may reach (None: unlimited). Only interactive work may use the reserve."""
+    daily, reserve = _profile_limits(tenant)
+    limit = daily.get(upstream)
+    if not limit:
+        return None
+    priority = work_scheduler.current_priority() if priority is None else priority
+    if priority == work_scheduler.INTERACTIVE:
+        return limit
+    return math.floor(limit * (100 - min(max(reserve, 0), 100)) / 100)
+
+def charge(upstream: str, tenant, budget: RunBudget = None):
+    """Counts one call at the caller's priority. Raises QuotaExceeded if a budget would be overrun."""
+    if budget is not None:
+        budget.take(upstream)
+    _daily(upstream, tenant).take(allowance(upstream, tenant))
+
+def exhausted(upstream: str, tenant, budget: RunBudget = None):
+    """True if the caller's next call to the upstream would be refused, so it can stop up front."""
+    if budget is not None and budget.exhausted(upstream):
+        return True
+    return _daily(upstream, tenant).remaining(allowance(upstream, tenant)) == 0
+
+def flush():
+    """Writes every unflushed count; called at shutdown."""
+    with _registry_lock:
+        usages = list(_usage.values())
+    for usage in usages:
+        usage.flush()
+
+def usage(tenant):
+    """Today's calls, budget and what is left of it for bulk and interactive work, per upstream."""
+    daily, reserve = _profile_limits(tenant)
+    report = {}
+    for upstream in UPSTREAMS:
+        calls = _daily(upstream, tenant)
+        # remaining() first: it rolls the count over to today
+        remaining_bulk = calls.remaining(allowance(upstream, tenant, work_scheduler.BULK))
+        remaining_interactive = calls.remaining(allowance(upstream, tenant, work_scheduler.INTERACTIVE))
+        report[upstream] = {
+            "calls_today": calls.calls,
+            "daily_budget": daily.get(upstream) or None,
+            "reserve_percent": reserve,
+            "remaining_bulk": remaining_bulk,
+            "remaining_interactive": remaining_interactive,
+        }
+    return report
+
+
+def plan(db: Session, config, dry_run: bool = True, changed_since=None):
+    """
+    Estimates the calls a full sync of the profile will make, per upstream, from what the
+    last harvests left behind: stored items, cached skip verdicts and the where-used index.
+    changed_since is the push watermark the run would use (None: full push).
+    """
+    stored = db.query(models.ArenaItem).filter(models.ArenaItem.profile_id == config.id).count()
+    skipped = db.query(models.SkippedItem).filter(models.SkippedItem.profile_id == config.id).count()
+    edges = db.query(models.BomEdge).filter(models.BomEdge.profile_id == config.id).count()
+    unindexed = db.query(models.ArenaItem).filter(
+        models.ArenaItem.profile_id == config.id,
+        or_(models.ArenaItem.bom_revision.is_(None), models.ArenaItem.bom_revision != models.ArenaItem.revision)
+    ).count()
+    includes, _ = prefix_service.parse_prefix_filter(config.item_prefix_filter)
+    shards = len(includes) or 1
+
+    last = db.query(models.SyncRun).filter(
+        models.SyncRun.profile_id == config.id, models.SyncRun.status == "complete"
+    ).order_by(models.SyncRun.started_at.desc()).first()
+    last_changed = (run_service.harvest_counts(last).get("items_changed") or 0) if last is not None and last.harvest_summary else None
+    # The harvest reads the BOMs of new and revised items (assume as many as last time)
+    # and of those not indexed yet; the push takes them from the index
+    revised = stored if last_changed is None else min(last_changed, stored)
+    if changed_since is None:
+        pushed = stored
+    else:
+        # Rows changed since the watermark, plus what the last run's harvest changed
+        pushed = db.query(models.ArenaItem).filter(
+            models.ArenaItem.profile_id == config.id, models.ArenaItem.last_updated > changed_since
+        ).count()
+        pushed = min(max(pushed, last_changed or 0), stored)
+    # BOM lines of the pushed assemblies, in proportion to the whole index
+    lines = math.ceil(edges * pushed / stored) if stored else 0
+
+    arena = {
+        "login": 2,                                   # harvest and push each log in
+        "list": shards + math.ceil((stored + skipped) / LIST_PAGE_SIZE),
+        "details": stored,                            # skip-cached items cost none
+        "sourcing": stored,
+        "bom": revised + unindexed,
+    }
+    cin7 = {} if dry_run else {
+        "lookup": pushed + lines,                     # each product, and each BOM component's existence check
+        "write": pushed,
+    }
+    estimate = {"arena": arena, "cin7": cin7}
+    totals = {upstream: sum(calls.values()) for upstream, calls in estimate.items()}
+    budget = run_budget(config)
+    left = usage(config.id)
+
+    fits, reasons = True, []
+    for upstream, total in totals.items():
+        remaining = left[upstream]["remaining_bulk"]
+        if remaining is not None and total > remaining:
+            fits = False
+            reasons.append(f"{upstream}: ~{total} calls needed, {remaining} left of today's budget for bulk work")
+        limit = budget.limits.get(upstream)
+        if limit and total > limit:
+            fits = False
+            reasons.append(f"{upstream}: ~{total} calls needed, run budget is {limit}")
+    return {
+        "profile_id": config.id,
+        "dry_run": dry_run,
+        "incremental": changed_since is not None,
+        "items": {"stored": stored, "skip_cached": skipped, "to_push": pushed, "bom_lines": lines},
+        "estimate": estimate,
+        "totals": totals,
+        "run_budget": {upstream: budget.limits.get(upstream) for upstream in UPSTREAMS},
+        "usage": left,
+        "fits": fits,
+        "reasons": reasons,
+    }
@@ -0,0 +1,157 @@
+from sqlalchemy.orm import Session
+from .. import models
+from . import artifact_service, profile_service, prefix_service, mapping_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Payload fields that the field mapping owns and that Cin7 echoes back on a product.
+# BOM flags and PriceTiers are left to the regular push.
+COMPARED_FIELDS = [
+    "Name", "Category", "Description", "UOM", "CostingMethod",
+    "RevenueAccount", "InventoryAccount", "COGSAccount", "DefaultLocation", "Type",
+    "Sellable", "Status", "InternalNote",
+    "AdditionalAttribute1", "AdditionalAttribute2", "AdditionalAttribute4",
+    "AttributeSet",
+]
+
+BOM_FIELDS = ["AssemblyBOM", "BillOfMaterial", "QuantityToProduce", "AssemblyCostEstimationMethod", "BillOfMaterialsProducts"]
+
+def _normalize(value):
+    """Treats None and empty strings alike and ignores surrounding whitespace."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+def _cin7_field(product: dict, field: str):
+    # Cin7 returns additional attributes nested under AdditionalAttributes
+    if field in product:
+        return product.get(field)
+    return (product.get("AdditionalAttributes") or {}).get(field)
+
+def diff_product(payload: dict, product: dict):
+    """Returns {field: {"arena": ..., "cin7": ...}} for every compared field that differs."""
+    diffs = {}
+    for field in COMPARED_FIELDS:
+        expected = _normalize(payload.get(field))
+        actual = _normalize(_cin7_field(product, field))
+        if expected != actual:
+            diffs[field] = {"arena": payload.get(field), "cin7": _cin7_field(product, field)}
+    return diffs
+
+def reconcile_catalog(db: Session, push: bool = False, profile_id: int = None):
+    """
+    Compares the whole Cin7 catalog against the local ArenaItem table in one bulk read.
+    Writes a drift report artifact (one NDJSON record per missing/extra/different SKU)
+    and, if push is set, writes only the drifted products back to Cin7. Pushes are
+    field-level: a missing product the where-used index knows to be an assembly is
+    created without its BOM and reported as "Partial" (a sync of the SKU adds it).
+    """
+    config = profile_service.get_profile(db, profile_id)
+    if not config or not config.cin7_api_user:
+        return {"status": "error", "message": "Cin7 configuration missing"}
+
+    cin7 = profile_service.cin7_client(config)
+    mapping = mapping_service.for_profile(db, config.id)
+    includes, excludes = prefix_service.parse_prefix_filter(config.item_prefix_filter)
+
+    try:
+        cin7_index = {
+            p.get("SKU"): p for p in cin7.iter_all_products()
+            if prefix_service.matches(p.get("SKU"), includes, excludes)
+        }
+    except Exception as e:
+        logger.error(f"Reconciliation failed reading Cin7 catalog: {e}")
+        return {"status": "error", "message": str(e)}
+
+    query = db.query(models.ArenaItem).filter(models.ArenaItem.profile_id == config.id)
+    in_scope = prefix_service.sql_filter(models.ArenaItem.item_number, includes, excludes)
+    if in_scope is not None:
+        query = query.filter(in_scope)
+
+    # Parents in the where-used index: the SKUs that have a BOM in Arena
+    assemblies = set()
+    if push:
+        assemblies = {sku for (sku,) in db.query(models.BomEdge.parent_sku).filter(
+            models.BomEdge.profile_id == config.id
+        ).distinct()}
+
+    run_id = artifact_service.new_run_id()
+    summary = {"compared": 0, "in_sync": 0, "missing": 0, "extra": 0, "different": 0, "pushed": 0, "push_failed": 0, "partial": 0}
+    failure = []
+
+    def push_drifted(payload, existing):
+        # Field-level fix only: don't touch BOM flags without the BOM resolved
+        for field in BOM_FIELDS:
+            payload.pop(field, None)
+        response = cin7.create_or_update_product(payload, existing=existing or False)
+        if response and response.get("status") == "success":
+            summary["pushed"] += 1
+            return None
+        summary["push_failed"] += 1
+        return (response or {}).get("message", "Unknown error")
+
+    def records():
+        try:
+            yield from drift()
+        except Exception as e:
+            failure.append(e)
+            raise
+
+    def drift():
+        for item in query.yield_per(500):
+            summary["compared"] += 1
+            payload = mapping.product(item)
+            product = cin7_index.pop(item.item_number, None)
+
+            if product is None:
+                summary["missing"] += 1
+                record = {"SKU": item.item_number, "Drift": "missing"}
+            else:
+                diffs = diff_product(payload, product)
+                if not diffs:
+                    summary["in_sync"] += 1
+                    continue
+                summary["different"] += 1
+                record = {"SKU": item.item_number, "Drift": "different", "Fields": diffs}
+
+            if push:
+                error = push_drifted(payload, product)
+                record["Pushed"] = error is None
+                if error:
+                    record["Error"] = error
+                elif product is None and item.item_number in assemblies:
+                    summary["partial"] += 1
+                    record["Partial"] = True
+                    record["Note"] = "Created without its BOM; sync the SKU to add it"
+            yield record
+
+        # Whatever is left in Cin7 has no harvested Arena counterpart
+        for sku in cin7_index:
+            summary["extra"] += 1
+            yield {"SKU": sku, "Drift": "extra"}
+
+        yield {"run_id": run_id, "profile_id": config.id, "push": push, "summary": summary}
+
+    if not artifact_service.write_artifact(run_id, records()):
+        error = failure[0] if failure else "the drift report could not be written"
+        logger.error(f"Reconciliation {run_id} failed: {error} ({summary})")
+        return {
+            "status": "error",
+            "message": f"Reconciliation failed: {error}",
+            "run_id": run_id,
+            "profile_id": config.id,
+            "push": push,
+            "summary": summary
+        }
+    logger.info(f"Reconciliation {run_id} complete: {summary}")
+    return {
+        "status": "complete",
+        "run_id": run_id,
+        "profile_id": config.id,
+        "push": push,
+        "summary": summary,
+        "report_url": f"/sync/runs/{run_id}/artifact"
+    }
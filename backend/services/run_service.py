@@ -0,0 +1,174 @@
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from .. import models, database
+from . import artifact_service
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A run's lease is renewed while it executes; once it lapses the run counts as abandoned
+RUN_LEASE_TTL_SECONDS = 120
+CANCEL_MESSAGE = "Cancelled by request"
+
+def lease_name(run_id: str):
+    return f"sync-run:{run_id}"
+
+def _load(text, default):
+    return json.loads(text) if text else default
+
+def create_run(db: Session, run_id: str = None, profile_id: int = None, dry_run: bool = True, changed_since=None):
+    run = models.SyncRun(
+        run_id=run_id or artifact_service.new_run_id(),
+        profile_id=profile_id,
+        dry_run=dry_run,
+        changed_since=changed_since,
+        status="running",
+        stage="harvest",
+        started_at=datetime.utcnow()
+    )
+    db.add(run)
+    db.commit()
+    return run
+
+def get_run(db: Session, run_id: str):
+    return db.query(models.SyncRun).filter(models.SyncRun.run_id == run_id).first()
+
+def harvest_counts(run):
+    return _load(run.harvest_summary, {})
+
+def push_counts(run):
+    return _load(run.push_summary, {"success": 0, "failed": 0, "mocked": 0})
+
+def harvest_shards(run):
+    """Per-shard harvest position: {shard: {"offset", "last_guid", "done"}}."""
+    return _load(run.harvest_shards, {})
+
+def checkpoint_harvest(run, shards: dict, counts: dict):
+    """Records harvest progress on the run; it is committed together with the harvested items."""
+    run.harvest_shards = json.dumps(shards)
+    run.harvest_summary = json.dumps(counts)
+    run.checkpoint_at = datetime.utcnow()
+
+def pushed_skus(db: Session, run_id: str):
+    """SKUs the run already has an outcome for, which a resumed push skips."""
+    rows = db.query(models.SyncRunItem.sku).filter(models.SyncRunItem.run_id == run_id)
+    return {sku for (sku,) in rows}
+
+def _outcome(record: dict):
+    if "Error" in record:
+        return "failed"
+    if "Payload" in record:
+        return "mocked"
+    return "success"
+
+
+class PushCheckpoint:
+    """
+    Buffers per-SKU push outcomes and writes them, with the running summary, every
+    `interval` items. Uses its own session because the push shares the caller's
+    session with its worker threads.
+    """
+
+    def __init__(self, run_id: str, interval: int, summary: dict):
+        self.run_id = run_id
+        self.interval = max(1, interval)
+        self.summary = summary
+        self._pending = []
+
+    def record(self, record: dict):
+        self._pending.append({
+            "run_id": self.run_id,
+            "sku": record.get("SKU"),
+            "outcome": _outcome(record),
+            "error": record.get("Error"),
+        })
+        if len(self._pending) >= self.interval:
+            self.flush()
+
+    def flush(self):
+        db = database.SessionLocal()
+        try:
+            if self._pending:
+                db.bulk_insert_mappings(models.SyncRunItem, self._pending)
+            db.query(models.SyncRun).filter(models.SyncRun.run_id == self.run_id).update({
+                "push_summary": json.dumps(self.summary),
+                "checkpoint_at": datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+            self._pending = []
+        finally:
+            db.close()
+
+
+def finish_run(run_id: str, status: str, message: str = None):
+    """Sets a run's final (or interrupted) status on a fresh session, whatever state the caller's session is in."""
+    db = database.SessionLocal()
+    try:
+        values = {"status": status, "message": message}
+        if status == "complete":
+            values.update({"stage": "done", "finished_at": datetime.utcnow()})
+        elif status in ("failed", "cancelled"):
+            values["finished_at"] = datetime.utcnow()
+        db.query(models.SyncRun).filter(models.SyncRun.run_id == run_id).update(values, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    logger.info(f"Sync run {run_id} {status}.")
+
+def request_cancel(db: Session, run):
+    """
+    Flags a running run for cancellation. The node executing it sees the flag within
+    cancellation.POLL_SECONDS; a run nobody is executing is marked cancelled at once.
+    """
+    run.cancel_requested_at = datetime.utcnow()
+    db.commit()
+    if not is_live(db, run.run_id):
+        finish_run(run.run_id, "cancelled", CANCEL_MESSAGE)
+        db.refresh(run)
+
+def cancel_requested(run_id: str):
+    """The cancel reason if the run was flagged for cancellation, else None. Reads on its own session."""
+    db = database.SessionLocal()
+    try:
+        requested = db.query(models.SyncRun.cancel_requested_at).filter(models.SyncRun.run_id == run_id).scalar()
+        return CANCEL_MESSAGE if requested else None
+    finally:
+        db.close()
+
+def is_live(db: Session, run_id: str):
+    """True while some node holds the run's lease, i.e. the run is executing right now."""
+    lease = db.query(models.Lease).filter(models.Lease.name == lease_name(run_id)).first()
+    return bool(lease and lease.holder and lease.expires_at and lease.expires_at >= datetime.utcnow())
+
+def abandoned_runs(db: Session):
+    """Runs still marked running whose lease lapsed, i.e. whose process crashed or was redeployed."""
+    now = datetime.utcnow()
+    quiet_since = now - timedelta(seconds=RUN_LEASE_TTL_SECONDS)
+    runs = db.query(models.SyncRun).filter(models.SyncRun.status == "running").order_by(models.SyncRun.started_at).all()
+    abandoned = []
+    for run in runs:
+        # A run that just started may not hold its lease yet
+        if (run.checkpoint_at or run.started_at) > quiet_since:
+            continue
+        if not is_live(db, run.run_id):
+            abandoned.append(run)
+    return abandoned
+
+def run_status(run):
+    return {
+        "run_id": run.run_id,
+        "profile_id": run.profile_id,
+        "dry_run": run.dry_run,
+        "status": run.status,
+        "stage": run.stage,
+        "harvest_shards": harvest_shards(run),
+        "harvest_summary": harvest_counts(run),
+        "push_summary": push_counts(run),
+        "changed_since": run.changed_since,
+        "message": run.message,
+        "cancel_requested_at": run.cancel_requested_at,
+        "started_at": run.started_at,
+        "checkpoint_at": run.checkpoint_at,
+        "finished_at": run.finished_at,
+    }
@@ -0,0 +1,193 @@
+from datetime import datetime, timedelta
+from .. import database
+from . import profile_service
+import logging
+import os
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+# The first poll after a (re)start waits this long plus up to the jitter, so a restart or
+# rolling deploy serves traffic before it starts harvesting
+FIRST_RUN_DELAY_SECONDS = int(os.getenv("SCHEDULER_FIRST_RUN_DELAY_SECONDS", "60"))
+STARTUP_JITTER_SECONDS = int(os.getenv("SCHEDULER_STARTUP_JITTER_SECONDS", "30"))
+# How often the change queue is checked for due entries (local DB only, no Arena calls)
+QUEUE_DRAIN_SECONDS = int(os.getenv("QUEUE_DRAIN_SECONDS", "5"))
+
+# Adaptive factors applied after each tick
+TIGHTEN_FACTOR = 0.5
+BACKOFF_FACTOR = 1.5
+
+def load_schedule(db, profile_id: int = None):
+    """Reads a profile's (base, min, max) poll intervals in minutes from Configuration, sanitised."""
+    config = profile_service.get_profile(db, profile_id)
+    base = (config.sync_interval_minutes if config else None) or 5
+    low = (config.min_sync_interval_minutes if config else None) or 1
+    high = (config.max_sync_interval_minutes if config else None) or 30
+    low = max(1, min(low, base))
+    high = max(base, high)
+    return base, low, high
+
+def _profile_ids():
+    db = database.SessionLocal()
+    try:
+        return profile_service.profile_ids(db)
+    finally:
+        db.close()
+
+def next_interval(current: float, activity: int, low: float, high: float):
+    """Tightens the interval while changes are flowing and backs off while idle."""
+    if activity > 0:
+        return max(low, current * TIGHTEN_FACTOR)
+    return min(high, current * BACKOFF_FACTOR)
+
+
+def _interval(seconds):
+    # APScheduler is imported when the scheduler starts, not with the app
+    from apscheduler.triggers.interval import IntervalTrigger
+    return IntervalTrigger(seconds=seconds)
+
+
+class SyncScheduler:
+    """
+    Runs the change poller of every connection profile on that profile's own interval.
+    A run never overlaps the profile's next tick (missed ticks coalesce into one), the
+    first run is jittered so replicas and profiles don't poll Arena in lockstep, and each
+    profile's interval adapts to how many changes its last run found. A second
+    short-interval job drains the change queue so notified changes are synced as soon
+    as their debounce expires.
+    """
+    JOB_ID = "arena_sync_job"
+    DRAIN_JOB_ID = "change_queue_job"
+
+    def __init__(self, job, drain_job=None):
+        # job(profile_id) runs one poll and returns how much change activity it found
+        # (None if it didn't run, e.g. another node leads); drain_job() consumes the change queue
+        self._job = job
+        self._periodic = []
+        if drain_job:
+            self.add_periodic(self.DRAIN_JOB_ID, drain_job, QUEUE_DRAIN_SECONDS)
+        # Created by start()
+        self._scheduler = None
+        self._lock = threading.Lock()
+        # profile_id -> {"interval_minutes", "last_activity", "last_run"}
+        self._profiles = {}
+
+    def _job_id(self, profile_id):
+        return f"{self.JOB_ID}:{profile_id}"
+
+    def _add_profile(self, profile_id):
+        db = database.SessionLocal()
+        try:
+            base, _, _ = load_schedule(db, profile_id)
+        finally:
+            db.close()
+
+        with self._lock:
+            self._profiles[profile_id] = {"interval_minutes": base, "last_activity": None, "last_run": None}
+        first_run = datetime.now() + timedelta(seconds=FIRST_RUN_DELAY_SECONDS + random.uniform(0, STARTUP_JITTER_SECONDS))
+        self._scheduler.add_job(
+            self._tick, _interval(int(base * 60)), args=[profile_id],
+            id=self._job_id(profile_id), next_run_time=first_run, replace_existing=True
+        )
+        logger.info(f"Scheduler: profile {profile_id} polls every {base} minutes, first run at {first_run:%H:%M:%S}.")
+
+    def _remove_profile(self, profile_id):
+        with self._lock:
+            self._profiles.pop(profile_id, None)
+        if self._scheduler.get_job(self._job_id(profile_id)):
+            self._scheduler.remove_job(self._job_id(profile_id))
+
+    @property
+    def running(self):
+        return self._scheduler is not None and self._scheduler.running
+
+    def start(self):
+        from apscheduler.schedulers.background import BackgroundScheduler
+        self._scheduler = BackgroundScheduler(job_defaults={
+            "coalesce": True,
+            "max_instances": 1,
+            "misfire_grace_time": 60,
+        })
+        for job_id, func, seconds in self._periodic:
+            self._scheduler.add_job(func, _interval(seconds), id=job_id, replace_existing=True)
+        self._scheduler.start()
+        for profile_id in _profile_ids():
+            self._add_profile(profile_id)
+        logger.info(f"Scheduler started for {len(self._profiles)} profile(s).")
+
+    def add_periodic(self, job_id: str, func, seconds: int):
+        """Registers a fixed-interval, non-overlapping job to start with the scheduler."""
+        self._periodic.append((job_id, func, seconds))
+
+    def shutdown(self, wait: bool = True):
+        if self.running:
+            self._scheduler.shutdown(wait=wait)
+
+    def _reschedule(self, profile_id, minutes: float):
+        with self._lock:
+            state = self._profiles.get(profile_id)
+            if state is None or minutes == state["interval_minutes"]:
+                return
+            state["interval_minutes"] = minutes
+            self._scheduler.reschedule_job(self._job_id(profile_id), trigger=_interval(int(minutes * 60)))
+        logger.info(f"Scheduler: profile {profile_id} poll interval now {minutes:g} minutes.")
+
+    def _tick(self, profile_id):
+        try:
+            activity = self._job(profile_id)
+        except Exception as e:
+            logger.error(f"Scheduler job for profile {profile_id} failed: {e}")
+            activity = 0
+        if activity is None:
+            # Nothing ran on this node (e.g. another node leads), so there is nothing to adapt to
+            return
+
+        with self._lock:
+            state = self._profiles.get(profile_id)
+            if state is None:
+                return
+            state["last_run"] = datetime.now()
+            state["last_activity"] = activity
+            current = state["interval_minutes"]
+        db = database.SessionLocal()
+        try:
+            _, low, high = load_schedule(db, profile_id)
+        finally:
+            db.close()
+        self._reschedule(profile_id, next_interval(current, activity, low, high))
+
+    def refresh(self, profile_id: int = None):
+        """
+        Applies changed profiles right away: new profiles get a poll job, removed ones
+        lose theirs, and the edited profile_id (if given) restarts adaptation from its
+        base interval. Other profiles keep their adapted intervals.
+        """
+        if not self.running:
+            return
+        current = set(_profile_ids())
+        with self._lock:
+            known = set(self._profiles)
+        for removed in known - current:
+            self._remove_profile(removed)
+        for added in current - known:
+            self._add_profile(added)
+
+        if profile_id in current & known:
+            db = database.SessionLocal()
+            try:
+                base = load_schedule(db, profile_id)[0]
+            finally:
+                db.close()
+            self._reschedule(profile_id, base)
+
+    def status(self):
+        running = self.running
+        profiles = {}
+        with self._lock:
+            states = {pid: dict(state) for pid, state in self._profiles.items()}
+        for profile_id, state in states.items():
+            job = self._scheduler.get_job(self._job_id(profile_id)) if running else None
+            profiles[profile_id] = {**state, "next_run_time": job.next_run_time if job else None}
+        return {"running": running, "profiles": profiles}
@@ -0,0 +1,67 @@
+"""
+Negative-result cache for the harvest. Items filtered out by the lifecycle or
+"Transfer Data to ERP?" rules are remembered with the revision they were judged on,
+so later harvests skip their detail call while the listing shows the same revision.
+A verdict is re-evaluated once the revision or the filter definition changes; items
+listed without a revision have nothing to key a verdict on and are always fetched.
+"""
+from sqlalchemy.orm import Session
+from datetime import datetime
+from .. import models
+import hashlib
+import json
+
+CACHED_REASONS = ("skipped_lifecycle", "skipped_transfer_erp")
+
+def rules_hash(allowed_lifecycles, transfer_value="Yes"):
+    """Fingerprint of the filters a verdict depends on; changing them invalidates the cache."""
+    definition = {"lifecycles": sorted(allowed_lifecycles), "transfer": transfer_value}
+    return hashlib.sha1(json.dumps(definition, sort_keys=True).encode()).hexdigest()
+
+def load(db: Session, profile_id: int):
+    """Returns {guid: (revision, reason, rules_hash)} for a profile's cached verdicts."""
+    rows = db.query(
+        models.SkippedItem.guid, models.SkippedItem.revision,
+        models.SkippedItem.reason, models.SkippedItem.rules_hash
+    ).filter(models.SkippedItem.profile_id == profile_id)
+    return {guid: (revision, reason, digest) for guid, revision, reason, digest in rows}
+
+def lookup(cache: dict, guid: str, revision: str, digest: str):
+    """The cached skip reason if the verdict still holds for this revision and these rules."""
+    if revision is None:
+        return None
+    entry = cache.get(guid)
+    if entry and entry[0] == revision and entry[2] == digest:
+        return entry[1]
+    return None
+
+def remember(db: Session, cache: dict, profile_id: int, guid: str, revision: str, reason: str, digest: str):
+    """Records (or refreshes) a verdict; committed with the caller's next harvest commit."""
+    if revision is None:
+        # Could never be told apart from the item's next revision
+        forget(db, cache, profile_id, guid)
+        return
+    values = {"revision": revision, "reason": reason, "rules_hash": digest, "skipped_at": datetime.utcnow()}
+    if guid in cache:
+        db.query(models.SkippedItem).filter(
+            models.SkippedItem.profile_id == profile_id, models.SkippedItem.guid == guid
+        ).update(values, synchronize_session=False)
+    else:
+        db.add(models.SkippedItem(profile_id=profile_id, guid=guid, **values))
+    cache[guid] = (revision, reason, digest)
+
+def forget(db: Session, cache: dict, profile_id: int, guid: str):
+    """Drops a verdict once the item passes the filters."""
+    if cache.pop(guid, None) is not None:
+        db.query(models.SkippedItem).filter(
+            models.SkippedItem.profile_id == profile_id, models.SkippedItem.guid == guid
+        ).delete(synchronize_session=False)
+
+def clear(db: Session, profile_id: int = None):
+    """Forgets every verdict (for one profile), forcing the next harvest to re-check them."""
+    query = db.query(models.SkippedItem)
+    if profile_id is not None:
+        query = query.filter(models.SkippedItem.profile_id == profile_id)
+    count = query.delete(synchronize_session=False)
+    db.commit()
+    return count
@@ -1,183 +1,353 @@
 from sqlalchemy.orm import Session
-from .. import models
-from .arena_service import ArenaClient
+from .. import models, database
+from .arena_service import ArenaClient, ItemSummary
 from .cin7_service import Cin7Client
+from . import bom_service, work_scheduler, change_queue_service, profile_service, run_service, artifact_service, lease_service, dead_letter_service, prefix_service, skip_cache_service, circuit_breaker, where_used_service, mapping_service, quota_service, cancellation
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+import hashlib
+import json
 import logging
+import os
+import queue
+import threading
+import zlib
 
 logger = logging.getLogger(__name__)
 
-def get_rule_value(db: Session, key: str, default: str):
-    """Helper to fetch dynamic sync rules from the database."""
-    rule = db.query(models.SyncRule).filter(
-        models.SyncRule.rule_key == key, 
-        models.SyncRule.is_enabled == True
-    ).first()
-    return rule.rule_value if rule else default
-
 def map_additional_attributes(item_json):
     """Helper to extract custom fields from the additionalAttributes array."""
     attrs = item_json.get("additionalAttributes", [])
     return {a.get("name"): a.get("value") for a in attrs}
 
-def map_arena_to_cin7(arena_item, db: Session, bom_resolved_list=None):
-    """Maps ArenaItem to Cin7 structure enforcing sync rules for accounts and defaults."""
-    
-    # Combined Mfr String: [manufacturer] [manufacturer_item_number]
-    mfr_info = f"{arena_item.manufacturer or ''} {arena_item.manufacturer_item_number or ''}".strip()
-    
-    payload = {
-        "SKU": arena_item.item_number,
-        "Name": arena_item.item_name,
-        "Category": arena_item.category or "Fabricated Metal",
-        "Description": arena_item.description or "",
-        "UOM": arena_item.uom or "EA",
-        "CostingMethod": arena_item.costing_method or "FIFO - Batch",
-        
-        # Rules #2, #3, #4: Dynamic defaults from DB
-        "RevenueAccount": get_rule_value(db, "RevenueAccount", "4001: OEM Product"),
-        "InventoryAccount": get_rule_value(db, "InventoryAccount", "1402: Raw Materials"),
-        "COGSAccount": get_rule_value(db, "COGSAccount", "4100: Cost of Sales"),
-        "DefaultLocation": get_rule_value(db, "DefaultLocation", "Main Warehouse"),
-        "Type": get_rule_value(db, "ProductType", "Stock"),
-        
-        "Sellable": True if arena_item.sellable == "Yes" else False,
-        "Status": "Active",
-        "InternalNote": arena_item.internal_note_erp or "",
-        "AdditionalAttribute1": arena_item.revision,
-        "AdditionalAttribute2": arena_item.last_glg_co,
-        "AdditionalAttribute4": mfr_info,
-        "AttributeSet": "Item",
-        
-        # Mandatory PriceTiers object to resolve Cin7 Error 400
-        "PriceTiers": {
-            "Standard": 0.0000,
-            "Tier 2": 0.0000,
-            "Tier 3": 0.0000,
-            "Tier 4": 0.0000,
-            "Tier 5": 0.0000,
-            "Tier 6": 0.0000,
-            "Tier 7": 0.0000,
-            "Tier 8": 0.0000,
-            "Tier 9": 0.0000,
-            "Tier 10": 0.0000
-        }
+# Rule #7: Allowed production stage lifecycle statuses
+ALLOWED_LIFECYCLES = ["In Production", "Deprecated", "Obsolete", "Production"]
+
+# Harvested items buffered between the shard workers and the DB writer
+HARVEST_QUEUE_SIZE = 200
+# Shards listed at once per harvest. A shard keeps its thread for its whole listing, so
+# shards run on the harvest's own threads rather than the shared work scheduler, whose
+# workers must stay free for interactive and poller work
+HARVEST_SHARD_THREADS = int(os.getenv("HARVEST_SHARD_THREADS", "4"))
+# Rows read per keyset page when pushing
+PUSH_CHUNK_SIZE = 500
+# Items a push keeps queued or running on the work scheduler at once (a few per worker)
+PUSH_WINDOW = 40
+# Payloads and failures a JSON (non-streaming) push response lists; the rest are only
+# counted, so memory stays flat. ?output=ndjson or ?output=artifact return every record.
+RESULT_DETAILS_LIMIT = int(os.getenv("RESULT_DETAILS_LIMIT", "200"))
+# Sent together or not at all: the BOM lines and the flags that say the product has them
+BOM_PAYLOAD_FIELDS = ["BillOfMaterialsProducts", "AssemblyBOM", "BillOfMaterial"]
+
+
+class HarvestedItem:
+    """
+    The arena_items columns a harvest writes for one item. A plain slotted record
+    instead of an ArenaItem, so the harvest keeps no ORM objects alive between chunks.
+    """
+    __slots__ = (
+        "guid", "profile_id", "item_number", "item_name", "revision", "lifecycle_phase",
+        "category", "description", "uom", "costing_method", "inventory_account",
+        "cogs_account", "sellable", "internal_note_erp", "last_glg_co", "transfer_to_erp",
+        "manufacturer", "manufacturer_item_number"
+    )
+
+    def __init__(self, **values):
+        for field in self.__slots__:
+            setattr(self, field, values.get(field))
+
+    def as_mapping(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+# arena_items columns a HarvestedItem carries, for reading rows back as records
+RECORD_COLUMNS = [getattr(models.ArenaItem, field) for field in HarvestedItem.__slots__]
+
+def _store_items(db: Session, records: list):
+    """
+    Upserts one chunk of harvested records with bulk statements; committed by the caller.
+    Rows whose content is unchanged are not written, and only written rows get a new
+    last_updated, so the push watermark only picks up real changes. Returns rows written.
+    """
+    if not records:
+        return 0
+    rows = {record.guid: record.as_mapping() for record in records}
+    stored = {
+        row.guid: row._asdict() for row in
+        db.query(*RECORD_COLUMNS).filter(models.ArenaItem.guid.in_(list(rows)))
     }
+    now = datetime.utcnow()
+    inserts = [dict(row, last_updated=now) for guid, row in rows.items() if guid not in stored]
+    updates = [dict(row, last_updated=now) for guid, row in rows.items() if guid in stored and stored[guid] != row]
+    db.bulk_insert_mappings(models.ArenaItem, inserts)
+    db.bulk_update_mappings(models.ArenaItem, updates)
+    return len(inserts) + len(updates)
 
-    if bom_resolved_list:
-        payload["AssemblyBOM"] = True
-        payload["BillOfMaterial"] = True 
-        payload["QuantityToProduce"] = 1.0
-        payload["AssemblyCostEstimationMethod"] = "Average Cost" # Changed from "Total" to valid enum
-        
-        bom_products = []
-        for item in bom_resolved_list:
-            entry = {
-                "Quantity": item.get("qty", 0)
-            }
-            if item.get("cin7_id"):
-                entry["ComponentProductID"] = item.get("cin7_id")
-            else:
-                entry["ProductCode"] = item.get("sku")
-                
-            bom_products.append(entry)
-        
-        payload["BillOfMaterialsProducts"] = bom_products
-    else:
-        payload["AssemblyBOM"] = False
-        payload["BillOfMaterial"] = False
+def _fetch_item(arena: ArenaClient, guid: str, profile_id: int, mapping):
+    """
+    Fetches one listed item and builds its HarvestedItem (via the run's compiled mapping)
+    if it passes the sync filters.
+    Returns (counter, item): the counter it falls under (None if its details could not be
+    fetched) and the record to store, or None if it is skipped. Touches no DB session.
+    """
+    details = arena.get_item_details(guid)
+    if not details:
+        return None, None
         
-    return payload
+    # Rule #7: Lifecycle Status Filter
+    lifecycle = details.get("lifecyclePhase", {}).get("name")
+    if lifecycle not in ALLOWED_LIFECYCLES:
+        return "skipped_lifecycle", None
+
+    attrs = map_additional_attributes(details)
+    
+    # Rule #1: Sync Filter based on "Transfer Data to ERP?" field
+    if attrs.get("Transfer Data to ERP?") != "Yes":
+        return "skipped_transfer_erp", None
+    
+    sourcing = arena.get_sourcing(guid)
+    db_item = HarvestedItem(guid=guid, profile_id=profile_id, **mapping.item(details, sourcing))
+    return "items_harvested", db_item
+
+def _prefilter(summary: ItemSummary, excludes: list):
+    """
+    Applies the sync filters the list response can already answer, so items that won't
+    sync cost no detail call. Returns the skip counter, or None if the details are needed.
+    """
+    if not prefix_service.matches(summary.number, [], excludes):
+        return "skipped_excluded"
+    # Rule #7: Lifecycle Status Filter, when the summary carries the phase
+    if summary.lifecycle is not None and summary.lifecycle not in ALLOWED_LIFECYCLES:
+        return "skipped_lifecycle"
+    # Rule #1: only if the summary happens to carry additional attributes
+    if summary.transfer is not None and summary.transfer != "Yes":
+        return "skipped_transfer_erp"
+    return None
+
+def _put(out, stop, message):
+    # Blocks while the writer is behind, but gives up once the harvest is stopped
+    while not stop.is_set():
+        try:
+            out.put(message, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _harvest_shard(arena: ArenaClient, shard: str, state: dict, excludes: list, criteria: dict, skipped: dict, digest: str, seen: set, seen_lock, out, stop, mapping, revisions: dict):
+    """
+    Shard worker: lists one prefix family page by page from its checkpoint (narrowed by
+    the server-side search criteria) and fetches details only for items that pass the
+    list-level filters, have no cached skip verdict for their listed revision, and no
+    other shard has taken. Items whose BOM the where-used index doesn't hold at their
+    revision (`revisions`) also get it fetched, for the index and the push. `skipped`
+    and `revisions` are read-only here; the writer maintains the tables.
+    Posts ("item" | "page" | "done" | "error", shard, ...) messages to the DB writer.
+    """
+    prefix = None if shard == "*" else shard
+    try:
+        start, resume_after = state.get("offset", 0), state.get("last_guid")
+        for offset, page in arena.iter_item_pages(prefix, start, criteria=criteria):
+            next_offset = offset + len(page)
+            if resume_after and offset == start:
+                # Skip what the interrupted run already harvested on this page
+                guids = [summary.guid for summary in page]
+                if resume_after in guids:
+                    page = page[guids.index(resume_after) + 1:]
 
-def perform_sync(db: Session):
-    """Harvests items from Arena to SQLite, enforcing sync filters."""
-    config = db.query(models.Configuration).first()
+            for summary in page:
+                if stop.is_set():
+                    return
+                guid = summary.guid
+                with seen_lock:
+                    duplicate = guid in seen
+                    seen.add(guid)
+                revision = summary.revision
+                fetched = cached = False
+                bom = None
+                if duplicate:
+                    outcome, item = "duplicates", None
+                else:
+                    outcome, item = _prefilter(summary, excludes), None
+                    if outcome is None:
+                        outcome = skip_cache_service.lookup(skipped, guid, revision, digest)
+                        cached = outcome is not None
+                    if outcome is None:
+                        outcome, item = _fetch_item(arena, guid, arena.tenant, mapping)
+                        fetched = True
+                    if item is not None and revisions.get(guid) != item.revision:
+                        bom = arena.get_bom(guid)
+                message = ("item", shard, offset, guid, revision, outcome, item, fetched, cached, bom)
+                if not _put(out, stop, message):
+                    return
+            if not _put(out, stop, ("page", shard, next_offset)):
+                return
+        _put(out, stop, ("done", shard))
+    except Exception as e:
+        _put(out, stop, ("error", shard, e))
+
+def perform_sync(db: Session, profile_id: int = None, run=None, budget=None, cancel=None):
+    """
+    Harvests items from Arena to SQLite for one profile, enforcing sync filters.
+    Every prefix family in item_prefix_filter is listed and fetched as its own shard,
+    up to HARVEST_SHARD_THREADS at once on the harvest's own threads; items are
+    de-duplicated by GUID, and excluded prefixes, lifecycle phases and (with
+    transfer_attribute_guid) untransferred items are dropped from the list response
+    before any detail call. Items the detail check filtered
+    out are cached by revision (skip_cache_service) and not fetched again until their
+    revision or the filters change. New and revised items' BOMs go into the where-used
+    index with the chunk they came with, and the push reads them from there. This
+    thread is the only DB writer; it buffers compact records and writes (then drops)
+    them in chunks, at least once per page.
+    With a SyncRun, each shard's position is checkpointed together with the items
+    every Configuration.checkpoint_interval items, and a resumed run
+    continues every unfinished shard after its last checkpointed item. budget is the
+    run's quota_service.RunBudget and cancel its cancellation.CancelToken, if any; a
+    cancelled harvest checkpoints what it has and returns status "cancelled".
+    """
+    config = profile_service.get_profile(db, profile_id)
     if not config or not config.arena_workspace_id:
         return {"status": "error", "message": "Arena configuration missing"}
 
-    # Rule #7: Allowed production stage lifecycle statuses
-    # Rule #7: Allowed production stage lifecycle statuses
-    allowed_lifecycles = ["In Production", "Deprecated", "Obsolete", "Production"]
-
-    arena = ArenaClient(config.arena_workspace_id, config.arena_email, config.arena_password)
+    arena = profile_service.arena_client(config, budget, cancel)
     if not arena.login():
-        return {"status": "error", "message": "Arena login failed"}
+        return {"status": "error", "message": arena.login_refused or "Arena login failed"}
 
-    try:
-        # Pass the prefix filter to the service method for server-side filtering
-        items_summary = arena.list_all_items(config.item_prefix_filter)
-        count = 0
-        skipped_lifecycle = 0
-        skipped_transfer_erp = 0
-
-        for summary in items_summary:
-            # Client-side filter removed as it is now handled by the API query
-            
-            guid = summary['guid']
-            details = arena.get_item_details(guid)
-            if not details:
-                continue
-                
-            # Rule #7: Lifecycle Status Filter
-            lifecycle = details.get("lifecyclePhase", {}).get("name")
-            if lifecycle not in allowed_lifecycles:
-                skipped_lifecycle += 1
-                continue
+    includes, excludes = prefix_service.parse_prefix_filter(config.item_prefix_filter)
+    counts = {"items_harvested": 0, "skipped_lifecycle": 0, "skipped_transfer_erp": 0,
+              "skipped_excluded": 0, "duplicates": 0, "items_listed": 0, "details_fetched": 0, "cache_hits": 0, "items_changed": 0}
+    saved = {}
+    if run is not None:
+        counts.update(run_service.harvest_counts(run))
+        saved = run_service.harvest_shards(run)
+    shards = {
+        shard: saved.get(shard, {"offset": 0, "last_guid": None, "done": False})
+        for shard in (includes or ["*"])
+    }
+    interval = max(1, config.checkpoint_interval or 50)
+    # Rule #1 pushed into the search; the detail check below still enforces it
+    criteria = {config.transfer_attribute_guid: "Yes"} if config.transfer_attribute_guid else None
+    skipped = skip_cache_service.load(db, config.id)
+    digest = skip_cache_service.rules_hash(ALLOWED_LIFECYCLES)
+    # Shards read a frozen copy; the writer keeps `skipped` current
+    verdicts = dict(skipped)
+    mapping = mapping_service.for_profile(db, config.id)
+    # Indexed BOM revisions: a BOM only changes with a new revision, so only those are re-read
+    revisions = dict(db.query(models.ArenaItem.guid, models.ArenaItem.bom_revision).filter(models.ArenaItem.profile_id == config.id))
 
-            attrs = map_additional_attributes(details)
-            
-            # Rule #1: Sync Filter based on "Transfer Data to ERP?" field
-            if attrs.get("Transfer Data to ERP?") != "Yes":
-                skipped_transfer_erp += 1
-                continue
-            
-            sourcing = arena.get_sourcing(guid)
-            results = sourcing.get("results", [])
-            mfr_name, mfr_num = None, None
-            if results:
-                v_item = results[0].get("vendorItem", {})
-                mfr_name = v_item.get("supplier", {}).get("name")
-                mfr_num = v_item.get("number")
-
-            db_item = models.ArenaItem(
-                guid=guid,
-                item_number=details.get("number"),
-                item_name=details.get("name"),
-                revision=details.get("revisionNumber"),
-                lifecycle_phase=lifecycle,
-                category=details.get("category", {}).get("name"),
-                description=details.get("description"),
-                uom=details.get("uom"),
-                costing_method=attrs.get("Costing Method"),
-                inventory_account=attrs.get("Inventory Account"),
-                cogs_account=attrs.get("COGS Account"),
-                sellable=attrs.get("Sellable"),
-                internal_note_erp=attrs.get("Internal Note for ERP"),
-                last_glg_co=attrs.get("Last GLG CO"),
-                manufacturer=mfr_name,
-                manufacturer_item_number=mfr_num
-            )
-            db.merge(db_item)
-            count += 1
+    chunk = []
+    boms = {}
 
+    def checkpoint():
+        counts["items_changed"] += _store_items(db, chunk)
+        chunk.clear()
+        where_used_service.store_boms(db, config.id, boms)
+        boms.clear()
+        if run is not None:
+            run_service.checkpoint_harvest(run, shards, counts)
         db.commit()
+
+    out = queue.Queue(maxsize=HARVEST_QUEUE_SIZE)
+    stop = threading.Event()
+    seen, seen_lock = set(), threading.Lock()
+    pending = [(shard, state) for shard, state in shards.items() if not state["done"]]
+    # Upstream calls made on these threads take Arena slots at the default (bulk) priority
+    pool = ThreadPoolExecutor(max_workers=max(1, min(HARVEST_SHARD_THREADS, len(pending))), thread_name_prefix=f"harvest-{config.id}")
+    futures = [
+        pool.submit(_harvest_shard, arena, shard, dict(state), excludes, criteria, verdicts, digest, seen, seen_lock, out, stop, mapping, revisions)
+        for shard, state in pending
+    ]
+
+    try:
+        remaining = len(futures)
+        since_checkpoint = 0
+        while remaining:
+            try:
+                # Wakes up now and then so a cancel is seen while every shard is waiting on Arena
+                message = out.get(timeout=cancellation.POLL_SECONDS)
+            except queue.Empty:
+                message = None
+            if cancel is not None and cancel.cancelled:
+                # Keep what was written; a resume continues from this checkpoint
+                checkpoint()
+                return {"status": "cancelled", "message": cancel.reason, "profile_id": config.id, **counts}
+            if message is None:
+                continue
+            kind, shard = message[0], message[1]
+            if kind == "item":
+                _, _, offset, guid, revision, outcome, item, fetched, cached, bom = message
+                counts["items_listed"] += 1
+                counts["details_fetched"] += fetched
+                counts["cache_hits"] += cached
+                if item is not None:
+                    chunk.append(item)
+                    if bom is not None:
+                        boms[item.item_number] = (item.revision, bom)
+                    skip_cache_service.forget(db, skipped, config.id, guid)
+                elif fetched and outcome in skip_cache_service.CACHED_REASONS:
+                    skip_cache_service.remember(db, skipped, config.id, guid, revision, outcome, digest)
+                if outcome:
+                    counts[outcome] += 1
+                shards[shard].update(offset=offset, last_guid=guid)
+                since_checkpoint += 1
+                if since_checkpoint >= interval:
+                    checkpoint()
+                    since_checkpoint = 0
+            elif kind == "page":
+                # Page done: a resume starts at the next one
+                shards[shard].update(offset=message[2], last_guid=None)
+                checkpoint()
+            elif kind == "done":
+                shards[shard]["done"] = True
+                remaining -= 1
+                checkpoint()
+            else:
+                raise message[2]
+
         return {
             "status": "success", 
-            "items_harvested": count, 
-            "skipped_lifecycle": skipped_lifecycle,
-            "skipped_transfer_erp": skipped_transfer_erp,
+            "profile_id": config.id,
             "item-prefix": config.item_prefix_filter,
-            "raw_data": items_summary
+            "shards": len(shards),
+            **counts
         }
     except Exception as e:
         db.rollback()
         logger.error(f"Sync failed: {str(e)}")
         return {"status": "error", "message": str(e)}
+    finally:
+        stop.set()
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+def _product_id(data):
+    """Extracts the Cin7 product ID from a create/update response body."""
+    # handle case where list is returned
+    if isinstance(data, list):
+        return data[0].get("ID") if data else None
+    return (data or {}).get("ID")
+
+def _item_bom(db: Session, arena: ArenaClient, item):
+    """
+    BOM lines of a harvested item: from the where-used index when it holds them at the
+    item's revision (the harvest read them), otherwise from Arena, indexing them.
+    """
+    bom_items = where_used_service.indexed_bom(db, arena.tenant, item.item_number, item.revision)
+    if bom_items is None:
+        bom_items = arena.get_bom(item.guid)
+        where_used_service.record_bom(arena.tenant, item.item_number, bom_items, item.revision)
+    return bom_items or []
 
-def _ensure_product_exists(db: Session, sku: str, arena_client: ArenaClient, cin7_client: Cin7Client):
+def _ensure_product_exists(db: Session, sku: str, arena_client: ArenaClient, cin7_client: Cin7Client, mapping=None):
     """
     Ensures a product exists in Cin7. If not, fetches from Arena (including BOM checks) and creates it.
-    This is used for recursive BOM component syncing.
+    This is used for recursive BOM component syncing. The clients' tenant selects the profile.
     """
+    # Every level of the recursion stops once the run is cancelled
+    cancellation.check(cin7_client.cancel)
+    if mapping is None:
+        mapping = mapping_service.for_profile(db, arena_client.tenant)
     # 1. Check if exists in Cin7
     existing = cin7_client.get_product_by_sku(sku)
     if existing:
@@ -185,62 +355,45 @@ def _ensure_product_exists(db: Session, sku: str, arena_client: ArenaClient, cin
 
     # 2. If not, we need to fetch it from Arena
     # Check if we have it in our local DB first (Harvested)
-    db_item = db.query(models.ArenaItem).filter(models.ArenaItem.item_number == sku).first()
+    query = db.query(models.ArenaItem).filter(models.ArenaItem.item_number == sku)
+    if arena_client.tenant is not None:
+        query = query.filter(models.ArenaItem.profile_id == arena_client.tenant)
+    db_item = query.first()
     
     target_item = None
     bom_items = []
     
     if db_item:
         target_item = db_item
-        # Fetch BOM from Arena using GUID from DB
         try:
-            bom_items = arena_client.get_bom(db_item.guid)
+            bom_items = _item_bom(db, arena_client, db_item)
+        except cancellation.Cancelled:
+            raise
         except Exception as e:
             logger.warning(f"Failed to fetch BOM for component {sku}: {e}")
     else:
         # Not in DB, fetch from Arena API
         # logger.info(f"Component {sku} missing in Cin7 and DB. Fetching from Arena...")
         items = arena_client.list_all_items(sku)
-        summary = next((i for i in items if i['number'] == sku), None)
+        summary = next((i for i in items if i.number == sku), None)
         
         if not summary:
             logger.error(f"Component {sku} not found in Arena. Cannot sync.")
             return None
             
-        guid = summary['guid']
+        guid = summary.guid
         details = arena_client.get_item_details(guid)
         sourcing = arena_client.get_sourcing(guid)
         if details:
-            attrs = map_additional_attributes(details)
-            results = sourcing.get("results", [])
-            mfr_name, mfr_num = None, None
-            if results:
-                v_item = results[0].get("vendorItem", {})
-                mfr_name = v_item.get("supplier", {}).get("name")
-                mfr_num = v_item.get("number")
-                
             # Create transient object for mapping
-            target_item = models.ArenaItem(
-                guid=guid,
-                item_number=details.get("number"),
-                item_name=details.get("name"),
-                revision=details.get("revisionNumber"),
-                # lifecycle_phase=details.get("lifecyclePhase", {}).get("name"), # Might be missing in details if not queried?
-                category=details.get("category", {}).get("name"),
-                description=details.get("description"),
-                uom=details.get("uom"),
-                costing_method=attrs.get("Costing Method"),
-                inventory_account=attrs.get("Inventory Account"),
-                cogs_account=attrs.get("COGS Account"),
-                sellable=attrs.get("Sellable"),
-                internal_note_erp=attrs.get("Internal Note for ERP"),
-                last_glg_co=attrs.get("Last GLG CO"),
-                manufacturer=mfr_name,
-                manufacturer_item_number=mfr_num
-            )
+            target_item = HarvestedItem(guid=guid, profile_id=arena_client.tenant, **mapping.item(details, sourcing))
             # Fetch BOM
             try:
                 bom_items = arena_client.get_bom(guid)
+                where_used_service.record_bom(arena_client.tenant, sku, bom_items, target_item.revision)
+                bom_items = bom_items or []
+            except cancellation.Cancelled:
+                raise
             except:
                 pass
 
@@ -256,74 +409,117 @@ def _ensure_product_exists(db: Session, sku: str, arena_client: ArenaClient, cin
             qty = line.get("quantity", 0)
             if comp_sku:
                 # Recursion
-                c_id = _ensure_product_exists(db, comp_sku, arena_client, cin7_client)
+                c_id = _ensure_product_exists(db, comp_sku, arena_client, cin7_client, mapping)
                 sub_bom_resolved.append({"sku": comp_sku, "qty": qty, "cin7_id": c_id})
                 
         # 4. Map and Create with BOM info
-        payload = map_arena_to_cin7(target_item, db, sub_bom_resolved)
+        payload = mapping.product(target_item, sub_bom_resolved)
     else:
-        payload = map_arena_to_cin7(target_item, db)
+        payload = mapping.product(target_item)
 
-    response = cin7_client.create_or_update_product(payload)
+    # Step 1 already established the product is missing, so skip the second lookup
+    response = cin7_client.create_or_update_product(payload, existing=False)
     
     if response.get("status") == "success":
         data = response.get("data", {})
-        # handle case where list is returned
-        prod_id = None
-        if isinstance(data, list) and data:
-            prod_id = data[0].get("ID")
-        else:
-            prod_id = data.get("ID")
+        prod_id = _product_id(data)
             
-        # If we created it and it had a BOM, we must upload it now
+        # If we created it and it had a BOM, upload it now unless the create already stored it
         if prod_id and bom_items:
-             # Logic to upload BOM for component
-             # Reuse resolved list
-             bom_payload = []
-             for entry in sub_bom_resolved: # defined above if bom_items was true
-                 line = {"Quantity": entry["qty"]}
-                 if entry.get("cin7_id"):
-                     line["ComponentProductID"] = entry["cin7_id"]
+             bom_payload = bom_service.bom_lines(sub_bom_resolved) # defined above if bom_items was true
+             created = data[0] if isinstance(data, list) else data
+             bom_diff = bom_service.diff_bom(created.get("BillOfMaterialsProducts") or [], bom_payload)
+
+             if bom_service.is_empty(bom_diff):
+                 bom_service.record_bom_sync(cin7_client.tenant, sku, prod_id, "skipped", bom_diff)
+             else:
+                 upload = cin7_client.upload_bill_of_materials(prod_id, bom_payload)
+                 if upload.get("status") == "success":
+                     bom_service.record_bom_sync(cin7_client.tenant, sku, prod_id, "uploaded", bom_diff, lines=bom_payload)
                  else:
-                     line["ProductCode"] = entry["sku"]
-                 bom_payload.append(line)
-             
-             cin7_client.upload_bill_of_materials(prod_id, bom_payload)
+                     bom_service.record_bom_sync(cin7_client.tenant, sku, prod_id, "failed", bom_diff)
              
         return prod_id
         
     return None
 
-def push_to_cin7(db: Session, dry_run: bool = True):
-    """Bulk pushes filtered items from SQLite to Cin7."""
-    config = db.query(models.Configuration).first()
-    cin7 = Cin7Client(config.cin7_api_user, config.cin7_api_key)
-    arena = ArenaClient(config.arena_workspace_id, config.arena_email, config.arena_password)
+def _push_product(cin7: Cin7Client, payload: dict):
+    """
+    Creates or updates a parent product in Cin7. The embedded BOM is only sent when it
+    differs line-by-line from the BOM Cin7 already holds for the product; otherwise the
+    lines and the BOM flags are left out together, and Cin7 keeps what it has.
+    """
+    sku = payload.get("SKU")
+    existing = cin7.get_product_by_sku(sku, include_bom=True)
+
+    bom_payload = payload.get("BillOfMaterialsProducts")
+    bom_diff = None
+    if bom_payload is not None:
+        current = bom_service.current_bom(cin7.tenant, sku, existing) if existing else []
+        bom_diff = bom_service.diff_bom(current, bom_payload)
+        if existing and bom_service.is_empty(bom_diff):
+            for field in BOM_PAYLOAD_FIELDS:
+                payload.pop(field, None)
+
+    response = cin7.create_or_update_product(payload, existing=existing or False)
+
+    if bom_diff is not None and response and response.get("status") == "success":
+        product_id = existing["ID"] if existing else _product_id(response.get("data"))
+        if "BillOfMaterialsProducts" in payload:
+            bom_service.record_bom_sync(cin7.tenant, sku, product_id, "uploaded", bom_diff, lines=bom_payload)
+        else:
+            bom_service.record_bom_sync(cin7.tenant, sku, product_id, "skipped", bom_diff)
+    return response
+
+def sku_partition(sku: str, count: int):
+    """Maps a SKU onto one of `count` equal ranges of the CRC32 hash space."""
+    return (zlib.crc32((sku or "").encode()) * count) >> 32
+
+def iter_push_to_cin7(db: Session, dry_run: bool = True, run_id: str = None, partition: tuple = None, profile_id: int = None, skip_skus: set = None, changed_since: datetime = None, budget=None, cancel=None):
+    """
+    Bulk pushes one profile's filtered items from SQLite to Cin7, yielding one result record
+    per item as soon as it is produced. Nothing is accumulated, so callers can stream the records.
+    partition=(index, count) restricts the push to one SKU hash range; skip_skus leaves out
+    SKUs a resumed run already pushed; changed_since limits it to rows the harvest changed
+    after that time (see push_changed_since). The push stops, leaving the rest for a
+    resume, once an upstream's circuit opens or a call budget (daily, or the run's
+    `budget`) runs out. Once the `cancel` token is cancelled it yields a "cancelled"
+    record and stops; items already in flight finish, but send nothing more.
+    """
+    config = profile_service.get_profile(db, profile_id)
+    if not config:
+        yield {"status": "error", "message": "Configuration missing"}
+        return
+    cin7 = profile_service.cin7_client(config, budget, cancel)
+    arena = profile_service.arena_client(config, budget, cancel)
+    # Compiled once per run from the profile's mapping spec and rule snapshot
+    mapping = mapping_service.for_profile(db, config.id)
     
     # Needs Arena login for fetching BOMs even in dry run
     if not arena.login():
-        return {"status": "error", "message": "Arena login failed"}
-    
-    # Fetch items that match the current dynamic prefix
-    # Fetch items that match the current dynamic prefix
-    query = db.query(models.ArenaItem)
-    if config.item_prefix_filter and config.item_prefix_filter != "*":
-        query = query.filter(
-            models.ArenaItem.item_number.like(f"{config.item_prefix_filter}%")
-        )
-    items = query.all()
+        yield {"status": "error", "message": arena.login_refused or "Arena login failed"}
+        return
     
-    results = []
-    summary = {"success": 0, "failed": 0, "mocked": 0}
+    # Live failures go to the dead-letter queue; successes clear SKUs that were in it
+    open_failures = set() if dry_run else dead_letter_service.open_skus(db, config.id)
 
-    from concurrent.futures import ThreadPoolExecutor, as_completed
+    def failed(sku, message):
+        if not dry_run:
+            dead_letter_service.record_failure(config.id, sku, message, source="push")
+        return {"SKU": sku, "Error": message}
 
     def process_item_payload(item):
         """Helper to process a single item for parallel execution."""
+        # Runs on a worker thread: component lookups get their own session, not the caller's
+        session = database.SessionLocal()
         try:
             bom_items = []
             try:
-                bom_items = arena.get_bom(item.guid)
+                # Usually indexed by the harvest that read this revision
+                bom_items = _item_bom(session, arena, item)
+            except (circuit_breaker.CircuitOpenError, quota_service.QuotaExceeded, cancellation.Cancelled):
+                # Arena is down, out of budget or the run was cancelled: don't push the item without its BOM
+                raise
             except Exception as e:
                 logger.error(f"Failed to fetch BOM for {item.item_number}: {e}")
             
@@ -336,7 +532,7 @@ def push_to_cin7(db: Session, dry_run: bool = True):
                 if comp_sku:
                     cin7_id = None
                     if not dry_run:
-                        cin7_id = _ensure_product_exists(db, comp_sku, arena, cin7)
+                        cin7_id = _ensure_product_exists(session, comp_sku, arena, cin7, mapping)
                     
                     bom_resolved_list.append({
                         "sku": comp_sku,
@@ -344,89 +540,248 @@ def push_to_cin7(db: Session, dry_run: bool = True):
                         "cin7_id": cin7_id
                     })
 
-            payload = map_arena_to_cin7(item, db, bom_resolved_list)
+            payload = mapping.product(item, bom_resolved_list)
             return {"status": "success", "payload": payload, "sku": item.item_number, "mode": "DRY_RUN" if dry_run else "LIVE"}
             
+        except (quota_service.QuotaExceeded, cancellation.Cancelled):
+            # Ends the push (below) instead of dead-lettering the item
+            raise
         except Exception as e:
             return {"status": "error", "message": str(e), "sku": item.item_number}
+        finally:
+            session.close()
 
-    # Parallel Execution
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_item = {executor.submit(process_item_payload, item): item for item in items}
-        
-        for future in as_completed(future_to_item):
-            item = future_to_item[future]
-            try:
-                result = future.result()
-                if result["status"] == "success":
-                    if dry_run:
-                        summary["mocked"] += 1
-                        results.append({"SKU": result["sku"], "Mode": result["mode"], "Payload": result["payload"]})
-                    else:
-                        response = cin7.create_or_update_product(result["payload"])
-                        if response.get("status") == "success":
-                            summary["success"] += 1
+    # Parallel Execution on the shared work scheduler, behind interactive and poller work.
+    # Keyed per profile so concurrent profiles' pushes share the workers round-robin.
+    # Rows stream in keyset pages and at most PUSH_WINDOW items are in flight, so memory
+    # stays flat however large the catalog is and the first write does not wait for the read.
+    work_key = profile_service.work_key(config.id, run_id or "push")
+    items = _iter_push_items(config, partition, skip_skus, changed_since)
+    # A dry run never calls Cin7, so only its Arena budget can stop it
+    upstreams = ("arena",) if dry_run else ("arena", "cin7")
+    in_flight = {}
+
+    def fill():
+        for item in items:
+            future = work_scheduler.submit(process_item_payload, item, priority=work_scheduler.BULK, key=work_key)
+            in_flight[future] = item
+            if len(in_flight) >= PUSH_WINDOW:
+                return
+
+    try:
+        fill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                if cancel is not None and cancel.cancelled:
+                    # Outcomes so far are kept; the clients refuse anything further
+                    yield {"status": "cancelled", "message": cancel.reason}
+                    return
+                down = [name for name in ("arena", "cin7") if circuit_breaker.is_open(name, config.id)]
+                if down:
+                    # Everything left would fail fast anyway; stop instead of dead-lettering it all.
+                    # A checkpointed run resumes from here once the upstream is back.
+                    yield {"status": "error", "message": f"Upstream unavailable (circuit open): {', '.join(down)}"}
+                    return
+                spent = [name for name in upstreams if quota_service.exhausted(name, config.id, budget)]
+                if spent:
+                    # Stopped: a resume picks up the remaining items once budget is available
+                    yield {"status": "error", "message": f"Call budget used up: {', '.join(spent)}"}
+                    return
+                # Drop our reference so the payload is freed once it has been yielded
+                item = in_flight.pop(future)
+                try:
+                    result = future.result()
+                    if result["status"] == "success":
+                        if dry_run:
+                            yield {"SKU": result["sku"], "Mode": result["mode"], "Payload": result["payload"]}
                         else:
-                            summary["failed"] += 1
-                            results.append({"SKU": result["sku"], "Error": response.get("message")})
-                else:
-                    summary["failed"] += 1
-                    results.append({"SKU": result["sku"], "Error": result["message"]})
-            except Exception as exc:
-                logger.error(f"Item {item.item_number} generated an exception: {exc}")
-                summary["failed"] += 1
-                results.append({"SKU": item.item_number, "Error": str(exc)})
-            
-    return {"status": "complete", "dry_run": dry_run, "summary": summary, "details": results}
+                            response = _push_product(cin7, result["payload"])
+                            if response.get("status") == "success":
+                                if result["sku"] in open_failures:
+                                    dead_letter_service.resolve(config.id, result["sku"])
+                                yield {"SKU": result["sku"], "Mode": result["mode"], "Status": "success"}
+                            else:
+                                yield failed(result["sku"], response.get("message"))
+                    else:
+                        yield failed(result["sku"], result["message"])
+                except quota_service.QuotaExceeded as exc:
+                    yield {"status": "error", "message": str(exc)}
+                    return
+                except cancellation.Cancelled as exc:
+                    yield {"status": "cancelled", "message": str(exc)}
+                    return
+                except Exception as exc:
+                    logger.error(f"Item {item.item_number} generated an exception: {exc}")
+                    yield failed(item.item_number, str(exc))
+            fill()
+    finally:
+        # If the consumer stops early, don't leave queued items behind
+        for future in in_flight:
+            future.cancel()
+        items.close()
 
-def sync_single_item(db: Session, item_number: str, dry_run: bool = True):
-    """On-demand sync for a specific SKU."""
-    config = db.query(models.Configuration).first()
-    arena = ArenaClient(config.arena_workspace_id, config.arena_email, config.arena_password)
-    cin7 = Cin7Client(config.cin7_api_user, config.cin7_api_key)
+def _iter_push_items(config, partition: tuple = None, skip_skus: set = None, changed_since: datetime = None):
+    """
+    Streams a profile's in-scope items in GUID keyset pages of PUSH_CHUNK_SIZE, as detached
+    HarvestedItem records that worker threads can read without touching a session. Reads
+    through its own session, since push workers use the caller's between pages.
+    """
+    db = database.SessionLocal()
+    try:
+        query = db.query(*RECORD_COLUMNS).filter(models.ArenaItem.profile_id == config.id)
+        in_scope = prefix_service.sql_filter(models.ArenaItem.item_number, *prefix_service.parse_prefix_filter(config.item_prefix_filter))
+        if in_scope is not None:
+            query = query.filter(in_scope)
+        if changed_since is not None:
+            # Served by ix_arena_items_profile_updated: only the delta is scanned
+            query = query.filter(models.ArenaItem.last_updated > changed_since)
+        after = None
+        while True:
+            page = query
+            if after is not None:
+                page = page.filter(models.ArenaItem.guid > after)
+            rows = page.order_by(models.ArenaItem.guid).limit(PUSH_CHUNK_SIZE).all()
+            # End the read transaction between pages so SQLite writers are never held up
+            db.rollback()
+            for row in rows:
+                item = HarvestedItem(**row._asdict())
+                if partition and sku_partition(item.item_number, partition[1]) != partition[0]:
+                    continue
+                if skip_skus and item.item_number in skip_skus:
+                    continue
+                yield item
+            if len(rows) < PUSH_CHUNK_SIZE:
+                return
+            after = rows[-1].guid
+    finally:
+        db.close()
+
+def _keep_detail(details: list, omitted: dict, record: dict):
+    """Lists a dry-run payload or failure up to RESULT_DETAILS_LIMIT, then only counts it."""
+    if len(details) < RESULT_DETAILS_LIMIT:
+        details.append(record)
+    else:
+        omitted["details_omitted"] = omitted.get("details_omitted", 0) + 1
+
+def _tally_push_record(summary: dict, record: dict):
+    """Updates push summary counters from a single push result record."""
+    if "Error" in record:
+        summary["failed"] += 1
+    elif "Payload" in record:
+        summary["mocked"] += 1
+    else:
+        summary["success"] += 1
+
+def push_scope_hash(db: Session, config):
+    """Hash of what shapes payloads besides the rows themselves: mapping spec, rules and prefix filter."""
+    basis = [mapping_service.get_spec(db, config.id), profile_service.load_rules(db, config.id), config.item_prefix_filter or ""]
+    return hashlib.sha1(json.dumps(basis, sort_keys=True, default=str).encode()).hexdigest()
+
+def push_changed_since(db: Session, config, force_full: bool = False):
+    """
+    The watermark an incremental push selects from, or None for a full push: when forced,
+    before the first completed live push, or once the mapping, rules or prefix filter changed.
+    """
+    if force_full or config.push_watermark is None or config.push_scope_hash != push_scope_hash(db, config):
+        return None
+    return config.push_watermark
+
+def advance_push_watermark(db: Session, config, started_at: datetime, scope_hash: str):
+    """
+    Records a completed live push. started_at (when it began selecting rows) becomes the
+    watermark, so rows changed while it ran are picked up next time. Items that failed
+    are in the dead-letter queue, which retries them on its own.
+    """
+    config.push_watermark = started_at
+    config.push_scope_hash = scope_hash
+    db.commit()
+
+def push_to_cin7(db: Session, dry_run: bool = True, profile_id: int = None, force_full: bool = False, cancel=None):
+    """
+    Bulk pushes filtered items from SQLite to Cin7: those changed since the last live push
+    unless force_full. A cancelled push returns its "cancelled" record and leaves the watermark.
+    """
+    config = profile_service.get_profile(db, profile_id)
+    if not config:
+        return {"status": "error", "message": "Configuration missing"}
+    started_at, scope_hash = datetime.utcnow(), push_scope_hash(db, config)
+    changed_since = push_changed_since(db, config, force_full)
+    results = []
+    omitted = {}
+    summary = {"success": 0, "failed": 0, "mocked": 0}
+
+    for record in iter_push_to_cin7(db, dry_run=dry_run, profile_id=config.id, changed_since=changed_since, cancel=cancel):
+        if record.get("status") in ("error", "cancelled"):
+            return record
+        _tally_push_record(summary, record)
+        # Live successes are only counted; dry-run payloads and failures are reported
+        if "Payload" in record or "Error" in record:
+            _keep_detail(results, omitted, record)
+
+    if not dry_run:
+        advance_push_watermark(db, config, started_at, scope_hash)
+    return {
+        "status": "complete", "dry_run": dry_run, "changed_since": changed_since, "summary": summary,
+        "details": results, "details_omitted": omitted.get("details_omitted", 0)
+    }
+
+def sync_single_item(db: Session, item_number: str, dry_run: bool = True, profile_id: int = None, with_ancestors: bool = False):
+    """
+    On-demand sync for a specific SKU. with_ancestors also re-syncs every assembly that
+    embeds it (see where_used_service) and reports them under "ancestors".
+    """
+    result = _sync_single_item(db, item_number, dry_run, profile_id)
+    if with_ancestors and result.get("status") in ("success", "mock_success"):
+        result["ancestors"] = sync_ancestors(db, [item_number], dry_run, profile_id)
+    return result
+
+def sync_ancestors(db: Session, skus, dry_run: bool = True, profile_id: int = None):
+    """
+    Re-syncs the assemblies embedding any of the SKUs, sub-assemblies before the
+    assemblies that contain them. Costs O(ancestors) syncs instead of a full re-push.
+    """
+    config = profile_service.get_profile(db, profile_id)
+    if not config:
+        return []
+    results = []
+    for parent in where_used_service.ancestors(db, config.id, skus):
+        result = _sync_single_item(db, parent, dry_run, config.id)
+        results.append({"SKU": parent, "status": result.get("status"), "message": result.get("message")})
+    if results:
+        logger.info(f"Re-synced {len(results)} assemblies using {', '.join(skus)}.")
+    return results
+
+def _sync_single_item(db: Session, item_number: str, dry_run: bool = True, profile_id: int = None):
+    """Syncs one SKU from Arena to Cin7, indexing its BOM on the way."""
+    config = profile_service.get_profile(db, profile_id)
+    if not config:
+        return {"status": "error", "message": "Configuration missing"}
+    arena = profile_service.arena_client(config)
+    cin7 = profile_service.cin7_client(config)
+    # Compiled once per run from the profile's mapping spec and rule snapshot
+    mapping = mapping_service.for_profile(db, config.id)
     
     if not arena.login():
-        return {"status": "error", "message": "Arena login failed"}
+        return {"status": "error", "message": arena.login_refused or "Arena login failed"}
 
     # Use the item number as filter to find the specific item efficiently
     items = arena.list_all_items(item_number)
-    target = next((i for i in items if i['number'] == item_number), None)
+    target = next((i for i in items if i.number == item_number), None)
     
     if not target:
         return {"status": "error", "message": f"Item {item_number} not found in Arena"}
 
-    guid = target['guid']
+    guid = target.guid
     details = arena.get_item_details(guid)
     sourcing = arena.get_sourcing(guid)
-    attrs = map_additional_attributes(details)
-    
-    results = sourcing.get("results", [])
-    mfr_name, mfr_num = None, None
-    if results:
-        v_item = results[0].get("vendorItem", {})
-        mfr_name = v_item.get("supplier", {}).get("name")
-        mfr_num = v_item.get("number")
-
-    temp_item = models.ArenaItem(
-        item_number=item_number,
-        item_name=details.get("name"),
-        revision=details.get("revisionNumber"),
-        category=details.get("category", {}).get("name"),
-        description=details.get("description"),
-        uom=details.get("uom"),
-        costing_method=attrs.get("Costing Method"),
-        inventory_account=attrs.get("Inventory Account"),
-        cogs_account=attrs.get("COGS Account"),
-        sellable=attrs.get("Sellable"),
-        internal_note_erp=attrs.get("Internal Note for ERP"),
-        last_glg_co=attrs.get("Last GLG CO"),
-        manufacturer=mfr_name,
-        manufacturer_item_number=mfr_num
-    )
+    temp_item = HarvestedItem(guid=guid, profile_id=config.id, **mapping.item(details, sourcing))
 
     bom_items = []
     try:
        bom_items = arena.get_bom(guid)
+       where_used_service.record_bom(config.id, item_number, bom_items, temp_item.revision)
+       bom_items = bom_items or []
     except Exception as e:
        logger.warning(f"Failed to fetch BOM for single sync {item_number}: {e}")
 
@@ -439,7 +794,7 @@ def sync_single_item(db: Session, item_number: str, dry_run: bool = True):
         if comp_sku:
             cin7_id = None
             if not dry_run:
-                cin7_id = _ensure_product_exists(db, comp_sku, arena, cin7)
+                cin7_id = _ensure_product_exists(db, comp_sku, arena, cin7, mapping)
             
             bom_resolved_list.append({
                 "sku": comp_sku,
@@ -447,101 +802,413 @@ def sync_single_item(db: Session, item_number: str, dry_run: bool = True):
                 "cin7_id": cin7_id
             })
 
-    cin7_payload = map_arena_to_cin7(temp_item, db, bom_resolved_list)
+    cin7_payload = mapping.product(temp_item, bom_resolved_list)
 
     if dry_run:
         return {"status": "mock_success", "payload": cin7_payload}
     
-    response = cin7.create_or_update_product(cin7_payload)
+    response = _push_product(cin7, cin7_payload)
     return response
 
-def process_completed_changes(db: Session, dry_run: bool = False):
+COMPLETED_CHANGE_STATUSES = ["Completed", "Effective"]
+
+def sync_change_items(db: Session, arena: ArenaClient, change_guid: str, change_number: str = None, dry_run: bool = False):
+    """
+    Syncs every item affected by one change, then the assemblies that embed them
+    (from the where-used index), so parents pick up changed components.
+    Returns (synced_count, errors).
+    """
+    synced_count = 0
+    errors = []
+
+    def record(sku, status, message):
+        nonlocal synced_count
+        if status in ("success", "mock_success"):
+            synced_count += 1
+            if not dry_run:
+                dead_letter_service.resolve(arena.tenant, sku)
+        else:
+            errors.append(f"{sku}: {message}")
+            if not dry_run:
+                dead_letter_service.record_failure(arena.tenant, sku, message, source="change", change_guid=change_guid)
+
+    # Fetch affected items
+    items = arena.get_change_items(change_guid)
+    changed = []
+    for line in items:
+        # Structure might be line['item']['number']
+        item_ref = line.get("item", {})
+        sku = item_ref.get("number")
+        
+        if sku:
+            action = "Dry-Run Syncing" if dry_run else "Auto-Syncing"
+            logger.info(f"{action} Item {sku} from Change {change_number}")
+            # Trigger the existing single item sync
+            result = _sync_single_item(db, sku, dry_run=dry_run, profile_id=arena.tenant)
+            record(sku, result.get("status"), result.get("message"))
+            changed.append(sku)
+
+    for result in sync_ancestors(db, changed, dry_run, arena.tenant):
+        record(result["SKU"], result["status"], result["message"])
+    return synced_count, errors
+
+def drain_change_queue(db: Session, dry_run: bool = False, limit: int = 20, profile_id: int = None):
+    """
+    Consumes one profile's due entries from the change queue (fed by the webhook and the poller).
+    Each change's status is re-checked against Arena before its items are synced,
+    so a notification alone can never trigger a sync.
+    """
+    config = profile_service.get_profile(db, profile_id)
+    if not config or not config.auto_sync_enabled:
+        return {"processed": 0, "synced": 0, "errors": []}
+
+    entries = change_queue_service.claim_due(db, limit, profile_id=config.id)
+    if not entries:
+        return {"processed": 0, "synced": 0, "errors": []}
+
+    arena = profile_service.arena_client(config)
+    if not arena.login():
+        if not arena.login_refused:
+            logger.error("Arena login failed while draining change queue.")
+        change_queue_service.release(db, entries)
+        return {"processed": 0, "synced": 0, "errors": [arena.login_refused or "Arena login failed"]}
+
+    synced_total = 0
+    errors = []
+    for entry in entries:
+        label = entry.change_number or entry.change_guid
+        try:
+            change = arena.get_change(entry.change_guid)
+            status = (change or {}).get("status", {}).get("name")
+            if status not in COMPLETED_CHANGE_STATUSES:
+                # Arena may not reflect the completion yet; try again later
+                change_queue_service.mark_retry(db, entry, f"Change status is {status!r}")
+                continue
+
+            entry.change_number = entry.change_number or change.get("number")
+            logger.info(f"Processing Change {entry.change_number} ({status})")
+            synced, item_errors = sync_change_items(db, arena, entry.change_guid, entry.change_number, dry_run=dry_run)
+            synced_total += synced
+            errors.extend(item_errors)
+            change_queue_service.mark_done(db, entry, synced, "; ".join(item_errors) or None)
+        except Exception as e:
+            logger.error(f"Failed to process change {label}: {e}")
+            change_queue_service.mark_retry(db, entry, str(e))
+            errors.append(f"{label}: {e}")
+
+    return {"processed": len(entries), "synced": synced_total, "errors": errors}
+
+def retry_dead_letters(db: Session, profile_id: int, limit: int = 20):
+    """
+    Re-syncs just the dead-lettered SKUs of a profile whose retry is due, one on-demand
+    sync each, instead of a full re-run. Failures back off again and park after
+    dead_letter_service.MAX_ATTEMPTS.
+    """
+    down = [name for name in ("arena", "cin7") if circuit_breaker.is_open(name, profile_id)]
+    if down:
+        # A retry now would only burn an attempt
+        return {"retried": 0, "resolved": 0, "skipped": f"circuit open: {', '.join(down)}"}
+    spent = [name for name in ("arena", "cin7") if quota_service.exhausted(name, profile_id)]
+    if spent:
+        # Retries are background work and must leave the budget's reserve to on-demand syncs
+        return {"retried": 0, "resolved": 0, "skipped": f"call budget used up: {', '.join(spent)}"}
+    entries = dead_letter_service.claim_due(db, profile_id, limit)
+    resolved = 0
+    for entry in entries:
+        if _retry_dead_letter(db, entry):
+            resolved += 1
+    if entries:
+        logger.info(f"Dead-letter retry for profile {profile_id}: {resolved}/{len(entries)} resolved.")
+    return {"retried": len(entries), "resolved": resolved}
+
+def _retry_dead_letter(db: Session, entry):
+    try:
+        result = sync_single_item(db, entry.sku, dry_run=False, profile_id=entry.profile_id)
+    except Exception as e:
+        result = {"status": "error", "message": str(e)}
+    if result.get("status") == "success":
+        dead_letter_service.mark_resolved(db, entry)
+        return True
+    entry.source = "retry"
+    dead_letter_service.mark_failed(db, entry, result.get("message"))
+    return False
+
+def retry_dead_letter(db: Session, entry_id: int):
+    """Manual retry of one dead-lettered SKU, parked or not. Returns the entry, or None if it isn't retryable."""
+    entry = dead_letter_service.claim(db, entry_id)
+    if entry is None:
+        return None
+    _retry_dead_letter(db, entry)
+    return entry
+
+def process_completed_changes(db: Session, dry_run: bool = False, profile_id: int = None):
     """
-    Poller function to check for 'Completed' changes in Arena and sync affected items.
-    Example usage: Scheduled every X minutes.
+    Safety-net poller: enqueues a profile's 'Completed' changes that no notification
+    delivered and drains its change queue. Already processed changes are skipped, so
+    a quiet workspace costs one Arena call per poll.
     """
-    logger.info("Starting Polling for Completed Changes...")
-    config = db.query(models.Configuration).first()
+    config = profile_service.get_profile(db, profile_id)
     if not config or not config.auto_sync_enabled:
         logger.info("Auto-sync disabled or config missing. Skipping.")
         return
+    logger.info(f"Starting Polling for Completed Changes (profile {config.name or config.id})...")
 
-    arena = ArenaClient(config.arena_workspace_id, config.arena_email, config.arena_password)
+    arena = profile_service.arena_client(config)
     if not arena.login():
-        logger.error("Arena login failed during polling.")
+        if not arena.login_refused:
+            logger.error("Arena login failed during polling.")
         return
 
     # Fetch recent changes
     changes = arena.get_changes() 
-    # Logic: Look for changes with status 'Completed' (or Effective).
-    # In a real impl, we'd filter by 'processed_after' date or similar to avoid re-syncing old ones.
-    # For MVP: We will iterate and sync. (Constraint: this might re-sync items often if not filtered)
-    
-    # TODO: Implement "High Water Mark" or "Last Sync Timestamp" in DB to filter old changes.
-    # For now, we'll process the recent ones found.
-    
-    synced_count = 0
-    errors = []
+    completed = [
+        change for change in changes
+        if change.get("status", {}).get("name") in COMPLETED_CHANGE_STATUSES and change.get("guid")
+    ]
 
-    for change in changes:
-        # Check status options. Usually 'Completed' or 'Effective'.
-        status = change.get("status", {}).get("name")
-        if status in ["Completed", "Effective"]: 
-            change_number = change.get("number")
-            logger.info(f"Processing Change {change_number} ({status})")
-            
-            # Fetch affected items
-            items = arena.get_change_items(change.get("guid"))
-            for line in items:
-                # Structure might be line['item']['number']
-                item_ref = line.get("item", {})
-                sku = item_ref.get("number")
-                
-                if sku:
-                    action = "Dry-Run Syncing" if dry_run else "Auto-Syncing"
-                    logger.info(f"{action} Item {sku} from Change {change_number}")
-                    # Trigger the existing single item sync
-                    result = sync_single_item(db, sku, dry_run=dry_run)
-                    
-                    if result.get("status") == "success":
-                        synced_count += 1
-                    elif result.get("status") == "mock_success":
-                         # Dry run success
-                         synced_count += 1
-                         # Store payload for review if needed, but summary is enough for now
-                    else:
-                        errors.append(f"{sku}: {result.get('message')}")
-    
-    logger.info(f"Polling Complete. Processed {synced_count} items. Errors: {len(errors)}")
-    return {"synced": synced_count, "errors": errors, "dry_run": dry_run}
+    if dry_run:
+        # Preview what the queue would sync, without enqueueing or marking anything
+        synced_count = 0
+        errors = []
+        for change in completed:
+            if change_queue_service.is_processed(db, change["guid"]):
+                continue
+            synced, item_errors = sync_change_items(db, arena, change["guid"], change.get("number"), dry_run=True)
+            synced_count += synced
+            errors.extend(item_errors)
+        return {"synced": synced_count, "errors": errors, "enqueued": 0, "dry_run": dry_run}
+
+    enqueued = 0
+    for change in completed:
+        if change_queue_service.enqueue(db, change["guid"], change.get("number"), source="poller", profile_id=config.id):
+            enqueued += 1
 
-def perform_full_sync(db: Session, dry_run: bool = True):
+    result = drain_change_queue(db, profile_id=config.id)
+    logger.info(f"Polling Complete. {enqueued} new changes. Processed {result['synced']} items. Errors: {len(result['errors'])}")
+    return {"synced": result["synced"], "errors": result["errors"], "enqueued": enqueued, "dry_run": dry_run}
+
+def perform_full_sync(db: Session, dry_run: bool = True, profile_id: int = None, run_id: str = None, force_full: bool = False):
     """
     Orchestrates the full sync process:
     1. Harvests items from Arena to Local DB.
-    2. Pushes items from Local DB to Cin7 (or mocks it if dry_run).
+    2. Pushes items from Local DB to Cin7 (or mocks it if dry_run): only those changed
+       since the last completed live push, or all of them with force_full.
+    Both stages checkpoint into a SyncRun; pass the run_id of an unfinished run to resume it.
+    Only the first RESULT_DETAILS_LIMIT payloads and failures are returned in "details";
+    "details_omitted" counts the rest.
     """
-    # Step 1: Harvest
-    harvest_result = perform_sync(db)
-    if harvest_result.get("status") == "error":
-        return {
-            "status": "error",
-            "message": f"Harvest Failed: {harvest_result.get('message')}",
-            "harvest_details": harvest_result
-        }
-    
-    # Step 2: Push (or Dry Run Push)
-    push_result = push_to_cin7(db, dry_run=dry_run)
-    
-    # Combine results
+    details = []
+    omitted = {}
+    harvest_summary = None
+    for record in iter_full_sync(db, dry_run=dry_run, run_id=run_id, profile_id=profile_id, force_full=force_full):
+        if record.get("status") in ("error", "cancelled"):
+            return record
+        if record.get("status") == "complete":
+            return {
+                "status": "complete",
+                "run_id": record.get("run_id"),
+                "dry_run": record.get("dry_run"),
+                "changed_since": record.get("changed_since"),
+                "harvest_summary": harvest_summary,
+                "push_summary": record.get("push_summary"),
+                "details": details,
+                "details_omitted": omitted.get("details_omitted", 0)
+            }
+        if "harvest_summary" in record:
+            harvest_summary = record["harvest_summary"]
+        elif "Payload" in record or "Error" in record:
+            # Live successes are only counted; dry-run payloads and failures are reported
+            _keep_detail(details, omitted, record)
+
+def _harvest_summary(counts: dict):
     return {
-        "status": push_result.get("status"),
-        "dry_run": dry_run,
-        "harvest_summary": {
-            "items_harvested": harvest_result.get("items_harvested"),
-            "skipped_lifecycle": harvest_result.get("skipped_lifecycle"),
-            "skipped_transfer_erp": harvest_result.get("skipped_transfer_erp")
-        },
-        "push_summary": push_result.get("summary"),
-        "details": push_result.get("details")
-    }
\ No newline at end of file
+        "items_harvested": counts.get("items_harvested"),
+        "skipped_lifecycle": counts.get("skipped_lifecycle"),
+        "skipped_transfer_erp": counts.get("skipped_transfer_erp"),
+        "skipped_excluded": counts.get("skipped_excluded"),
+        "items_changed": counts.get("items_changed")
+    }
+
+def iter_full_sync(db: Session, dry_run: bool = True, run_id: str = None, profile_id: int = None, force_full: bool = False):
+    """
+    Streaming variant of perform_full_sync. Yields a harvest record, one record per
+    pushed item, and a closing summary record, without holding the results in memory.
+
+    The run is recorded as a SyncRun under run_id and checkpointed as it goes. If run_id
+    names an unfinished run, it resumes from the last checkpoint with that run's own
+    profile and dry_run setting: the harvest continues at the checkpointed page and the
+    push skips SKUs that already have an outcome. A run stopped by its consumer is left
+    'interrupted'; one whose process died stays 'running' until its lease lapses.
+    A new run is refused if quota_service.plan estimates it will not fit the profile's
+    remaining call budget; once started, it stops (resumably) when a budget runs out.
+    A cancel (run_service.request_cancel, or the profile's run deadline) stops it at the
+    next check with its checkpoint kept; see _stop_cancelled_run for the status it is left in.
+
+    The push covers the rows changed since the profile's push watermark (fixed when the run
+    is created), or every row with force_full; a completed live run moves the watermark to
+    the time its push began.
+    """
+    run = run_service.get_run(db, run_id) if run_id else None
+    if run is None:
+        config = profile_service.get_profile(db, profile_id)
+        changed_since = push_changed_since(db, config, force_full) if config else None
+        if config:
+            plan = quota_service.plan(db, config, dry_run, changed_since)
+            if not plan["fits"]:
+                # Refused before it starts rather than stopped halfway through the day's budget
+                yield {"status": "error", "run_id": run_id, "message": f"Call budget too low: {'; '.join(plan['reasons'])}", "plan": plan}
+                return
+        run = run_service.create_run(db, run_id, config.id if config else profile_id, dry_run, changed_since)
+    elif run.status == "complete":
+        yield {"status": "error", "run_id": run_id, "message": "Run already complete"}
+        return
+    run_id, dry_run, profile_id = run.run_id, run.dry_run, run.profile_id
+
+    with lease_service.held(run_service.lease_name(run_id), run_service.RUN_LEASE_TTL_SECONDS) as claimed:
+        if not claimed:
+            yield {"status": "error", "run_id": run_id, "message": "Run is in progress on another node"}
+            return
+        if run.status != "running":
+            logger.info(f"Resuming sync run {run_id} at stage '{run.stage}'.")
+            run.status = "running"
+            run.message = None
+            # Resuming is what undoes a cancel
+            run.cancel_requested_at = None
+            db.commit()
+        elif run.cancel_requested_at is not None:
+            # Cancelled while its process was gone: don't pick it back up
+            run_service.finish_run(run_id, "cancelled", run_service.CANCEL_MESSAGE)
+            yield {"status": "cancelled", "run_id": run_id, "message": run_service.CANCEL_MESSAGE}
+            return
+
+        config = profile_service.get_profile(db, profile_id)
+        with cancellation.running(run_id, _run_token(config, run_id)) as cancel:
+            yield from _execute_run(db, run, config, cancel)
+
+def _run_token(config, run_id: str):
+    """A run attempt's token: its deadline (Configuration.run_deadline_minutes) and the run's cancel flag."""
+    deadline = (config.run_deadline_minutes or 0) * 60 if config else 0
+    return cancellation.CancelToken(deadline, poll=lambda: run_service.cancel_requested(run_id))
+
+def _stop_cancelled_run(run_id: str, cancel):
+    """
+    Records where a cancelled run stopped. A run stopped by shutdown stays 'running' with its
+    lease released, so another node resumes it from the checkpoint; otherwise it is
+    'cancelled' and can be resumed explicitly.
+    """
+    if cancel.kind == cancellation.SHUTDOWN:
+        run_service.finish_run(run_id, "running", "Stopped by shutdown; resumes from its checkpoint")
+    else:
+        run_service.finish_run(run_id, "cancelled", cancel.reason)
+    return {"status": "cancelled", "run_id": run_id, "message": cancel.reason}
+
+def _execute_run(db: Session, run, config, cancel):
+    """One attempt at a claimed run: the harvest (unless done), then the push, checkpointing both."""
+    run_id, dry_run, profile_id = run.run_id, run.dry_run, run.profile_id
+    checkpoint = None
+    # Per attempt: a resumed run gets a fresh run budget
+    budget = quota_service.run_budget(config) if config else None
+    # Set once the run has reached a final status, so closing the generator after
+    # its last record doesn't mark it interrupted
+    finished = False
+    try:
+        if run.stage == "harvest":
+            harvest_result = perform_sync(db, profile_id, run=run, budget=budget, cancel=cancel)
+            if cancel.cancelled:
+                finished = True
+                yield _stop_cancelled_run(run_id, cancel)
+                return
+            if harvest_result.get("status") == "error":
+                message = f"Harvest Failed: {harvest_result.get('message')}"
+                run_service.finish_run(run_id, "failed", message)
+                finished = True
+                yield {"status": "error", "run_id": run_id, "message": message}
+                return
+            run.stage = "push"
+            db.commit()
+        if run.push_started_at is None:
+            # Kept across resumes: rows changed after this are left for the next run
+            run.push_started_at = datetime.utcnow()
+            db.commit()
+
+        yield {
+            "run_id": run_id,
+            "dry_run": dry_run,
+            "harvest_summary": _harvest_summary(run_service.harvest_counts(run))
+        }
+
+        scope_hash = push_scope_hash(db, config) if config else None
+        changed_since = run.changed_since
+        if config and push_changed_since(db, config) is None:
+            # Mapping, rules or prefix filter changed since the run started: push everything
+            changed_since = None
+        summary = run_service.push_counts(run)
+        checkpoint = run_service.PushCheckpoint(run_id, (config.checkpoint_interval if config else None) or 50, summary)
+        records = iter_push_to_cin7(
+            db, dry_run=dry_run, run_id=run_id, profile_id=profile_id,
+            skip_skus=run_service.pushed_skus(db, run_id), changed_since=changed_since, budget=budget, cancel=cancel
+        )
+        for record in records:
+            if record.get("status") in ("error", "cancelled"):
+                # Keep the outcomes so far, so a resume skips them
+                checkpoint.flush()
+                finished = True
+                if cancel.cancelled:
+                    yield _stop_cancelled_run(run_id, cancel)
+                    return
+                run_service.finish_run(run_id, "failed", record.get("message"))
+                yield {"status": "error", "run_id": run_id, "message": record.get("message")}
+                return
+            _tally_push_record(summary, record)
+            checkpoint.record(record)
+            yield record
+
+        checkpoint.flush()
+        if config and not dry_run:
+            advance_push_watermark(db, config, run.push_started_at, scope_hash)
+        run_service.finish_run(run_id, "complete")
+        finished = True
+        yield {"status": "complete", "run_id": run_id, "dry_run": dry_run, "changed_since": changed_since, "push_summary": summary}
+    except GeneratorExit:
+        # The consumer went away (client disconnect, shutdown): keep what was done
+        if not finished:
+            if checkpoint:
+                checkpoint.flush()
+            run_service.finish_run(run_id, "interrupted")
+        raise
+    except Exception as e:
+        if checkpoint:
+            checkpoint.flush()
+        finished = True
+        if cancel.cancelled:
+            yield _stop_cancelled_run(run_id, cancel)
+            return
+        logger.error(f"Sync run {run_id} failed: {e}")
+        run_service.finish_run(run_id, "failed", str(e))
+        yield {"status": "error", "run_id": run_id, "message": str(e)}
+
+def stream_full_sync(dry_run: bool = True, run_id: str = None, profile_id: int = None, force_full: bool = False):
+    """Runs iter_full_sync on its own DB session so it can outlive the request that started it."""
+    db = database.SessionLocal()
+    try:
+        yield from iter_full_sync(db, dry_run=dry_run, run_id=run_id, profile_id=profile_id, force_full=force_full)
+    finally:
+        db.close()
+
+def resume_abandoned_runs():
+    """
+    Picks up one full sync whose process died (crash or deploy) and finishes it from its
+    checkpoint, writing the resumed records as the run's artifact. Returns its run ID, or None.
+    """
+    db = database.SessionLocal()
+    try:
+        for run in run_service.abandoned_runs(db):
+            # Claim it first so only one node resumes it; the run re-takes its own lease
+            if not lease_service.acquire(db, run_service.lease_name(run.run_id), run_service.RUN_LEASE_TTL_SECONDS):
+                continue
+            logger.info(f"Resuming abandoned sync run {run.run_id} from its checkpoint.")
+            artifact_service.write_artifact(run.run_id, stream_full_sync(run_id=run.run_id))
+            return run.run_id
+        return None
+    finally:
+        db.close()
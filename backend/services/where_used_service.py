@@ -0,0 +1,138 @@
+"""
+Where-used index: child SKU -> parent SKUs, kept from the Arena BOMs of new and revised
+items the harvest reads, and from those the connector fetches anyway while pushing. When a component changes, only its ancestors (the
+assemblies that embed it, transitively) need re-pushing, not the whole catalog.
+ArenaItem.bom_revision records which revision a parent's edges came from, so the push
+can build the BOM of an item at that revision from the index instead of asking Arena again.
+"""
+from sqlalchemy.orm import Session
+from datetime import datetime
+from .. import models, database
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Deepest BOM nesting followed; also bounds the walk if BOMs ever form a cycle
+MAX_DEPTH = 25
+# Keeps IN (...) lists well under SQLite's parameter limit
+LOOKUP_CHUNK = 500
+
+def _children(bom_items):
+    children = {}
+    for line in bom_items or []:
+        sku = (line.get("item") or {}).get("number")
+        if sku:
+            try:
+                quantity = float(line.get("quantity") or 0)
+            except (TypeError, ValueError):
+                quantity = None
+            if quantity is not None and children.get(sku) is not None:
+                # A component on several lines counts once, with their total quantity
+                quantity += children[sku]
+            children[sku] = quantity
+    return children
+
+def _mark_revision(db: Session, profile_id: int, parent_sku: str, revision):
+    if revision:
+        db.query(models.ArenaItem).filter(
+            models.ArenaItem.profile_id == profile_id, models.ArenaItem.item_number == parent_sku
+        ).update({models.ArenaItem.bom_revision: revision}, synchronize_session=False)
+
+def _replace_edges(db: Session, profile_id: int, parent_sku: str, bom_items, revision=None):
+    """
+    Replaces a parent's edges in the session and marks them as read at `revision`;
+    False if its BOM is unchanged.
+    """
+    children = _children(bom_items)
+    edges = db.query(models.BomEdge).filter(
+        models.BomEdge.profile_id == profile_id, models.BomEdge.parent_sku == parent_sku
+    ).all()
+    _mark_revision(db, profile_id, parent_sku, revision)
+    if {edge.child_sku: edge.quantity for edge in edges} == children:
+        return False
+    for edge in edges:
+        db.delete(edge)
+    db.flush()
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(models.BomEdge, [
+        {"profile_id": profile_id, "parent_sku": parent_sku, "child_sku": sku, "quantity": quantity, "updated_at": now}
+        for sku, quantity in children.items()
+    ])
+    return True
+
+def record_bom(profile_id: int, parent_sku: str, bom_items, revision=None):
+    """
+    Replaces a parent's edges with the lines of its Arena BOM (as returned by
+    ArenaClient.get_bom) read at `revision`; nothing if the BOM couldn't be read.
+    Uses its own session because push workers call it.
+    """
+    if not parent_sku or bom_items is None:
+        return
+    db = database.SessionLocal()
+    try:
+        _replace_edges(db, profile_id, parent_sku, bom_items, revision)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to index BOM of {parent_sku}: {e}")
+    finally:
+        db.close()
+
+def store_boms(db: Session, profile_id: int, boms: dict):
+    """
+    record_bom for {parent SKU: (revision, BOM items)} in the caller's session, which
+    commits them (the harvest writer, together with the items they came with).
+    """
+    for parent_sku, (revision, bom_items) in boms.items():
+        if parent_sku:
+            _replace_edges(db, profile_id, parent_sku, bom_items, revision)
+
+def indexed_bom(db: Session, profile_id: int, parent_sku: str, revision):
+    """
+    The parent's BOM lines, in ArenaClient.get_bom's shape, if the index holds them as
+    read at `revision`; None if it doesn't and Arena has to be asked.
+    """
+    if not revision:
+        return None
+    stored = db.query(models.ArenaItem.bom_revision).filter(
+        models.ArenaItem.profile_id == profile_id, models.ArenaItem.item_number == parent_sku
+    ).first()
+    if stored is None or stored[0] != revision:
+        return None
+    edges = db.query(models.BomEdge.child_sku, models.BomEdge.quantity).filter(
+        models.BomEdge.profile_id == profile_id, models.BomEdge.parent_sku == parent_sku
+    ).order_by(models.BomEdge.id)
+    return [
+        {"item": {"number": sku}, "quantity": int(quantity) if quantity is not None and quantity.is_integer() else quantity}
+        for sku, quantity in edges
+    ]
+
+def parents(db: Session, profile_id: int, skus):
+    """Direct parents of any of the SKUs."""
+    skus = list(skus)
+    found = set()
+    for start in range(0, len(skus), LOOKUP_CHUNK):
+        rows = db.query(models.BomEdge.parent_sku).filter(
+            models.BomEdge.profile_id == profile_id,
+            models.BomEdge.child_sku.in_(skus[start:start + LOOKUP_CHUNK])
+        ).distinct()
+        found.update(sku for (sku,) in rows)
+    return found
+
+def ancestors(db: Session, profile_id: int, skus):
+    """
+    Every assembly that embeds any of the SKUs, at any depth, ordered so that each
+    one comes after all of its affected sub-assemblies (safe order for re-pushing).
+    Costs one query per BOM level, not per catalog item.
+    """
+    origin = set(skus)
+    depth = {}
+    frontier, level = set(origin), 0
+    while frontier and level < MAX_DEPTH:
+        level += 1
+        found = parents(db, profile_id, frontier) - origin
+        for sku in found:
+            # The deepest path decides the order: a parent goes after all its children
+            depth[sku] = level
+        frontier = found
+    return sorted(depth, key=lambda sku: (depth[sku], sku))
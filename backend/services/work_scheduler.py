@@ -0,0 +1,235 @@
+"""
+Shared work scheduler for every sync path.
+
+Work is submitted with a priority class and a fairness key. Workers always take the
+highest-priority work first and round-robin between keys within a class, so two bulk
+runs share the pool instead of queueing behind each other. Independently, every upstream
+HTTP call takes a slot from a per-upstream budget; waiting callers are served by priority,
+so an on-demand sync overtakes a bulk push at the Arena/Cin7 quota as well as in the queue.
+Priority alone only helps once something frees up, so INTERACTIVE_RESERVE workers and
+slots of every upstream budget are kept for interactive work: poller and bulk work never
+hold all of them, and an on-demand sync starts at once even while a bulk run is busy.
+Budgets are per (upstream, tenant): each connection profile talks to its own Arena
+workspace and Cin7 account, so one profile's bulk run never uses up another's slots.
+"""
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0   # on-demand single-item syncs
+POLLER = 1        # completed-change poller
+BULK = 2          # full harvest/push runs
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", POLLER: "poller", BULK: "bulk"}
+
+# Workers, and slots per upstream budget, that only interactive work may use
+INTERACTIVE_RESERVE = int(os.getenv("INTERACTIVE_RESERVE", "1"))
+
+DEFAULT_UPSTREAM_LIMITS = {
+    "arena": int(os.getenv("ARENA_CONCURRENCY", "8")),
+    "cin7": int(os.getenv("CIN7_CONCURRENCY", "8")),
+}
+
+_current_priority = contextvars.ContextVar("work_priority", default=BULK)
+_worker_local = threading.local()
+
+def current_priority():
+    return _current_priority.get()
+
+@contextmanager
+def priority_scope(level: int):
+    """Runs the enclosed upstream calls at the given priority class."""
+    token = _current_priority.set(level)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class UpstreamGate:
+    """
+    Counting semaphore whose waiters are admitted by priority, then arrival order.
+    The last `reserve` slots only admit INTERACTIVE callers.
+    """
+
+    def __init__(self, name: str, limit: int, reserve: int = 0):
+        self.name = name
+        self.limit = max(1, limit)
+        # Other work always keeps at least one slot
+        self.reserve = max(0, min(reserve, self.limit - 1))
+        self._in_use = 0
+        self._waiting = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, level: int):
+        with self._cond:
+            ticket = (level, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            limit = self.limit if level == INTERACTIVE else self.limit - self.reserve
+            while self._in_use >= limit or self._waiting[0] != ticket:
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._in_use += 1
+            # The next waiter in line may also fit under the limit
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, level: int):
+        self.acquire(level)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._cond:
+            return {"limit": self.limit, "reserved": self.reserve, "in_use": self._in_use, "waiting": len(self._waiting)}
+
+
+class WorkScheduler:
+    def __init__(self, max_workers: int = 10, upstream_limits: dict = None, reserve: int = None):
+        self.max_workers = max_workers
+        self.reserve = INTERACTIVE_RESERVE if reserve is None else reserve
+        # Workers poller and bulk tasks may occupy at once; the rest wait for interactive work
+        self._background_limit = max(1, max_workers - self.reserve)
+        self._background = 0
+        self._limits = dict(upstream_limits or DEFAULT_UPSTREAM_LIMITS)
+        # (upstream, tenant) -> UpstreamGate, created on first use
+        self._gates = {}
+        self._gates_lock = threading.Lock()
+        # priority -> OrderedDict(key -> deque of tasks), rotated for round-robin
+        self._queues = {level: OrderedDict() for level in PRIORITY_NAMES}
+        self._cond = threading.Condition()
+        self._workers = []
+
+    def _ensure_workers(self):
+        # Started lazily so importing the module never spawns threads
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"sync-worker-{len(self._workers)}",
+                daemon=True
+            )
+            self._workers.append(worker)
+            worker.start()
+
+    def submit(self, fn, *args, priority: int = BULK, key: str = "default", **kwargs):
+        """Queues fn(*args, **kwargs) and returns a concurrent.futures.Future."""
+        future = Future()
+        task = (fn, args, kwargs, future, priority)
+        with self._cond:
+            self._queues[priority].setdefault(key, deque()).append(task)
+            self._ensure_workers()
+            self._cond.notify()
+        return future
+
+    def run(self, fn, *args, priority: int = INTERACTIVE, key: str = "default", **kwargs):
+        """
+        Submits and waits for the result. Work already running on a scheduler worker
+        executes inline, so nested calls can never deadlock the pool.
+        """
+        if getattr(_worker_local, "active", False):
+            with priority_scope(min(priority, current_priority())):
+                return fn(*args, **kwargs)
+        return self.submit(fn, *args, priority=priority, key=key, **kwargs).result()
+
+    def _next_task(self):
+        for level in sorted(self._queues):
+            queues = self._queues[level]
+            if not queues:
+                continue
+            if level != INTERACTIVE:
+                if self._background >= self._background_limit:
+                    return None
+                self._background += 1
+            key, tasks = next(iter(queues.items()))
+            task = tasks.popleft()
+            if tasks:
+                queues.move_to_end(key)
+            else:
+                del queues[key]
+            return task
+        return None
+
+    def _worker_loop(self):
+        _worker_local.active = True
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    self._cond.wait()
+                    task = self._next_task()
+
+            fn, args, kwargs, future, level = task
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                token = _current_priority.set(level)
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+                finally:
+                    _current_priority.reset(token)
+            finally:
+                if level != INTERACTIVE:
+                    with self._cond:
+                        self._background -= 1
+                        # An idle worker may take the next poller or bulk task
+                        self._cond.notify()
+
+    def _gate(self, upstream: str, tenant=None):
+        with self._gates_lock:
+            gate = self._gates.get((upstream, tenant))
+            if gate is None:
+                name = upstream if tenant is None else f"{upstream}:{tenant}"
+                gate = self._gates[(upstream, tenant)] = UpstreamGate(name, self._limits[upstream], self.reserve)
+            return gate
+
+    def upstream_slot(self, upstream: str, tenant=None):
+        """Context manager holding one concurrency slot of a tenant's upstream at the caller's priority."""
+        return self._gate(upstream, tenant).slot(current_priority())
+
+    def stats(self):
+        with self._cond:
+            queued = {
+                PRIORITY_NAMES[level]: sum(len(tasks) for tasks in queues.values())
+                for level, queues in self._queues.items()
+            }
+        with self._gates_lock:
+            gates = list(self._gates.values())
+        return {
+            "workers": len(self._workers),
+            "reserved_workers": self.max_workers - self._background_limit,
+            "queued": queued,
+            "upstreams": {gate.name: gate.stats() for gate in gates}
+        }
+
+
+_scheduler = WorkScheduler(max_workers=int(os.getenv("SYNC_WORKERS", "10")))
+
+def get_scheduler():
+    return _scheduler
+
+def submit(fn, *args, priority: int = BULK, key: str = "default", **kwargs):
+    return _scheduler.submit(fn, *args, priority=priority, key=key, **kwargs)
+
+def run(fn, *args, priority: int = INTERACTIVE, key: str = "default", **kwargs):
+    return _scheduler.run(fn, *args, priority=priority, key=key, **kwargs)
+
+def upstream_slot(upstream: str, tenant=None):
+    return _scheduler.upstream_slot(upstream, tenant)
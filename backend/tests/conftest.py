@@ -0,0 +1,172 @@
+"""
+Shared fixtures: a throwaway SQLite database (configured before the backend is imported)
+and an in-process fake of the Arena and Cin7 APIs behind the profiles' HTTP sessions.
+"""
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="connector-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/connector.db"
+os.environ["ARTIFACT_DIR"] = os.path.join(_TMP, "artifacts")
+
+import json
+import re
+import threading
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from backend import database, main, models
+from backend.services import circuit_breaker, profile_service, quota_service
+
+main.initialize_schema()
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode()
+        self.text = self.content.decode()
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def arena_item(n, **fields):
+    item = {
+        "guid": f"G{n:05d}", "number": f"06-{n:05d}", "name": f"Bracket {n}", "revisionNumber": "A",
+        "lifecyclePhase": {"name": "In Production"}, "category": {"name": "Mechanical"},
+        "description": f"Formed bracket {n}", "uom": "EA",
+        "additionalAttributes": [
+            {"name": "Transfer Data to ERP?", "value": "Yes"},
+            {"name": "Sellable", "value": "Yes"},
+        ],
+    }
+    item.update(fields)
+    return item
+
+
+class FakeUpstreams:
+    """
+    Arena and Cin7 behind one requests-like session. Six items, 06-00000 .. 06-00005;
+    06-00000 is an assembly of 06-00001 and 06-00002. Counts calls per upstream, logs
+    each one as (upstream, method, path) and records every Cin7 product write.
+    """
+
+    def __init__(self):
+        self.items = [arena_item(n) for n in range(6)]
+        self.boms = {"G00000": [("G00001", 2), ("G00002", 1)]}
+        self.products = {}
+        self.writes = []
+        self.calls = {"arena": 0, "cin7": 0}
+        self.log = []
+        self._lock = threading.Lock()
+
+    def item(self, number):
+        return next(item for item in self.items if item["number"] == number)
+
+    def request(self, method, url, params=None, data=None, **kwargs):
+        parts = urlparse(url)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        query.update(params or {})
+        body = json.loads(data) if data else None
+        upstream = "arena" if "arenasolutions" in parts.netloc else "cin7"
+        with self._lock:
+            self.calls[upstream] += 1
+            self.log.append((upstream, method, parts.path))
+            if upstream == "arena":
+                return self._arena(method, parts.path, query, body)
+            return self._cin7(method, parts.path, query, body)
+
+    def _arena(self, method, path, query, body):
+        if path.endswith("/login"):
+            return FakeResponse(200, {"arenaSessionId": "session", "workspaceName": "Test"})
+        if path.endswith("/items"):
+            offset, limit = int(query.get("offset", 0)), int(query.get("limit", 400))
+            prefix = query.get("number", "").rstrip("*")
+            listed = [
+                {key: item[key] for key in ("guid", "number", "name", "revisionNumber", "lifecyclePhase")}
+                for item in self.items if item["number"].startswith(prefix)
+            ]
+            return FakeResponse(200, {"results": listed[offset:offset + limit], "count": len(listed)})
+        match = re.match(r".*/items/([^/]+)(/\w+)?$", path)
+        if match:
+            guid, sub = match.groups()
+            item = next((item for item in self.items if item["guid"] == guid), None)
+            if item is None:
+                return FakeResponse(404, {})
+            if sub == "/sourcing":
+                return FakeResponse(200, {"results": [{"vendorItem": {"number": "MPN-1", "supplier": {"name": "Acme"}}}]})
+            if sub == "/bom":
+                lines = [
+                    {"item": {"guid": child, "number": self._number(child)}, "quantity": quantity}
+                    for child, quantity in self.boms.get(guid, [])
+                ]
+                return FakeResponse(200, {"results": lines})
+            return FakeResponse(200, item)
+        return FakeResponse(404, {})
+
+    def _number(self, guid):
+        return next(item["number"] for item in self.items if item["guid"] == guid)
+
+    def _cin7(self, method, path, query, body):
+        if path.endswith("/Product"):
+            if method == "GET":
+                if "SKU" in query:
+                    product = self.products.get(query["SKU"])
+                    return FakeResponse(200, {"Products": [product] if product else [], "Total": int(bool(product))})
+                page, limit = int(query.get("Page", 1)), int(query.get("Limit", 100))
+                products = list(self.products.values())
+                return FakeResponse(200, {"Products": products[(page - 1) * limit:page * limit], "Total": len(products)})
+            product = {**self.products.get(body["SKU"], {}), **body}
+            product.setdefault("ID", f"ID-{body['SKU']}")
+            self.products[body["SKU"]] = product
+            self.writes.append(body["SKU"])
+            return FakeResponse(200, [product])
+        if path.endswith("/BillOfMaterials"):
+            for product in self.products.values():
+                if product["ID"] == body["ProductID"]:
+                    product["BillOfMaterialsProducts"] = body["Products"]
+            return FakeResponse(200, body)
+        return FakeResponse(404, {})
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    """Empties every table and the in-process call counters and circuit breakers."""
+    with database.engine.begin() as conn:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    quota_service._usage.clear()
+    quota_service.forget_limits()
+    circuit_breaker._breakers.clear()
+    yield
+
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    fake = FakeUpstreams()
+    monkeypatch.setattr(profile_service, "http_session", lambda profile_id, upstream: fake)
+    return fake
+
+
+@pytest.fixture
+def profile(db):
+    """The default profile, with credentials for both upstreams and the 06- prefix."""
+    config = models.Configuration(
+        arena_workspace_id="1", arena_email="sync@example.com", arena_password="secret",
+        cin7_api_user="user", cin7_api_key="key", item_prefix_filter="06-"
+    )
+    db.add(config)
+    db.commit()
+    return config
@@ -0,0 +1,129 @@
+import threading
+
+import pytest
+import requests
+
+from backend.services import arena_service, cancellation, quota_service
+from backend.services.arena_service import ArenaClient
+
+ENDPOINT = "/items/{guid}"
+
+
+@pytest.fixture(autouse=True)
+def fresh_hedging(monkeypatch):
+    monkeypatch.setattr(arena_service, "_trackers", {})
+    monkeypatch.setattr(arena_service, "_hedge_counts", {"requests": 0, "hedged": 0, "hedge_wins": 0})
+
+
+class StuckFirstCall:
+    """Passes calls through to the fake upstreams, except that the first one hangs until released."""
+
+    def __init__(self, upstreams):
+        self.upstreams = upstreams
+        self.release = threading.Event()
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        with self._lock:
+            self.sent += 1
+            first = self.sent == 1
+        if first:
+            self.release.wait(5)
+        return self.upstreams.request(method, url, **kwargs)
+
+
+@pytest.fixture
+def stuck(upstreams):
+    session = StuckFirstCall(upstreams)
+    yield session
+    session.release.set()
+
+
+def client(profile, session, **kwargs):
+    return ArenaClient("1", "sync@example.com", "secret", tenant=profile.id, session=session, **kwargs)
+
+
+def prime(profile, seconds=0.01):
+    """Gives the item endpoint enough fast samples for a p95."""
+    tracker = arena_service._tracker(profile.id, ENDPOINT)
+    for _ in range(arena_service.HEDGE_MIN_SAMPLES):
+        tracker.record(seconds)
+
+
+def test_p95_needs_enough_samples():
+    tracker = arena_service.LatencyTracker()
+    for n in range(arena_service.HEDGE_MIN_SAMPLES - 1):
+        tracker.record(n / 100)
+    assert tracker.p95() is None
+
+    for n in range(arena_service.HEDGE_MIN_SAMPLES - 1, 100):
+        tracker.record(n / 100)
+    assert tracker.p95() == 0.94
+
+
+def test_straggler_is_hedged_and_the_hedge_wins(profile, stuck):
+    prime(profile)
+    budget = quota_service.RunBudget({})
+
+    details = client(profile, stuck, hedge=True, budget=budget).get_item_details("G00001")
+
+    assert details["number"] == "06-00001"
+    stats = arena_service.hedge_stats()
+    assert (stats["requests"], stats["hedged"], stats["hedge_wins"]) == (1, 1, 1)
+    assert stats["p95_seconds"][f"{profile.id}:{ENDPOINT}"] == 0.01
+    # The hedge is a call of its own against the quota
+    assert stuck.sent == 2
+    assert budget.used["arena"] == 2
+
+
+def test_hedges_stay_under_their_share_of_requests(profile, stuck, monkeypatch):
+    monkeypatch.setattr(arena_service, "HEDGE_MAX_RATIO", 0.5)
+    prime(profile)
+    arena = client(profile, stuck, hedge=True)
+    arena.get_item_details("G00001")
+    stuck.sent = 0
+    stuck.release.clear()
+
+    # Hedging this one would make it two hedges in two requests
+    hung = threading.Thread(target=arena.get_item_details, args=("G00002",))
+    hung.start()
+    hung.join(0.3)
+    assert hung.is_alive()
+    assert stuck.sent == 1
+    stuck.release.set()
+    hung.join(5)
+    assert arena_service.hedge_stats()["hedged"] == 1
+
+
+def test_no_hedge_without_a_p95_or_when_disabled(profile, upstreams):
+    client(profile, upstreams, hedge=True).get_item_details("G00001")
+    prime(profile)
+    client(profile, upstreams, hedge=False).get_item_details("G00001")
+
+    assert arena_service.hedge_stats()["hedged"] == 0
+    assert upstreams.calls["arena"] == 2
+
+
+class TimesOut:
+    def __init__(self):
+        self.timeouts = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        raise requests.exceptions.ReadTimeout("read timed out")
+
+
+def test_call_timeout_is_clipped_to_the_run_deadline(profile):
+    session = TimesOut()
+    token = cancellation.CancelToken(deadline_seconds=2)
+
+    with pytest.raises(cancellation.DeadlineExceeded):
+        client(profile, session, cancel=token).get_item_details("G00001")
+
+    assert session.timeouts[0] <= 2
+    assert token.cancelled
+    # Later calls fail at once without reaching Arena
+    with pytest.raises(cancellation.Cancelled):
+        client(profile, session, cancel=token).get_sourcing("G00001")
+    assert len(session.timeouts) == 1
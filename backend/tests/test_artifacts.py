@@ -0,0 +1,93 @@
+import gzip
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main
+from backend.services import artifact_service, sync_service
+
+
+@pytest.fixture
+def client():
+    # No lifespan: the scheduler and leader election stay off
+    return TestClient(main.app)
+
+
+def read_artifact(run_id):
+    with gzip.open(artifact_service.artifact_path(run_id), "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_round_trip_through_a_gzip_ndjson_artifact():
+    run_id = artifact_service.new_run_id()
+    records = [{"SKU": f"06-{n:05d}", "Payload": {"Name": "Bracket", "Tier": n}} for n in range(3)]
+    records.append({"status": "complete", "run_id": run_id})
+
+    assert artifact_service.write_artifact(run_id, iter(records))
+
+    assert artifact_service.artifact_status(run_id) == "ready"
+    assert read_artifact(run_id) == records
+    assert not os.path.exists(artifact_service.artifact_path(run_id) + ".part")
+
+
+def test_failed_write_leaves_no_artifact():
+    run_id = artifact_service.new_run_id()
+
+    def records():
+        yield {"SKU": "06-00000"}
+        raise RuntimeError("Cin7 went away")
+
+    assert not artifact_service.write_artifact(run_id, records())
+    assert artifact_service.artifact_status(run_id) == "missing"
+    assert not os.path.exists(artifact_service.artifact_path(run_id) + ".part")
+
+
+def test_unfinished_artifact_is_not_served(client):
+    run_id = artifact_service.new_run_id()
+    artifact_service.reserve_artifact(run_id)
+    assert artifact_service.artifact_status(run_id) == "running"
+    assert client.get(f"/sync/runs/{run_id}/artifact").status_code == 202
+
+
+def test_artifact_download_rejects_unknown_and_invalid_ids(client):
+    assert client.get(f"/sync/runs/{artifact_service.new_run_id()}/artifact").status_code == 404
+    assert client.get("/sync/runs/..%2Fconnector.db/artifact").status_code in (400, 404)
+    with pytest.raises(ValueError):
+        artifact_service.artifact_path("../connector.db")
+
+
+def test_dry_run_streams_one_record_per_item(client, profile, upstreams):
+    response = client.post("/sync/cin7?dry_run=true&output=ndjson")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    payloads = [line for line in lines if "Payload" in line]
+    assert sorted(line["SKU"] for line in payloads) == [f"06-{n:05d}" for n in range(6)]
+    assert lines[-1]["status"] == "complete"
+
+
+def test_dry_run_artifact_is_written_and_downloadable(client, profile, upstreams):
+    accepted = client.post("/sync/cin7?dry_run=true&output=artifact").json()
+    assert accepted["status"] == "accepted"
+
+    # The test client runs the background writer before returning
+    response = client.get(accepted["artifact_url"])
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in gzip.decompress(response.content).decode().splitlines()]
+    assert len([line for line in lines if "Payload" in line]) == 6
+    assert lines[-1]["status"] == "complete"
+
+
+def test_json_response_lists_a_bounded_number_of_payloads(client, profile, upstreams, monkeypatch):
+    monkeypatch.setattr(sync_service, "RESULT_DETAILS_LIMIT", 2)
+
+    result = client.post("/sync/cin7?dry_run=true").json()
+
+    assert result["status"] == "complete"
+    assert len(result["details"]) == 2
+    assert result["details_omitted"] == 4
+    assert result["push_summary"]["mocked"] == 6
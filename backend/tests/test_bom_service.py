@@ -0,0 +1,108 @@
+from backend import models
+from backend.services import bom_service, sync_service
+from backend.services.cin7_service import Cin7Client
+
+SKU = "06-00000"
+NO_CHANGE = {"added": [], "removed": [], "changed": []}
+
+
+def test_bom_snapshots_are_kept_per_profile(db):
+    first = [{"ProductCode": "06-00001", "Quantity": 2}]
+    second = [{"ProductCode": "06-00009", "Quantity": 1}]
+    bom_service.record_bom_sync(1, SKU, "ID-1", "uploaded", NO_CHANGE, lines=first)
+    bom_service.record_bom_sync(2, SKU, "ID-9", "uploaded", NO_CHANGE, lines=second)
+
+    assert bom_service.current_bom(1, SKU) == first
+    assert bom_service.current_bom(2, SKU) == second
+    assert bom_service.current_bom(3, SKU) == []
+
+
+def test_a_new_upload_replaces_the_profile_snapshot(db):
+    bom_service.record_bom_sync(1, SKU, "ID-1", "uploaded", NO_CHANGE, lines=[{"ProductCode": "06-00001", "Quantity": 2}])
+    bom_service.record_bom_sync(1, SKU, "ID-1", "uploaded", NO_CHANGE, lines=[{"ProductCode": "06-00001", "Quantity": 3}])
+    bom_service.record_bom_sync(1, SKU, "ID-1", "skipped", NO_CHANGE)
+
+    assert bom_service.current_bom(1, SKU) == [{"ProductCode": "06-00001", "Quantity": 3}]
+    assert db.query(models.Cin7BomSnapshot).count() == 1
+    log = db.query(models.BomUploadLog.profile_id, models.BomUploadLog.action).all()
+    assert log == [(1, "uploaded"), (1, "uploaded"), (1, "skipped")]
+
+
+def test_lines_echoed_by_cin7_win_over_the_snapshot(db):
+    bom_service.record_bom_sync(1, SKU, "ID-1", "uploaded", NO_CHANGE, lines=[{"ProductCode": "06-00001", "Quantity": 2}])
+    echoed = [{"ComponentProductID": "ID-06-00001", "Quantity": 5}]
+
+    assert bom_service.current_bom(1, SKU, {"BillOfMaterialsProducts": echoed}) == echoed
+
+
+def test_bom_diff_matches_lines_by_product_id_then_code():
+    current = [
+        {"ComponentProductID": "ID-1", "Quantity": 2},
+        {"ProductCode": "06-00002", "Quantity": "1"},
+        {"ProductCode": "06-00003", "Quantity": 4},
+    ]
+    desired = [
+        {"ComponentProductID": "ID-1", "Quantity": 2.0},
+        {"ProductCode": "06-00002", "Quantity": 3},
+        {"ProductCode": "06-00004", "Quantity": 1},
+    ]
+
+    diff = bom_service.diff_bom(current, desired)
+
+    assert diff["added"] == [{"ProductCode": "06-00004", "Quantity": 1}]
+    assert diff["removed"] == [{"ProductCode": "06-00003", "Quantity": 4}]
+    assert diff["changed"] == [{"line": {"ProductCode": "06-00002", "Quantity": 3}, "was": 1.0}]
+    assert not bom_service.is_empty(diff)
+    assert bom_service.is_empty(bom_service.diff_bom(current, current))
+
+
+def test_a_repeated_component_line_is_matched_once():
+    current = [{"ProductCode": "06-00001", "Quantity": 1}]
+    desired = [{"ProductCode": "06-00001", "Quantity": 1}, {"ProductCode": "06-00001", "Quantity": 1}]
+
+    diff = bom_service.diff_bom(current, desired)
+
+    assert diff["added"] == [{"ProductCode": "06-00001", "Quantity": 1}]
+    assert diff["removed"] == [] and diff["changed"] == []
+
+
+def bom_actions(db):
+    return [action for (action,) in db.query(models.BomUploadLog.action).filter(models.BomUploadLog.sku == SKU)
+            .order_by(models.BomUploadLog.id)]
+
+
+def test_push_leaves_an_unchanged_bom_out_of_the_write(profile, db, upstreams, monkeypatch):
+    sent = []
+    create_or_update_product = Cin7Client.create_or_update_product
+
+    def record_payload(self, payload, existing=None):
+        sent.append(dict(payload))
+        return create_or_update_product(self, payload, existing)
+
+    monkeypatch.setattr(Cin7Client, "create_or_update_product", record_payload)
+    assert sync_service.perform_sync(db, profile.id)["status"] == "success"
+    assert sync_service.push_to_cin7(db, dry_run=False, profile_id=profile.id)["status"] == "complete"
+    assert bom_actions(db) == ["uploaded"]
+    assert upstreams.products[SKU]["BillOfMaterialsProducts"] == [
+        {"Quantity": 2, "ComponentProductID": "ID-06-00001"}, {"Quantity": 1, "ComponentProductID": "ID-06-00002"},
+    ]
+    sent.clear()
+
+    assert sync_service.push_to_cin7(db, dry_run=False, profile_id=profile.id, force_full=True)["status"] == "complete"
+
+    assert bom_actions(db) == ["uploaded", "skipped"]
+    parent = next(payload for payload in sent if payload["SKU"] == SKU)
+    assert "BillOfMaterialsProducts" not in parent and "AssemblyBOM" not in parent
+
+
+def test_push_rewrites_a_bom_that_drifted_in_cin7(profile, db, upstreams):
+    assert sync_service.perform_sync(db, profile.id)["status"] == "success"
+    assert sync_service.push_to_cin7(db, dry_run=False, profile_id=profile.id)["status"] == "complete"
+    upstreams.products[SKU]["BillOfMaterialsProducts"][0]["Quantity"] = 5
+
+    assert sync_service.push_to_cin7(db, dry_run=False, profile_id=profile.id, force_full=True)["status"] == "complete"
+
+    assert bom_actions(db) == ["uploaded", "uploaded"]
+    log = db.query(models.BomUploadLog).order_by(models.BomUploadLog.id.desc()).first()
+    assert (log.added, log.removed, log.changed) == (0, 0, 1)
+    assert upstreams.products[SKU]["BillOfMaterialsProducts"][0]["Quantity"] == 2
@@ -0,0 +1,82 @@
+import pytest
+
+from backend import database
+from backend.services import artifact_service, cancellation, run_service, sync_service
+
+SKUS = {f"06-{n:05d}" for n in range(6)}
+
+
+@pytest.fixture(autouse=True)
+def poll_every_check(monkeypatch):
+    # A cancel request is read from the run on every check instead of every few seconds
+    monkeypatch.setattr(cancellation, "POLL_SECONDS", 0)
+
+
+def request_cancel(run_id):
+    """Flags the run the way the cancel endpoint does, from another session."""
+    db = database.SessionLocal()
+    try:
+        run_service.request_cancel(db, run_service.get_run(db, run_id))
+    finally:
+        db.close()
+
+
+def pushed(records):
+    return {record["SKU"] for record in records if "SKU" in record}
+
+
+def test_cancelled_run_stops_and_resumes_where_it_left_off(profile, db, upstreams):
+    run_id = artifact_service.new_run_id()
+    first = []
+    for record in sync_service.iter_full_sync(db, dry_run=False, run_id=run_id, profile_id=profile.id):
+        first.append(record)
+        if "SKU" in record and len(pushed(first)) == 1:
+            request_cancel(run_id)
+
+    assert first[-1]["status"] == "cancelled"
+    run = run_service.get_run(db, run_id)
+    db.refresh(run)
+    assert run.status == "cancelled"
+    assert run.message == run_service.CANCEL_MESSAGE
+    assert 0 < len(pushed(first)) < len(SKUS)
+    db.refresh(profile)
+    assert profile.push_watermark is None
+
+    result = sync_service.perform_full_sync(db, run_id=run_id)
+
+    assert result["status"] == "complete"
+    resumed = pushed(result["details"]) | set(run_service.pushed_skus(db, run_id))
+    assert resumed == SKUS
+    db.refresh(run)
+    assert run.status == "complete"
+    assert run.cancel_requested_at is None
+    # Items pushed before the cancel are not pushed again
+    assert run_service.push_counts(run)["success"] == len(SKUS)
+    db.refresh(profile)
+    assert profile.push_watermark is not None
+
+
+def test_cancel_of_a_run_nobody_executes_takes_effect_at_once(profile, db, upstreams):
+    run = run_service.create_run(db, artifact_service.new_run_id(), profile.id, dry_run=False)
+    request_cancel(run.run_id)
+    db.refresh(run)
+    assert run.status == "cancelled"
+
+
+def test_shutdown_leaves_the_run_for_another_node(profile, db, upstreams, monkeypatch):
+    # Restored afterwards, so later tests can register work again
+    monkeypatch.setattr(cancellation, "_closed", False)
+    run_id = artifact_service.new_run_id()
+    records = sync_service.iter_full_sync(db, dry_run=False, run_id=run_id, profile_id=profile.id)
+    for record in records:
+        if "SKU" in record:
+            # Runs in this thread, so there is nothing to wait for
+            assert cancellation.shutdown(grace_seconds=0) == [run_id]
+            break
+    rest = list(records)
+
+    assert rest[-1]["status"] == "cancelled"
+    run = run_service.get_run(db, run_id)
+    db.refresh(run)
+    assert run.status == "running"
+    assert not run_service.is_live(db, run_id)
@@ -0,0 +1,86 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main, models
+from backend.services import catalog_service
+
+
+@pytest.fixture
+def catalog(db, profile):
+    rows = [
+        ("G7", "06-00003", "Hinge", "Stainless hinge", "In Production"),
+        ("G2", "06-00001", "Bracket", "Formed bracket, zinc plated", "In Production"),
+        ("G9", "06-00002", "Panel", "Front panel", "Obsolete"),
+        ("G1", "06-00002", "Panel", "Front panel, second source", "In Production"),
+        ("G5", "07-00001", "Cable", "Shielded cable", "In Production"),
+    ]
+    for guid, number, name, description, phase in rows:
+        db.add(models.ArenaItem(guid=guid, profile_id=profile.id, item_number=number, item_name=name,
+                                description=description, lifecycle_phase=phase, transfer_to_erp="Yes"))
+    db.add(models.ArenaItem(guid="G0", profile_id=profile.id + 1, item_number="06-00000", item_name="Other profile"))
+    db.commit()
+    return profile
+
+
+@pytest.fixture
+def client():
+    # No lifespan: the scheduler and leader election stay off
+    return TestClient(main.app)
+
+
+def browse(client, **params):
+    response = client.get("/items", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def keys(page):
+    return [(item["item_number"], item["guid"]) for item in page["items"]]
+
+
+def test_pages_follow_item_number_then_guid(client, catalog):
+    seen, cursor = [], None
+    while True:
+        page = browse(client, limit=2, profile_id=catalog.id, **({"cursor": cursor} if cursor else {}))
+        seen.extend(keys(page))
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [("06-00001", "G2"), ("06-00002", "G1"), ("06-00002", "G9"), ("06-00003", "G7"), ("07-00001", "G5")]
+
+
+def test_rows_added_behind_the_cursor_do_not_shift_the_next_page(client, catalog, db):
+    first = browse(client, limit=2, profile_id=catalog.id)
+    db.add(models.ArenaItem(guid="G3", profile_id=catalog.id, item_number="06-00000", item_name="Washer"))
+    db.commit()
+
+    second = browse(client, limit=2, profile_id=catalog.id, cursor=first["next_cursor"])
+
+    assert keys(second) == [("06-00002", "G9"), ("06-00003", "G7")]
+
+
+def test_filters_narrow_the_browse(client, catalog):
+    assert [number for number, _ in keys(browse(client, prefix="06-*", profile_id=catalog.id))] == ["06-00001", "06-00002", "06-00002", "06-00003"]
+    assert keys(browse(client, lifecycle="Obsolete", profile_id=catalog.id)) == [("06-00002", "G9")]
+    assert keys(browse(client, q="zinc brack", profile_id=catalog.id)) == [("06-00001", "G2")]
+    assert keys(browse(client, q="second", prefix="06-")) == [("06-00002", "G1")]
+
+
+def test_full_text_index_follows_updates(catalog, db):
+    item = db.query(models.ArenaItem).filter(models.ArenaItem.guid == "G7").one()
+    item.description = "Brass hinge"
+    db.commit()
+
+    assert catalog_service.search_items(db, q="stainless")[0] == []
+    assert [row.guid for row in catalog_service.search_items(db, q="brass")[0]] == ["G7"]
+
+
+def test_invalid_cursor_is_a_bad_request(client, catalog):
+    assert client.get("/items", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_page_size_is_capped(catalog, db):
+    rows, _ = catalog_service.search_items(db, limit=10_000)
+    assert len(rows) == 6
+    assert catalog_service.search_items(db, limit=0)[0][0].item_number == "06-00000"
@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import threading
+
+from backend import database, models
+from backend.services import change_queue_service
+
+NOTIFIERS = 8
+
+
+class NothingQueued:
+    """A query that hasn't seen the entry another notification is about to commit."""
+
+    def filter(self, *criteria):
+        return self
+
+    def first(self):
+        return None
+
+
+def test_concurrent_notifications_queue_a_change_once(db):
+    barrier = threading.Barrier(NOTIFIERS)
+
+    def notify(n):
+        session = database.SessionLocal()
+        try:
+            barrier.wait()
+            return change_queue_service.enqueue(session, "CHG-1", "ECO-1", debounce_seconds=30)
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=NOTIFIERS) as pool:
+        results = list(pool.map(notify, range(NOTIFIERS)))
+
+    assert results.count(True) == 1
+    assert db.query(models.ChangeQueueEntry).count() == 1
+
+
+def test_losing_the_insert_race_counts_as_a_duplicate(db, monkeypatch):
+    assert change_queue_service.enqueue(db, "CHG-1", "ECO-1")
+    late = database.SessionLocal()
+    try:
+        monkeypatch.setattr(late, "query", lambda *entities: NothingQueued())
+        assert change_queue_service.enqueue(late, "CHG-1", "ECO-1") is False
+    finally:
+        late.close()
+    assert db.query(models.ChangeQueueEntry).count() == 1
+
+
+def test_repeat_notification_pushes_the_due_time_back(db):
+    assert change_queue_service.enqueue(db, "CHG-1", "ECO-1", debounce_seconds=30)
+    entry = db.query(models.ChangeQueueEntry).one()
+    first_due = entry.due_at
+
+    assert change_queue_service.enqueue(db, "CHG-1", "ECO-1", debounce_seconds=30) is False
+    db.refresh(entry)
+    assert first_due < entry.due_at <= entry.received_at + timedelta(seconds=30 * change_queue_service.MAX_DEBOUNCE_WINDOWS)
@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+import requests
+
+from backend.services import circuit_breaker, sync_service
+from conftest import FakeResponse
+
+
+class Upstream:
+    """A send() target that fails until told otherwise and counts the calls that reach it."""
+
+    def __init__(self, status=200, error=None):
+        self.status, self.error, self.calls = status, error, 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return FakeResponse(self.status, {})
+
+
+def test_breaker_opens_after_the_threshold_and_fails_fast(profile, db):
+    breaker = circuit_breaker.CircuitBreaker("arena", profile.id, failure_threshold=3, reset_seconds=60)
+    down = Upstream(error=requests.exceptions.ConnectTimeout("timed out"))
+
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.ConnectTimeout):
+            breaker.call(down)
+    with pytest.raises(circuit_breaker.CircuitOpenError):
+        breaker.call(down)
+
+    assert down.calls == 3
+    assert breaker.state == circuit_breaker.OPEN
+    assert breaker.stats()["totals"] == {"requests": 3, "failures": 3, "rejected": 1, "opened": 1}
+    db.refresh(profile)
+    assert profile.is_arena_connected is False
+
+
+def test_server_errors_count_as_failures_and_client_errors_do_not():
+    breaker = circuit_breaker.CircuitBreaker("cin7", failure_threshold=2)
+
+    breaker.call(Upstream(status=503))
+    breaker.call(Upstream(status=404))
+    breaker.call(Upstream(status=502))
+    assert breaker.state == circuit_breaker.CLOSED
+
+    breaker.call(Upstream(status=500))
+    assert breaker.state == circuit_breaker.OPEN
+
+
+def test_half_open_breaker_lets_one_probe_through(profile, db):
+    breaker = circuit_breaker.CircuitBreaker("cin7", profile.id, failure_threshold=1, reset_seconds=0)
+    breaker.call(Upstream(status=503))
+    assert breaker.state == circuit_breaker.OPEN
+
+    probe_started, release = threading.Event(), threading.Event()
+
+    def slow_probe():
+        probe_started.set()
+        release.wait(5)
+        return FakeResponse(200, {})
+
+    probe = threading.Thread(target=breaker.call, args=(slow_probe,))
+    probe.start()
+    assert probe_started.wait(5)
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    # While the probe is out, everything else is still rejected
+    with pytest.raises(circuit_breaker.CircuitOpenError):
+        breaker.call(Upstream())
+    release.set()
+    probe.join(5)
+
+    assert breaker.state == circuit_breaker.CLOSED
+    db.refresh(profile)
+    assert profile.is_cin7_connected is True
+
+
+def test_failed_probe_opens_the_breaker_again():
+    breaker = circuit_breaker.CircuitBreaker("arena", failure_threshold=3, reset_seconds=0)
+    for _ in range(3):
+        breaker.call(Upstream(status=500))
+
+    breaker.call(Upstream(status=500))
+
+    assert breaker.state == circuit_breaker.OPEN
+    assert breaker.totals["opened"] == 2
+    assert [t["to"] for t in breaker.transitions] == ["open", "half_open", "open"]
+
+
+def test_push_stops_once_cin7_is_down(profile, db, upstreams, monkeypatch):
+    assert sync_service.perform_sync(db, profile.id)["status"] == "success"
+    monkeypatch.setattr(circuit_breaker, "FAILURE_THRESHOLD", 2)
+    # One item at a time, so no call is already on its way when the breaker opens
+    monkeypatch.setattr(sync_service, "PUSH_WINDOW", 1)
+    monkeypatch.setattr(upstreams, "_cin7", lambda method, path, query, body: FakeResponse(503, {}))
+
+    result = sync_service.push_to_cin7(db, dry_run=False, profile_id=profile.id)
+
+    assert result["status"] == "error"
+    assert "circuit open" in result["message"]
+    assert upstreams.calls["cin7"] == 2
+    assert circuit_breaker.is_open("cin7", profile.id)
+    db.refresh(profile)
+    assert profile.is_cin7_connected is False
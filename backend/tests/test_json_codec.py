@@ -0,0 +1,65 @@
+import dataclasses
+import datetime
+import enum
+import importlib.util
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from backend.services import json_codec
+
+
+class Phase(enum.Enum):
+    PRODUCTION = "In Production"
+
+
+@dataclasses.dataclass
+class Line:
+    sku: str
+    qty: float
+
+
+PAYLOADS = [
+    {"SKU": "06-00001", "Name": "Bracket, 90°", "Description": "Ø12 mm — zinc ✓", "PriceTiers": {"Tier 1": 0.0}},
+    {"raw_data": {"number": "06-00001", "quantity": 2.5, "count": 10, "flags": [True, False, None]}},
+    {"updated_at": datetime.datetime(2024, 5, 1, 12, 30, 15, 250000), "day": datetime.date(2024, 5, 1),
+     "at": datetime.time(8, 0), "utc": datetime.datetime(2024, 5, 1, tzinfo=datetime.timezone.utc)},
+    {1: "int key", 2.5: "float key", True: "bool key", None: "null key"},
+    {"phase": Phase.PRODUCTION, "line": Line("06-00002", 1.0), "guid": uuid.UUID(int=7), "cost": Decimal("1.10")},
+    [],
+    "plain string",
+]
+
+
+@pytest.fixture(scope="module")
+def fallback():
+    """A second copy of the codec module, loaded with JSON_CODEC=json."""
+    if json_codec.CODEC != "orjson":
+        pytest.skip("orjson is not installed or is switched off")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("JSON_CODEC", "json")
+        spec = importlib.util.spec_from_file_location("json_codec_fallback", json_codec.__file__)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    assert module.CODEC == "json"
+    return module
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_fallback_writes_the_same_bytes_as_orjson(fallback, payload):
+    assert fallback.dumps(payload) == json_codec.dumps(payload)
+
+
+def test_round_trip_through_either_codec(fallback):
+    payload = PAYLOADS[0]
+    assert json_codec.loads(fallback.dumps(payload)) == payload
+    assert fallback.loads(json_codec.dumps(payload)) == payload
+
+
+def test_invalid_body_raises_value_error():
+    class Response:
+        content = b"<html>Bad gateway</html>"
+
+    with pytest.raises(ValueError):
+        json_codec.decode(Response())
@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import threading
+
+from backend import database, models
+from backend.services import lease_service
+
+NODES = 8
+
+
+def contend(name, ttl_seconds=60):
+    """Every node tries to take the lease at the same moment, each on its own session."""
+    barrier = threading.Barrier(NODES)
+
+    def attempt(node):
+        db = database.SessionLocal()
+        try:
+            barrier.wait()
+            return node, lease_service.acquire(db, name, ttl_seconds, holder=node)
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=NODES) as pool:
+        return dict(pool.map(attempt, [f"node-{n}" for n in range(NODES)]))
+
+
+def holder(db, name):
+    db.expire_all()
+    return db.query(models.Lease.holder).filter(models.Lease.name == name).scalar()
+
+
+def test_one_node_wins_a_new_lease(db):
+    results = contend("harvest")
+    winners = [node for node, won in results.items() if won]
+    assert len(winners) == 1
+    assert holder(db, "harvest") == winners[0]
+
+
+def test_one_node_takes_over_an_expired_lease(db):
+    db.add(models.Lease(name="harvest", holder="crashed", acquired_at=datetime.utcnow() - timedelta(minutes=5),
+                        expires_at=datetime.utcnow() - timedelta(minutes=1)))
+    db.commit()
+    results = contend("harvest")
+    winners = [node for node, won in results.items() if won]
+    assert len(winners) == 1
+    assert holder(db, "harvest") == winners[0]
+
+
+def test_live_lease_is_refused_to_other_nodes_and_renewed_by_its_holder(db):
+    assert lease_service.acquire(db, "harvest", 60, holder="a")
+    assert not lease_service.acquire(db, "harvest", 60, holder="b")
+    assert lease_service.acquire(db, "harvest", 60, holder="a")
+    assert holder(db, "harvest") == "a"
+
+
+def test_released_lease_is_free_again(db):
+    assert lease_service.acquire(db, "harvest", 60, holder="a")
+    lease_service.release(db, "harvest", holder="b")
+    assert not lease_service.acquire(db, "harvest", 60, holder="b")
+    lease_service.release(db, "harvest", holder="a")
+    assert lease_service.acquire(db, "harvest", 60, holder="b")
+
+
+def test_held_runs_the_block_only_for_the_winner(db):
+    with lease_service.held("partition:1", holder="a") as first:
+        with lease_service.held("partition:1", holder="b") as second:
+            assert first and not second
+    assert holder(db, "partition:1") is None
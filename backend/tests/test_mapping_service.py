@@ -0,0 +1,83 @@
+import pytest
+
+from backend import models
+from backend.services import mapping_service
+from backend.services.sync_service import HarvestedItem
+
+from conftest import arena_item
+
+TIERS = {"Standard": 0.0, **{f"Tier {n}": 0.0 for n in range(2, 11)}}
+
+
+def harvested(**fields):
+    values = dict(
+        guid="G00007", profile_id=None, item_number="06-00007", item_name="Bracket 7", revision="C",
+        lifecycle_phase="In Production", category=None, description="Formed bracket", uom="EA",
+        costing_method=None, inventory_account=None, cogs_account=None, sellable="Yes", internal_note_erp=None,
+        last_glg_co="ECO-1042", transfer_to_erp="Yes", manufacturer="Acme", manufacturer_item_number="MPN-7",
+    )
+    values.update(fields)
+    return HarvestedItem(**values)
+
+
+def test_default_spec_builds_the_payload_the_hand_written_mapping_did(profile, db):
+    db.add(models.SyncRule(rule_key="DefaultLocation", rule_value="Annex", is_enabled=True))
+    db.commit()
+
+    payload = mapping_service.for_profile(db, profile.id).product(harvested())
+
+    assert payload == {
+        "SKU": "06-00007", "Name": "Bracket 7", "Category": "Fabricated Metal", "Description": "Formed bracket",
+        "UOM": "EA", "CostingMethod": "FIFO - Batch", "RevenueAccount": "4001: OEM Product",
+        "InventoryAccount": "1402: Raw Materials", "COGSAccount": "4100: Cost of Sales",
+        "DefaultLocation": "Annex", "Type": "Stock", "Sellable": True, "Status": "Active", "InternalNote": "",
+        "AdditionalAttribute1": "C", "AdditionalAttribute2": "ECO-1042", "AdditionalAttribute4": "Acme MPN-7",
+        "AttributeSet": "Item", "PriceTiers": TIERS, "AssemblyBOM": False, "BillOfMaterial": False,
+    }
+
+
+def test_assembly_payload_carries_its_bom(profile, db):
+    mapping = mapping_service.for_profile(db, profile.id)
+    bom = [{"sku": "06-00001", "qty": 2, "cin7_id": "ID-1"}, {"sku": "06-00002", "qty": 1, "cin7_id": None}]
+
+    payload = mapping.product(harvested(manufacturer=None, sellable="No"), bom)
+
+    assert payload["AssemblyBOM"] is True and payload["BillOfMaterial"] is True
+    assert payload["QuantityToProduce"] == 1.0
+    assert payload["AssemblyCostEstimationMethod"] == "Average Cost"
+    assert payload["BillOfMaterialsProducts"] == [
+        {"Quantity": 2, "ComponentProductID": "ID-1"},
+        {"Quantity": 1, "ProductCode": "06-00002"},
+    ]
+    assert payload["AdditionalAttribute4"] == "MPN-7"
+    assert payload["Sellable"] is False
+
+
+def test_item_columns_are_read_from_arena_json(profile, db):
+    sourcing = {"results": [{"vendorItem": {"number": "MPN-3", "supplier": {"name": "Acme"}}}]}
+
+    columns = mapping_service.for_profile(db, profile.id).item(arena_item(3), sourcing)
+
+    assert columns["item_number"] == "06-00003"
+    assert columns["lifecycle_phase"] == "In Production"
+    assert columns["transfer_to_erp"] == "Yes"
+    assert (columns["manufacturer"], columns["manufacturer_item_number"]) == ("Acme", "MPN-3")
+
+
+def test_profile_spec_overrides_the_default(profile, db):
+    spec = {"item": mapping_service.DEFAULT_SPEC["item"], "product": [
+        {"target": "SKU", "source": "item_number"},
+        {"target": "Brand", "source": "manufacturer", "default": "Generic"},
+    ]}
+    mapping_service.set_spec(db, spec, profile.id)
+
+    payload = mapping_service.for_profile(db, profile.id).product(harvested(manufacturer=None))
+
+    assert payload == {"SKU": "06-00007", "Brand": "Generic", "AssemblyBOM": False, "BillOfMaterial": False}
+    assert mapping_service.get_spec(db, profile.id + 1) == mapping_service.DEFAULT_SPEC
+
+
+def test_spec_with_an_unknown_column_is_rejected(profile, db):
+    with pytest.raises(mapping_service.MappingError):
+        mapping_service.set_spec(db, {"product": [{"target": "SKU", "source": "part_number"}]}, profile.id)
+    assert db.query(models.FieldMapping).count() == 0
@@ -0,0 +1,73 @@
+from backend import models
+from backend.services import sync_service
+
+
+def push(db, profile, **kwargs):
+    result = sync_service.push_to_cin7(db, profile_id=profile.id, **kwargs)
+    assert result["status"] == "complete"
+    return result
+
+
+def harvest(db, profile):
+    result = sync_service.perform_sync(db, profile.id)
+    assert result["status"] == "success"
+    return result
+
+
+def test_first_live_push_sends_everything_and_sets_the_watermark(profile, db, upstreams):
+    harvest(db, profile)
+    result = push(db, profile, dry_run=False)
+    assert result["changed_since"] is None
+    assert result["summary"]["success"] == 6
+    db.refresh(profile)
+    assert profile.push_watermark is not None
+
+
+def test_push_after_an_unchanged_harvest_sends_nothing(profile, db, upstreams):
+    harvest(db, profile)
+    push(db, profile, dry_run=False)
+    watermark = profile.push_watermark
+    assert harvest(db, profile)["items_changed"] == 0
+    upstreams.writes.clear()
+
+    result = push(db, profile, dry_run=False)
+
+    assert result["changed_since"] == watermark
+    assert result["summary"]["success"] == 0
+    assert upstreams.writes == []
+
+
+def test_push_sends_only_the_items_the_harvest_changed(profile, db, upstreams):
+    harvest(db, profile)
+    push(db, profile, dry_run=False)
+    upstreams.item("06-00004")["description"] = "Formed bracket, zinc plated"
+    assert harvest(db, profile)["items_changed"] == 1
+    upstreams.writes.clear()
+
+    result = push(db, profile, dry_run=False)
+
+    assert result["summary"]["success"] == 1
+    assert upstreams.writes == ["06-00004"]
+    assert upstreams.products["06-00004"]["Description"] == "Formed bracket, zinc plated"
+
+
+def test_rule_change_or_force_full_pushes_everything_again(profile, db, upstreams):
+    harvest(db, profile)
+    push(db, profile, dry_run=False)
+
+    assert push(db, profile, dry_run=False, force_full=True)["summary"]["success"] == 6
+
+    db.add(models.SyncRule(rule_key="DefaultLocation", rule_value="Annex", is_enabled=True))
+    db.commit()
+    result = push(db, profile, dry_run=False)
+    assert result["changed_since"] is None
+    assert result["summary"]["success"] == 6
+    assert upstreams.products["06-00003"]["DefaultLocation"] == "Annex"
+
+
+def test_dry_run_leaves_the_watermark(profile, db, upstreams):
+    harvest(db, profile)
+    push(db, profile, dry_run=True)
+    db.refresh(profile)
+    assert profile.push_watermark is None
+    assert upstreams.writes == []
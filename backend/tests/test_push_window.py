@@ -0,0 +1,62 @@
+from backend.services import sync_service, work_scheduler
+from conftest import arena_item
+
+ITEMS = 30
+
+
+def harvest(db, profile, upstreams):
+    upstreams.items += [arena_item(n) for n in range(6, ITEMS)]
+    assert sync_service.perform_sync(db, profile.id)["status"] == "success"
+
+
+def track_submissions(monkeypatch):
+    submitted = []
+    submit = work_scheduler.submit
+
+    def counting_submit(fn, item, **kwargs):
+        submitted.append(item.item_number)
+        return submit(fn, item, **kwargs)
+
+    monkeypatch.setattr(work_scheduler, "submit", counting_submit)
+    return submitted
+
+
+def test_push_keeps_a_bounded_window_in_flight(profile, db, upstreams, monkeypatch):
+    harvest(db, profile, upstreams)
+    monkeypatch.setattr(sync_service, "PUSH_WINDOW", 4)
+    monkeypatch.setattr(sync_service, "PUSH_CHUNK_SIZE", 7)
+    submitted = track_submissions(monkeypatch)
+
+    pushed = []
+    for record in sync_service.iter_push_to_cin7(db, dry_run=True, profile_id=profile.id):
+        if "SKU" in record:
+            pushed.append(record["SKU"])
+            # Outcomes handed out so far plus those still in flight
+            assert len(submitted) - len(pushed) < 4
+
+    assert sorted(pushed) == [f"06-{n:05d}" for n in range(ITEMS)]
+    assert sorted(submitted) == sorted(pushed)
+
+
+def test_first_outcome_does_not_wait_for_the_whole_catalog(profile, db, upstreams, monkeypatch):
+    harvest(db, profile, upstreams)
+    monkeypatch.setattr(sync_service, "PUSH_WINDOW", 2)
+    monkeypatch.setattr(sync_service, "PUSH_CHUNK_SIZE", 5)
+    submitted = track_submissions(monkeypatch)
+
+    records = sync_service.iter_push_to_cin7(db, dry_run=True, profile_id=profile.id)
+    first = next(record for record in records if "SKU" in record)
+
+    assert first["Mode"] == "DRY_RUN"
+    assert len(submitted) == 2
+    records.close()
+
+
+def test_pages_cover_every_item_once(profile, db, upstreams, monkeypatch):
+    harvest(db, profile, upstreams)
+    monkeypatch.setattr(sync_service, "PUSH_CHUNK_SIZE", 4)
+
+    items = list(sync_service._iter_push_items(profile))
+
+    assert sorted(item.item_number for item in items) == [f"06-{n:05d}" for n in range(ITEMS)]
+    assert [item.guid for item in items] == sorted(item.guid for item in items)
@@ -0,0 +1,94 @@
+import pytest
+
+from backend import models
+from backend.services import quota_service, sync_service, work_scheduler
+
+
+def test_run_budget_refuses_calls_past_its_limit():
+    budget = quota_service.RunBudget({"arena": 2, "cin7": 0})
+    budget.take("arena")
+    budget.take("arena")
+    assert budget.exhausted("arena")
+    with pytest.raises(quota_service.QuotaExceeded):
+        budget.take("arena")
+    # 0 means unlimited
+    for _ in range(10):
+        budget.take("cin7")
+    assert not budget.exhausted("cin7")
+
+
+def test_daily_budget_keeps_its_reserve_for_interactive_work(profile, db):
+    profile.arena_daily_call_budget = 10
+    profile.call_budget_reserve_percent = 20
+    db.commit()
+
+    for _ in range(8):
+        quota_service.charge("arena", profile.id)
+    assert quota_service.exhausted("arena", profile.id)
+    with pytest.raises(quota_service.QuotaExceeded):
+        quota_service.charge("arena", profile.id)
+
+    with work_scheduler.priority_scope(work_scheduler.INTERACTIVE):
+        quota_service.charge("arena", profile.id)
+        quota_service.charge("arena", profile.id)
+        with pytest.raises(quota_service.QuotaExceeded):
+            quota_service.charge("arena", profile.id)
+
+
+def test_daily_usage_survives_a_restart(profile, db):
+    profile.cin7_daily_call_budget = 5
+    profile.call_budget_reserve_percent = 0
+    db.commit()
+    for _ in range(5):
+        quota_service.charge("cin7", profile.id)
+    quota_service.flush()
+
+    # A new process (or replica) starts from the stored count
+    quota_service._usage.clear()
+    assert quota_service.exhausted("cin7", profile.id)
+    row = db.query(models.ApiUsage).filter(models.ApiUsage.profile_id == profile.id, models.ApiUsage.upstream == "cin7").one()
+    assert row.calls == 5
+
+
+def test_push_stops_when_the_daily_budget_runs_out(profile, db, upstreams):
+    assert sync_service.perform_sync(db, profile.id)["status"] == "success"
+    profile.cin7_daily_call_budget = 3
+    db.commit()
+    quota_service.forget_limits(profile.id)
+
+    result = sync_service.push_to_cin7(db, dry_run=False, profile_id=profile.id)
+
+    assert result["status"] == "error"
+    assert upstreams.calls["cin7"] <= 3
+    db.refresh(profile)
+    # Nothing is skipped next time: the watermark stays where it was
+    assert profile.push_watermark is None
+
+
+def test_login_refused_by_the_budget_is_reported_as_such(profile, db, upstreams):
+    profile.arena_daily_call_budget = 1
+    profile.call_budget_reserve_percent = 0
+    db.commit()
+    quota_service.charge("arena", profile.id)
+
+    result = sync_service.perform_sync(db, profile.id)
+
+    assert result["status"] == "error"
+    assert "daily call budget reached" in result["message"]
+    assert upstreams.calls["arena"] == 0
+
+
+def test_full_sync_that_cannot_fit_is_refused_before_it_starts(profile, db, upstreams):
+    assert sync_service.perform_sync(db, profile.id)["status"] == "success"
+    profile.cin7_daily_call_budget = 3
+    db.commit()
+    quota_service.forget_limits(profile.id)
+    upstreams.calls["cin7"] = 0
+
+    records = list(sync_service.iter_full_sync(db, dry_run=False, profile_id=profile.id))
+
+    assert len(records) == 1
+    assert records[0]["message"].startswith("Call budget too low")
+    assert records[0]["plan"]["fits"] is False
+    assert upstreams.calls["cin7"] == 0
+    assert db.query(models.SyncRun).count() == 0
@@ -0,0 +1,70 @@
+import gzip
+import json
+
+from backend.services import artifact_service, reconcile_service, sync_service
+from backend.services.cin7_service import Cin7Client
+
+
+def read_report(run_id):
+    with gzip.open(artifact_service.artifact_path(run_id), "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def drifted_catalog(db, profile, upstreams):
+    """Harvests and pushes the six items, then lets Cin7 drift from them."""
+    assert sync_service.perform_sync(db, profile.id)["status"] == "success"
+    assert sync_service.push_to_cin7(db, dry_run=False, profile_id=profile.id)["status"] == "complete"
+    del upstreams.products["06-00000"]
+    upstreams.products["06-00003"]["Name"] = "Renamed in Cin7"
+    upstreams.products["06-99999"] = {"ID": "ID-06-99999", "SKU": "06-99999", "Name": "Cin7 only"}
+    # Outside the profile's prefix filter: neither compared nor reported
+    upstreams.products["07-00001"] = {"ID": "ID-07-00001", "SKU": "07-00001", "Name": "Other family"}
+    upstreams.calls["cin7"] = 0
+    upstreams.writes.clear()
+
+
+def test_report_lists_missing_extra_and_different_products(profile, db, upstreams):
+    drifted_catalog(db, profile, upstreams)
+
+    result = reconcile_service.reconcile_catalog(db, profile_id=profile.id)
+
+    assert result["status"] == "complete"
+    assert result["summary"] == {"compared": 6, "in_sync": 4, "missing": 1, "extra": 1, "different": 1,
+                                 "pushed": 0, "push_failed": 0, "partial": 0}
+    records = {record["SKU"]: record for record in read_report(result["run_id"]) if "SKU" in record}
+    assert records["06-00000"]["Drift"] == "missing"
+    assert records["06-99999"]["Drift"] == "extra"
+    assert records["06-00003"]["Fields"] == {"Name": {"arena": "Bracket 3", "cin7": "Renamed in Cin7"}}
+    assert set(records) == {"06-00000", "06-00003", "06-99999"}
+    # One bulk catalog read, no per-SKU lookups and no writes
+    assert upstreams.calls["cin7"] == 1
+    assert upstreams.writes == []
+
+
+def test_push_writes_only_the_drifted_products(profile, db, upstreams):
+    drifted_catalog(db, profile, upstreams)
+
+    result = reconcile_service.reconcile_catalog(db, push=True, profile_id=profile.id)
+
+    assert result["summary"]["pushed"] == 2
+    assert sorted(upstreams.writes) == ["06-00000", "06-00003"]
+    assert upstreams.products["06-00003"]["Name"] == "Bracket 3"
+    assert "06-99999" in upstreams.products
+    # The assembly is recreated without its BOM and reported as partial
+    assert result["summary"]["partial"] == 1
+    assert "BillOfMaterialsProducts" not in upstreams.products["06-00000"]
+    records = {record["SKU"]: record for record in read_report(result["run_id"]) if "SKU" in record}
+    assert records["06-00000"]["Partial"] is True
+    assert records["06-00003"]["Pushed"] is True
+
+
+def test_catalog_is_read_page_by_page(profile, db, upstreams, monkeypatch):
+    drifted_catalog(db, profile, upstreams)
+    iter_all_products = Cin7Client.iter_all_products
+    monkeypatch.setattr(Cin7Client, "iter_all_products", lambda self: iter_all_products(self, limit=2))
+
+    result = reconcile_service.reconcile_catalog(db, profile_id=profile.id)
+
+    assert result["summary"]["in_sync"] == 4
+    assert result["summary"]["extra"] == 1
+    assert upstreams.calls["cin7"] == 4
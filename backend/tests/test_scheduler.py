@@ -0,0 +1,97 @@
+import pytest
+
+from backend import models
+from backend.services import scheduler_service
+
+
+def test_interval_tightens_with_activity_and_backs_off_when_idle():
+    assert scheduler_service.next_interval(8, activity=3, low=1, high=30) == 4
+    assert scheduler_service.next_interval(1.5, activity=3, low=1, high=30) == 1
+    assert scheduler_service.next_interval(8, activity=0, low=1, high=30) == 12
+    assert scheduler_service.next_interval(25, activity=0, low=1, high=30) == 30
+
+
+def test_schedule_is_read_from_the_profile_and_sanitised(profile, db):
+    assert scheduler_service.load_schedule(db, profile.id) == (5, 1, 30)
+
+    profile.sync_interval_minutes = 10
+    profile.min_sync_interval_minutes = 20
+    profile.max_sync_interval_minutes = 3
+    db.commit()
+
+    # min never exceeds the base interval, max never falls below it
+    assert scheduler_service.load_schedule(db, profile.id) == (10, 10, 10)
+
+
+@pytest.fixture
+def scheduler(profile, monkeypatch):
+    # Profile jobs are due an hour from now, so only the test drives ticks
+    monkeypatch.setattr(scheduler_service, "FIRST_RUN_DELAY_SECONDS", 3600)
+    activity = {}
+    sync = scheduler_service.SyncScheduler(lambda profile_id: activity.get(profile_id, 0))
+    sync.activity = activity
+    sync.start()
+    yield sync
+    sync.shutdown(wait=False)
+
+
+def interval(sync, profile_id):
+    return sync.status()["profiles"][profile_id]["interval_minutes"]
+
+
+def job_seconds(sync, profile_id):
+    return sync._scheduler.get_job(sync._job_id(profile_id)).trigger.interval.total_seconds()
+
+
+def test_each_tick_adapts_the_profile_job(scheduler, profile):
+    assert interval(scheduler, profile.id) == 5
+
+    scheduler.activity[profile.id] = 4
+    scheduler._tick(profile.id)
+    scheduler._tick(profile.id)
+    assert interval(scheduler, profile.id) == 1.25
+    assert job_seconds(scheduler, profile.id) == 75
+
+    scheduler.activity[profile.id] = 0
+    for _ in range(10):
+        scheduler._tick(profile.id)
+    assert interval(scheduler, profile.id) == 30
+    assert scheduler.status()["profiles"][profile.id]["last_activity"] == 0
+
+
+def test_tick_that_did_not_run_leaves_the_interval_alone(scheduler, profile):
+    scheduler.activity[profile.id] = None
+    scheduler._tick(profile.id)
+
+    state = scheduler.status()["profiles"][profile.id]
+    assert state["interval_minutes"] == 5
+    assert state["last_run"] is None
+
+
+def test_jobs_never_overlap_and_start_jittered(scheduler, profile):
+    job = scheduler._scheduler.get_job(scheduler._job_id(profile.id))
+    assert job.max_instances == 1
+    assert job.coalesce is True
+    assert job.next_run_time is not None
+
+
+def test_refresh_applies_profile_changes_live(scheduler, profile, db):
+    scheduler.activity[profile.id] = 0
+    scheduler._tick(profile.id)
+    assert interval(scheduler, profile.id) == 7.5
+
+    profile.sync_interval_minutes = 2
+    other = models.Configuration(cin7_api_user="other")
+    db.add(other)
+    db.commit()
+    scheduler.refresh(profile.id)
+
+    assert interval(scheduler, profile.id) == 2
+    assert job_seconds(scheduler, profile.id) == 120
+    assert interval(scheduler, other.id) == 5
+
+    db.delete(other)
+    db.commit()
+    scheduler.refresh()
+    assert set(scheduler.status()["profiles"]) == {profile.id}
+    assert scheduler._scheduler.get_job(scheduler._job_id(other.id)) is None
@@ -0,0 +1,52 @@
+from backend import models
+from backend.services import sync_service
+
+
+def harvest(db, profile):
+    result = sync_service.perform_sync(db, profile.id)
+    assert result["status"] == "success"
+    return result
+
+
+def untransferred(upstreams, number):
+    upstreams.item(number)["additionalAttributes"] = [{"name": "Transfer Data to ERP?", "value": "No"}]
+
+
+def detail_reads(upstreams, guid):
+    return sum(1 for upstream, method, path in upstreams.log if path.endswith(f"/items/{guid}"))
+
+
+def test_filtered_out_item_is_not_fetched_again_at_the_same_revision(profile, db, upstreams):
+    untransferred(upstreams, "06-00003")
+    assert harvest(db, profile)["skipped_transfer_erp"] == 1
+
+    result = harvest(db, profile)
+
+    assert result["cache_hits"] == 1
+    assert result["skipped_transfer_erp"] == 1
+    assert detail_reads(upstreams, "G00003") == 1
+
+
+def test_new_revision_is_judged_again(profile, db, upstreams):
+    untransferred(upstreams, "06-00003")
+    harvest(db, profile)
+    upstreams.item("06-00003").update(revisionNumber="B", additionalAttributes=upstreams.item("06-00002")["additionalAttributes"])
+
+    result = harvest(db, profile)
+
+    assert result["cache_hits"] == 0
+    assert db.query(models.SkippedItem).count() == 0
+    assert db.query(models.ArenaItem).filter(models.ArenaItem.item_number == "06-00003").count() == 1
+
+
+def test_item_listed_without_a_revision_is_always_fetched(profile, db, upstreams):
+    untransferred(upstreams, "06-00003")
+    upstreams.item("06-00003")["revisionNumber"] = None
+    harvest(db, profile)
+    assert db.query(models.SkippedItem).count() == 0
+
+    result = harvest(db, profile)
+
+    assert result["cache_hits"] == 0
+    assert result["skipped_transfer_erp"] == 1
+    assert detail_reads(upstreams, "G00003") == 2
@@ -0,0 +1,76 @@
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import main, models
+from backend.services import change_queue_service
+
+SECRET = "webhook-secret"
+URL = "/webhooks/arena/changes"
+
+
+@pytest.fixture
+def client(profile, db):
+    profile.webhook_secret = SECRET
+    db.commit()
+    # No lifespan: the scheduler and leader election stay off
+    return TestClient(main.app)
+
+
+def post(client, body, secret=SECRET, timestamp=None, signature=None):
+    timestamp = str(int(time.time())) if timestamp is None else timestamp
+    if signature is None:
+        signature = change_queue_service.sign_payload(secret, timestamp, body)
+    return client.post(URL, content=body, headers={"X-Arena-Timestamp": timestamp, "X-Arena-Signature": signature})
+
+
+def queued(db):
+    return db.query(models.ChangeQueueEntry).count()
+
+
+def event(guid="CHG-1"):
+    return json.dumps({"changeGuid": guid, "changeNumber": "ECO-1"}).encode()
+
+
+def test_signed_notification_is_queued(client, db):
+    response = post(client, event())
+    assert response.status_code == 202
+    assert response.json()["queued"] is True
+    assert queued(db) == 1
+
+
+def test_tampered_body_is_rejected(client, db):
+    timestamp = str(int(time.time()))
+    signature = change_queue_service.sign_payload(SECRET, timestamp, event("CHG-1"))
+    response = post(client, event("CHG-2"), timestamp=timestamp, signature=signature)
+    assert response.status_code == 401
+    assert queued(db) == 0
+
+
+def test_wrong_secret_is_rejected(client, db):
+    response = post(client, event(), secret="guessed")
+    assert response.status_code == 401
+    assert queued(db) == 0
+
+
+def test_stale_timestamp_is_rejected(client, db):
+    stale = str(int(time.time()) - change_queue_service.SIGNATURE_TOLERANCE_SECONDS - 60)
+    response = post(client, event(), timestamp=stale)
+    assert response.status_code == 401
+    assert queued(db) == 0
+
+
+def test_unsigned_notification_is_rejected(client, db):
+    response = client.post(URL, content=event())
+    assert response.status_code == 401
+    assert queued(db) == 0
+
+
+def test_profile_without_secret_refuses_notifications(client, profile, db):
+    profile.webhook_secret = None
+    db.commit()
+    response = post(client, event())
+    assert response.status_code == 403
+    assert queued(db) == 0
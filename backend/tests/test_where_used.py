@@ -0,0 +1,63 @@
+from backend import models
+from backend.services import sync_service, where_used_service
+
+
+def bom_reads(upstreams):
+    return [path for upstream, method, path in upstreams.log if path.endswith("/bom")]
+
+
+def harvest(db, profile):
+    result = sync_service.perform_sync(db, profile.id)
+    assert result["status"] == "success"
+    return result
+
+
+def test_harvest_indexes_boms_and_the_push_reuses_them(profile, db, upstreams):
+    harvest(db, profile)
+    assert len(bom_reads(upstreams)) == 6
+    assert where_used_service.parents(db, profile.id, ["06-00001"]) == {"06-00000"}
+    upstreams.log.clear()
+
+    result = sync_service.push_to_cin7(db, dry_run=False, profile_id=profile.id)
+
+    assert result["status"] == "complete"
+    assert bom_reads(upstreams) == []
+    lines = upstreams.products["06-00000"]["BillOfMaterialsProducts"]
+    assert sorted((line["ComponentProductID"], line["Quantity"]) for line in lines) == [("ID-06-00001", 2), ("ID-06-00002", 1)]
+
+
+def test_only_revised_items_have_their_bom_read_again(profile, db, upstreams):
+    harvest(db, profile)
+    upstreams.log.clear()
+    upstreams.item("06-00000")["revisionNumber"] = "B"
+    upstreams.boms["G00000"] = [("G00001", 3)]
+
+    harvest(db, profile)
+
+    assert bom_reads(upstreams) == ["/v1/items/G00000/bom"]
+    assert where_used_service.parents(db, profile.id, ["06-00002"]) == set()
+    item = db.query(models.ArenaItem).filter(models.ArenaItem.item_number == "06-00000").one()
+    assert item.bom_revision == "B"
+
+
+def test_bom_arena_did_not_return_is_read_by_the_push(profile, db, upstreams, monkeypatch):
+    get_bom = sync_service.ArenaClient.get_bom
+    monkeypatch.setattr(sync_service.ArenaClient, "get_bom", lambda self, guid: None)
+    harvest(db, profile)
+    assert db.query(models.ArenaItem).filter(models.ArenaItem.bom_revision.isnot(None)).count() == 0
+    monkeypatch.setattr(sync_service.ArenaClient, "get_bom", get_bom)
+    upstreams.log.clear()
+
+    sync_service.push_to_cin7(db, dry_run=True, profile_id=profile.id)
+
+    assert len(bom_reads(upstreams)) == 6
+
+
+def test_ancestors_come_after_their_sub_assemblies(profile, db):
+    where_used_service.store_boms(db, profile.id, {
+        "06-00010": ("A", [{"item": {"number": "06-00011"}, "quantity": 1}]),
+        "06-00011": ("A", [{"item": {"number": "06-00012"}, "quantity": 4}]),
+    })
+    db.commit()
+
+    assert where_used_service.ancestors(db, profile.id, ["06-00012"]) == ["06-00011", "06-00010"]
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from backend.services.work_scheduler import BULK, INTERACTIVE, POLLER, UpstreamGate, WorkScheduler
+
+WAIT = 5
+
+
+def test_interactive_work_runs_while_bulk_work_holds_the_workers():
+    scheduler = WorkScheduler(max_workers=3, reserve=1)
+    release = threading.Event()
+    started, order = [], []
+
+    def bulk(n):
+        started.append(n)
+        release.wait(WAIT)
+        order.append(f"bulk-{n}")
+
+    running = [scheduler.submit(bulk, n, priority=BULK, key="push") for n in range(2)]
+    queued = [scheduler.submit(bulk, n, priority=BULK, key="push") for n in range(2, 5)]
+    deadline = time.monotonic() + WAIT
+    while len(started) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    result = scheduler.submit(lambda: order.append("interactive") or "done", priority=INTERACTIVE, key="on-demand")
+
+    # Served by the reserved worker, ahead of the queued bulk items
+    assert result.result(timeout=WAIT) == "done"
+    assert order == ["interactive"]
+    assert sorted(started) == [0, 1]
+    release.set()
+    for future in running + queued:
+        future.result(timeout=WAIT)
+    assert order[0] == "interactive" and len(order) == 6
+
+
+def test_queued_work_is_taken_by_priority():
+    scheduler = WorkScheduler(max_workers=1, reserve=0)
+    release = threading.Event()
+    order = []
+
+    blocker = scheduler.submit(release.wait, WAIT, priority=BULK, key="hold")
+    later = [
+        scheduler.submit(order.append, "bulk", priority=BULK, key="push"),
+        scheduler.submit(order.append, "poller", priority=POLLER, key="poll"),
+        scheduler.submit(order.append, "interactive", priority=INTERACTIVE, key="on-demand"),
+    ]
+    release.set()
+    for future in [blocker] + later:
+        future.result(timeout=WAIT)
+
+    assert order == ["interactive", "poller", "bulk"]
+
+
+def test_bulk_callers_leave_the_reserved_slot_to_interactive_callers():
+    gate = UpstreamGate("arena", limit=2, reserve=1)
+    gate.acquire(BULK)
+    blocked = threading.Event()
+    admitted = threading.Event()
+
+    def second_bulk_call():
+        blocked.set()
+        gate.acquire(BULK)
+        admitted.set()
+
+    threading.Thread(target=second_bulk_call, daemon=True).start()
+    blocked.wait(WAIT)
+    assert not admitted.wait(0.1)
+
+    # The reserved slot is free for an on-demand call right away
+    gate.acquire(INTERACTIVE)
+    assert gate.stats()["in_use"] == 2
+    gate.release()
+    gate.release()
+    assert admitted.wait(WAIT)
+    gate.release()
+
+
+def test_reserve_never_takes_the_last_slot_or_worker():
+    assert UpstreamGate("cin7", limit=1, reserve=1).reserve == 0
+    scheduler = WorkScheduler(max_workers=1, reserve=1)
+    assert scheduler.submit(lambda: "ran", priority=BULK).result(timeout=WAIT) == "ran"
+    assert scheduler.stats()["reserved_workers"] == 0
+
@@ -0,0 +1,134 @@
+"""
+Peak-RSS benchmark for the Arena harvest.
+
+Runs a harvest of N synthetic items (default 100k) against an in-process fake Arena
+and a throwaway SQLite DB, once per mode, each in its own child process:
+
+  legacy   - the old shape: every full listing dict kept for the whole run and one
+             ArenaItem ORM object per item left in the session until a final commit
+  compact  - sync_service.perform_sync: slotted ItemSummary/HarvestedItem records,
+             written and released chunk by chunk
+
+Usage: python bench_harvest_memory.py [N]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+PAGE = 400
+
+def fake_item(i):
+    return {
+        "guid": f"G{i:07d}", "number": f"06-{i:06d}", "name": f"Item {i}", "revisionNumber": "A",
+        "lifecyclePhase": {"guid": "LC1", "name": "In Production"},
+        "category": {"guid": "CAT1", "name": "Mechanical"},
+        "description": f"Description of item {i} " * 4, "uom": "EA",
+        "creationDateTime": "2024-01-01T00:00:00Z", "url": {"api": f"https://api/items/G{i:07d}"},
+        "additionalAttributes": [
+            {"guid": "A1", "name": "Transfer Data to ERP?", "value": "Yes"},
+            {"guid": "A2", "name": "Sellable", "value": "Yes"},
+            {"guid": "A3", "name": "Costing Method", "value": "FIFO"},
+        ],
+    }
+
+class FakeResponse:
+    def __init__(self, data):
+        self.status_code = 200
+        self.text = json.dumps(data)
+        self.content = self.text.encode()
+    def json(self):
+        return json.loads(self.text)
+
+def install_fake_arena(total):
+    from backend.services import arena_service
+
+    def request(self, method, url, **kwargs):
+        if url.endswith("/login"):
+            return FakeResponse({"arenaSessionId": "bench", "workspaceName": "Bench"})
+        if url.endswith("/sourcing"):
+            return FakeResponse({"results": [{"vendorItem": {"number": "MPN", "supplier": {"name": "Acme"}}}]})
+        if url.endswith("/bom"):
+            return FakeResponse({"results": []})
+        if "/items?" in url:
+            offset = int(url.split("offset=")[1].split("&")[0])
+            listing = [fake_item(i) for i in range(offset, min(offset + PAGE, total))]
+            return FakeResponse({"results": listing, "count": total})
+        return FakeResponse(fake_item(int(url.rsplit("/G", 1)[1])))
+
+    arena_service.ArenaClient._request = request
+
+def legacy_harvest(db, arena):
+    """The pre-compaction harvest: full dicts for the whole listing, one session commit."""
+    from backend import models
+    from backend.services.sync_service import map_additional_attributes
+
+    summaries = []
+    for _, page in arena.iter_item_pages():
+        # Stand in for the full listing JSON the old client kept
+        summaries.extend(fake_item(int(s.guid[1:])) for s in page)
+    for summary in summaries:
+        details = arena.get_item_details(summary["guid"])
+        attrs = map_additional_attributes(details)
+        db.merge(models.ArenaItem(
+            guid=summary["guid"], profile_id=1, item_number=details["number"],
+            item_name=details["name"], revision=details["revisionNumber"],
+            lifecycle_phase=details["lifecyclePhase"]["name"], category=details["category"]["name"],
+            description=details["description"], uom=details["uom"],
+            costing_method=attrs.get("Costing Method"), sellable=attrs.get("Sellable"),
+            transfer_to_erp=attrs.get("Transfer Data to ERP?"),
+        ))
+    db.commit()
+    return len(summaries)
+
+def run_mode(mode, total):
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from backend import database, models
+    from backend.services import sync_service, profile_service
+    models.Base.metadata.create_all(bind=database.engine)
+    install_fake_arena(total)
+
+    db = database.SessionLocal()
+    db.add(models.Configuration(arena_workspace_id="1", arena_email="e", arena_password="p",
+                                cin7_api_user="u", cin7_api_key="k", item_prefix_filter="",
+                                checkpoint_interval=500))
+    db.commit()
+
+    started = time.time()
+    if mode == "legacy":
+        arena = profile_service.arena_client(profile_service.get_profile(db))
+        arena.login()
+        harvested = legacy_harvest(db, arena)
+    else:
+        harvested = sync_service.perform_sync(db)["items_harvested"]
+    elapsed = time.time() - started
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    print(json.dumps({"mode": mode, "items": harvested, "peak_rss_mb": round(peak_mb, 1), "seconds": round(elapsed, 1)}))
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--mode":
+        run_mode(sys.argv[2], int(sys.argv[3]))
+        return
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"Harvesting {total} items per mode...")
+    results = {}
+    for mode in ("legacy", "compact"):
+        out = subprocess.run([sys.executable, __file__, "--mode", mode, str(total)],
+                             capture_output=True, text=True, check=True)
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"  {mode:8s} peak RSS {results[mode]['peak_rss_mb']:8.1f} MB  "
+              f"({results[mode]['items']} items, {results[mode]['seconds']} s)")
+    saved = results["legacy"]["peak_rss_mb"] - results["compact"]["peak_rss_mb"]
+    print(f"Compact harvest peak RSS is {saved:.1f} MB lower.")
+
+if __name__ == "__main__":
+    main()
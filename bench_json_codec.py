@@ -0,0 +1,94 @@
+"""
+CPU benchmark for the shared JSON codec (backend/services/json_codec.py).
+
+Per 10k items it times the three hot JSON paths of a sync:
+  arena decode  - parsing Arena item-detail responses
+  cin7 encode   - encoding Cin7 product payloads
+  api render    - rendering a dry-run push result list as an API response
+
+once with the stdlib fallback (JSON_CODEC=json) and once with orjson (if installed).
+The payloads are shaped like the recorded Arena/Cin7 bodies the connector handles.
+
+Usage: python bench_json_codec.py [ITEMS]
+"""
+import importlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def arena_detail(i):
+    return {
+        "guid": f"G{i:07d}", "number": f"06-{i:06d}", "name": f"Bracket, steel, zinc plated {i}",
+        "revisionNumber": "C", "uom": "EA",
+        "lifecyclePhase": {"guid": "LC1", "name": "In Production"},
+        "category": {"guid": "CAT1", "name": "Mechanical", "path": "Parts/Mechanical"},
+        "description": "Formed bracket for enclosure mounting, 2mm steel, zinc plated per spec 100-2.",
+        "creationDateTime": "2024-01-01T00:00:00Z", "assemblyType": "NOT_AN_ASSEMBLY",
+        "url": {"api": f"https://api.arenasolutions.com/v1/items/G{i:07d}", "app": "https://app/item"},
+        "additionalAttributes": [
+            {"guid": f"A{n}", "name": name, "value": value}
+            for n, (name, value) in enumerate([
+                ("Transfer Data to ERP?", "Yes"), ("Sellable", "No"), ("Costing Method", "FIFO"),
+                ("Inventory Account", "1400"), ("COGS Account", "5000"), ("Auto Assemble", "No"),
+                ("Internal Note for ERP", "Stocked at main warehouse"), ("Last GLG CO", "ECO-1042"),
+            ])
+        ],
+    }
+
+def cin7_payload(i):
+    return {
+        "SKU": f"06-{i:06d}", "Name": f"Bracket, steel, zinc plated {i}", "Category": "Mechanical",
+        "Brand": "Acme", "Type": "Stock", "CostingMethod": "FIFO", "UOM": "Item", "Status": "Active",
+        "Description": "Formed bracket for enclosure mounting, 2mm steel, zinc plated per spec 100-2.",
+        "InventoryAccount": "1400", "COGSAccount": "5000", "Sellable": False, "AutoAssembly": False,
+        "AdditionalAttribute1": "C", "AdditionalAttribute2": "In Production", "AdditionalAttribute3": "MPN-1",
+        "PriceTier1": 0.0, "Weight": 0.12, "WeightUnits": "kg",
+    }
+
+def run(codec_name, items):
+    os.environ["JSON_CODEC"] = codec_name
+    from backend.services import json_codec
+    json_codec = importlib.reload(json_codec)
+    if json_codec.CODEC != codec_name:
+        return None
+
+    arena_bodies = [json_codec.dumps(arena_detail(i)) for i in range(items)]
+    payloads = [cin7_payload(i) for i in range(items)]
+    records = [{"SKU": p["SKU"], "Payload": p} for p in payloads]
+
+    timings = {}
+    started = time.process_time()
+    for body in arena_bodies:
+        json_codec.loads(body)
+    timings["arena decode"] = time.process_time() - started
+
+    started = time.process_time()
+    for payload in payloads:
+        json_codec.dumps(payload)
+    timings["cin7 encode"] = time.process_time() - started
+
+    started = time.process_time()
+    json_codec.dumps({"status": "success", "details": records})
+    timings["api render"] = time.process_time() - started
+    return timings
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    scale = 10_000 / items
+    results = {name: run(name, items) for name in ("json", "orjson")}
+    print(f"CPU seconds per 10k items ({items} measured):")
+    print(f"  {'path':14s} {'stdlib':>8s} {'orjson':>8s} {'saved':>8s}")
+    for path in ("arena decode", "cin7 encode", "api render"):
+        base = results["json"][path] * scale
+        if results["orjson"] is None:
+            print(f"  {path:14s} {base:8.3f} {'n/a':>8s}")
+            continue
+        fast = results["orjson"][path] * scale
+        print(f"  {path:14s} {base:8.3f} {fast:8.3f} {base - fast:8.3f}")
+    if results["orjson"] is None:
+        print("orjson is not installed; the codec falls back to the stdlib.")
+
+if __name__ == "__main__":
+    main()
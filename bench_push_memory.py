@@ -0,0 +1,130 @@
+"""
+Peak-RSS and time-to-first-write benchmark for the bulk push.
+
+Seeds a throwaway SQLite DB with N harvested items (default 200k) and runs a dry-run
+push against an in-process fake Arena (empty BOMs), once per mode in its own child process:
+
+  legacy     - the old shape: query.all() of ArenaItem ORM rows, every item submitted to
+               the work scheduler up front and a future per item held until it completes
+  streaming  - sync_service.iter_push_to_cin7: keyset pages of detached records and at
+               most PUSH_WINDOW items in flight
+
+"first" is the time until the first result record is available, i.e. when a live push
+would make its first Cin7 write.
+
+Usage: python bench_push_memory.py [N]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+class FakeResponse:
+    def __init__(self, data):
+        self.status_code = 200
+        self.text = json.dumps(data)
+        self.content = self.text.encode()
+    def json(self):
+        return json.loads(self.text)
+
+def install_fake_arena():
+    from backend.services import arena_service
+
+    def request(self, method, url, **kwargs):
+        if url.endswith("/login"):
+            return FakeResponse({"arenaSessionId": "bench", "workspaceName": "Bench"})
+        return FakeResponse({"results": []})
+
+    arena_service.ArenaClient._request = request
+
+def seed(db, total):
+    from backend import models
+    rows = [{
+        "guid": f"G{i:07d}", "profile_id": 1, "item_number": f"06-{i:06d}", "item_name": f"Item {i}",
+        "revision": "A", "lifecycle_phase": "In Production", "category": "Mechanical",
+        "description": f"Description of item {i} " * 4, "uom": "EA", "costing_method": "FIFO",
+        "sellable": "Yes", "transfer_to_erp": "Yes", "manufacturer": "Acme", "manufacturer_item_number": f"MPN-{i}",
+    } for i in range(total)]
+    db.bulk_insert_mappings(models.ArenaItem, rows)
+    db.commit()
+
+def legacy_push(db, config):
+    """The pre-streaming push: every row and every future materialized up front."""
+    from concurrent.futures import as_completed
+    from backend import models
+    from backend.services import mapping_service, profile_service, work_scheduler, where_used_service
+
+    arena = profile_service.arena_client(config)
+    arena.login()
+    mapping = mapping_service.for_profile(db, config.id)
+    items = db.query(models.ArenaItem).filter(models.ArenaItem.profile_id == config.id).all()
+
+    def process(item):
+        # Same per-item work as the real push
+        bom_items = arena.get_bom(item.guid)
+        where_used_service.record_bom(config.id, item.item_number, bom_items)
+        return {"SKU": item.item_number, "Payload": mapping.product(item, bom_items)}
+
+    future_to_item = {work_scheduler.submit(process, item): item for item in items}
+    for future in as_completed(future_to_item):
+        future_to_item.pop(future)
+        yield future.result()
+
+def run_mode(mode, total):
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from backend import database, models
+    from backend.services import sync_service, profile_service
+    models.Base.metadata.create_all(bind=database.engine)
+    install_fake_arena()
+
+    db = database.SessionLocal()
+    config = models.Configuration(arena_workspace_id="1", arena_email="e", arena_password="p",
+                                  cin7_api_user="u", cin7_api_key="k", item_prefix_filter="")
+    db.add(config)
+    db.commit()
+    seed(db, total)
+    db.expunge_all()
+    config = profile_service.get_profile(db)
+
+    # Measure the push alone, not the seeding
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.time()
+    records = legacy_push(db, config) if mode == "legacy" else sync_service.iter_push_to_cin7(db, dry_run=True)
+    first, pushed = None, 0
+    for record in records:
+        if first is None:
+            first = time.time() - started
+        pushed += 1
+    elapsed = time.time() - started
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    print(json.dumps({"mode": mode, "items": pushed, "peak_rss_mb": round(peak / unit, 1),
+                      "growth_mb": round((peak - baseline) / unit, 1),
+                      "first_s": round(first or 0, 2), "seconds": round(elapsed, 1)}))
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--mode":
+        run_mode(sys.argv[2], int(sys.argv[3]))
+        return
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    print(f"Pushing {total} items per mode (dry run)...")
+    results = {}
+    for mode in ("legacy", "streaming"):
+        out = subprocess.run([sys.executable, __file__, "--mode", mode, str(total)],
+                             capture_output=True, text=True, check=True)
+        results[mode] = r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"  {mode:9s} peak RSS {r['peak_rss_mb']:8.1f} MB (+{r['growth_mb']} MB during push)  "
+              f"first record {r['first_s']} s  ({r['items']} items, {r['seconds']} s)")
+    saved = results["legacy"]["growth_mb"] - results["streaming"]["growth_mb"]
+    print(f"Streaming push grows {saved:.1f} MB less.")
+
+if __name__ == "__main__":
+    main()
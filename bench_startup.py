@@ -0,0 +1,63 @@
+"""
+Startup time budget for the backend.
+
+In a fresh interpreter (so nothing is cached) it measures:
+  import   - importing backend.main
+  startup  - running the app's startup hooks (schema check, background scheduler start)
+  healthz  - first /healthz response
+  readyz   - first /readyz response reporting ready
+
+and fails if import + startup exceeds the budget (STARTUP_BUDGET_SECONDS, default 1.0).
+Runs against a throwaway SQLite DB unless DATABASE_URL is set.
+
+Usage: python bench_startup.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "1.0"))
+
+CHILD = r"""
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import backend.main as main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    up = time.perf_counter()
+    client.get("/healthz")
+    healthy = time.perf_counter()
+    while not client.get("/readyz").json()["ready"]:
+        time.sleep(0.01)
+    ready = time.perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "startup": up - imported,
+    "healthz": healthy - up,
+    "readyz": ready - up,
+}))
+"""
+
+def main():
+    env = dict(os.environ)
+    if "DATABASE_URL" not in env:
+        env["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/startup.db"
+    root = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run([sys.executable, "-c", CHILD, root], env=env, cwd=tempfile.mkdtemp(),
+                         capture_output=True, text=True, check=True)
+    timings = json.loads(out.stdout.strip().splitlines()[-1])
+
+    for name, seconds in timings.items():
+        print(f"  {name:8s} {seconds * 1000:8.1f} ms")
+    total = timings["import"] + timings["startup"]
+    print(f"  {'total':8s} {total * 1000:8.1f} ms (budget {BUDGET_SECONDS * 1000:.0f} ms)")
+    if total > BUDGET_SECONDS:
+        print("Startup is over budget.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
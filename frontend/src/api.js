@@ -17,8 +17,8 @@ export const saveSettings = async (settings) => {
   return response.data;
 };
 
-export const triggerSync = async (dryRun = false) => {
-  const response = await api.post(`/sync/cin7?dry_run=${dryRun}`);
+export const triggerSync = async (dryRun = false, forceFull = false) => {
+  const response = await api.post(`/sync/cin7?dry_run=${dryRun}&force_full=${forceFull}`);
   return response.data;
 };
 
@@ -79,8 +79,28 @@ const ConfigurationForm = () => {
               </div>
               <div className="form-group">
                 <label>Item Prefix Filter</label>
-                <input type="text" name="item_prefix_filter" value={settings.item_prefix_filter || ''} onChange={handleChange} placeholder="e.g. 100- (Leave empty for all)" />
-                <p style={{fontSize: '0.75rem', color: 'var(--text-tertiary)', marginTop: '0.25rem'}}>Only sync items starting with this prefix.</p>
+                <input type="text" name="item_prefix_filter" value={settings.item_prefix_filter || ''} onChange={handleChange} placeholder="e.g. 06-, 12-, !06-99 (Leave empty for all)" />
+                <p style={{fontSize: '0.75rem', color: 'var(--text-tertiary)', marginTop: '0.25rem'}}>Only sync items starting with one of these comma-separated prefixes. Prefix an entry with ! to exclude it.</p>
+              </div>
+              <div className="form-group">
+                <label>Transfer Attribute GUID</label>
+                <input type="text" name="transfer_attribute_guid" value={settings.transfer_attribute_guid || ''} onChange={handleChange} placeholder="Optional" />
+                <p style={{fontSize: '0.75rem', color: 'var(--text-tertiary)', marginTop: '0.25rem'}}>GUID of the "Transfer Data to ERP?" attribute. Lets Arena list only items marked for transfer.</p>
+              </div>
+              <div className="form-group">
+                <label>Poll Interval (minutes)</label>
+                <input type="number" min="1" name="sync_interval_minutes" value={settings.sync_interval_minutes ?? 5} onChange={handleChange} />
+                <p style={{fontSize: '0.75rem', color: 'var(--text-tertiary)', marginTop: '0.25rem'}}>Polls faster while changes are flowing and slower while idle.</p>
+              </div>
+              <div className="form-group">
+                <label>Arena Daily Call Budget</label>
+                <input type="number" min="0" name="arena_daily_call_budget" value={settings.arena_daily_call_budget ?? 0} onChange={handleChange} />
+                <p style={{fontSize: '0.75rem', color: 'var(--text-tertiary)', marginTop: '0.25rem'}}>0 for unlimited. Full syncs stop short of the last {settings.call_budget_reserve_percent ?? 10}%, which is kept for on-demand syncs.</p>
+              </div>
+              <div className="form-group">
+                <label>Full Sync Deadline (minutes)</label>
+                <input type="number" min="0" name="run_deadline_minutes" value={settings.run_deadline_minutes ?? 0} onChange={handleChange} />
+                <p style={{fontSize: '0.75rem', color: 'var(--text-tertiary)', marginTop: '0.25rem'}}>0 for none. A full sync still running after this is cancelled and can be resumed.</p>
               </div>
             </div>
 
@@ -94,6 +114,11 @@ const ConfigurationForm = () => {
                 <label>API Key</label>
                 <input type="password" name="cin7_api_key" value={settings.cin7_api_key} onChange={handleChange} placeholder="••••••••" />
               </div>
+              <div className="form-group">
+                <label>Cin7 Daily Call Budget</label>
+                <input type="number" min="0" name="cin7_daily_call_budget" value={settings.cin7_daily_call_budget ?? 0} onChange={handleChange} />
+                <p style={{fontSize: '0.75rem', color: 'var(--text-tertiary)', marginTop: '0.25rem'}}>0 for unlimited.</p>
+              </div>
             </div>
           </div>
 
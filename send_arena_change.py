@@ -0,0 +1,42 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import requests
+
+# Add backend to path so we can import modules
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from backend.services.change_queue_service import sign_payload
+
+def send_change(url, secret, change_guid, change_number=None):
+    """Stands in for Arena: posts a signed change-completed notification to the connector."""
+    body = json.dumps({
+        "event": "change.completed",
+        "changeGuid": change_guid,
+        "changeNumber": change_number,
+    }).encode()
+    timestamp = str(int(time.time()))
+    headers = {
+        "Content-Type": "application/json",
+        "X-Arena-Timestamp": timestamp,
+        "X-Arena-Signature": sign_payload(secret, timestamp, body),
+    }
+    response = requests.post(url, data=body, headers=headers, timeout=10)
+    print(f"{response.status_code}: {response.text}")
+    return response
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send a test Arena change-completed notification.")
+    parser.add_argument("change_guid")
+    parser.add_argument("--number", help="Change number, e.g. ECO-000123")
+    parser.add_argument("--url", default="http://localhost:8000/webhooks/arena/changes")
+    parser.add_argument("--secret", default=os.getenv("ARENA_WEBHOOK_SECRET", ""), help="Must match the configured webhook secret")
+    args = parser.parse_args()
+
+    if not args.secret:
+        print("❌ No secret given (use --secret or ARENA_WEBHOOK_SECRET)")
+        sys.exit(1)
+    send_change(args.url, args.secret, args.change_guid, args.number)